@@ -2,18 +2,27 @@ from dotenv import load_dotenv, find_dotenv
 load_dotenv()  # .env 읽기
 from pathlib import Path
 import pandas as pd
-from notion_client import Client
+from ju_notion_client import RateLimitedClient, notion_stats
 import tempfile
 import sys
-import urllib.parse
 import io
 import json
 from google.oauth2 import service_account
 from googleapiclient.discovery import build
-from googleapiclient.http import MediaIoBaseDownload
-from ju_make_final_df import make_final_df
-from ju_make_finance_df import make_finance_df
-from ju_make_excel import build_finance_excel
+import httplib2
+from google_auth_httplib2 import AuthorizedHttp
+from ju_drive_download import download_drive_files, release_contents, DOWNLOAD_TIMEOUT, DOWNLOAD_MODE
+from google.auth.transport.requests import AuthorizedSession
+from ju_file_cache import default_byte_cache
+from ju_frame_store import FolderFrameStore
+from ju_excel_reader import read_excel, parse_excels
+from ju_notion_cache import notion_file_list_cache
+from ju_notion_catalog import notion_page_catalog, extract_page_title, normalize_text
+from ju_notion_download import notion_xlsx_cache
+from ju_notion_tables import find_notion_tables, read_raw_sheets
+from ju_shipping_rules import rules_from_json
+from ju_stage_cache import cached_make_final_df, cached_make_finance_df, cached_build_finance_excel
+from ju_incremental import IncrementalSettlement
 from googleapiclient.http import MediaIoBaseUpload
 import os
 import streamlit as st, tempfile, os, json
@@ -33,8 +42,8 @@ if "NOTION_TOKEN" in st.secrets:
 
 st.set_page_config(page_title="소셜라운지 정산 자동화", layout="wide")
 st.title("소셜라운지 정산 자동화")
-# Notion 클라이언트 초기화
-notion = Client(auth=NOTION_TOKEN)
+# Notion 클라이언트 초기화(모든 호출이 프로세스 공용 요청 한도를 공유)
+notion = RateLimitedClient(auth=NOTION_TOKEN)
 
 # 표시 전용: Streamlit/pyarrow 호환을 위한 안전 변환
 def _streamlit_safe_df(df: pd.DataFrame) -> pd.DataFrame:
@@ -92,171 +101,114 @@ def _resolve_service_account_path() -> str:
         return DRIVE_SA_JSON_PATH
     raise FileNotFoundError("서비스 계정 JSON을 찾을 수 없습니다. 환경변수 DRIVE_SA_JSON_PATH 설정 또는 service_account.json 파일을 실행파일 폴더에 두세요.")
 
-@st.cache_resource(show_spinner=False)
-def get_drive_service():
+def _drive_credentials():
     sa_path = _resolve_service_account_path()
     with open(sa_path, "r", encoding="utf-8") as f:
         info = json.load(f)
     # 업로드/생성 권한이 필요하므로 전체 Drive 쓰기 스코프 사용
     scopes = ["https://www.googleapis.com/auth/drive"]
-    creds = service_account.Credentials.from_service_account_info(info, scopes=scopes)
-    return build("drive", "v3", credentials=creds)
-
-def _drive_download_content(_drive, file_id: str, mime_type: str | None) -> bytes:
-    if mime_type == "application/vnd.google-apps.spreadsheet":
-        request = _drive.files().export_media(
-            fileId=file_id,
-            mimeType="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
-        )
-    else:
-        request = _drive.files().get_media(fileId=file_id, supportsAllDrives=True)
-    fh = io.BytesIO()
-    downloader = MediaIoBaseDownload(fh, request)
-    done = False
-    while not done:
-        status, done = downloader.next_chunk()
-    fh.seek(0)
-    return fh.getvalue()
-
-def _concat_drive_excels(_drive, files: list[dict]) -> pd.DataFrame:
+    return service_account.Credentials.from_service_account_info(info, scopes=scopes)
+
+@st.cache_resource(show_spinner=False)
+def get_drive_service():
+    return build("drive", "v3", credentials=_drive_credentials())
+
+def _build_drive_service():
+    # 동시 다운로드용: 스레드마다 별도 http 커넥션(소켓 타임아웃 포함)을 갖는 서비스
+    http = AuthorizedHttp(_drive_credentials(), http=httplib2.Http(timeout=DOWNLOAD_TIMEOUT))
+    return build("drive", "v3", http=http, cache_discovery=False)
+
+def _build_drive_session():
+    # Range 이어받기 다운로드용: 스레드마다 별도의 인증된 requests 세션
+    return AuthorizedSession(_drive_credentials())
+
+def _concat_drive_excels(_drive, files: list[dict], max_workers: int | None = None, timeout: float | None = None, folder_id: str | None = None, parse_workers: int | None = None, report: dict | None = None) -> pd.DataFrame:
+    # 폴더 스냅샷: 변경 없는 파일은 저장된 파싱 결과를 재사용하고, 추가/변경된 파일만 내려받아 파싱
+    store = FolderFrameStore(folder_id) if folder_id else None
+    parsed: list[pd.DataFrame | None] = [store.get(f) if store is not None else None for f in files]
+    missing = [i for i, df in enumerate(parsed) if df is None]
+    contents = download_drive_files(
+        _drive,
+        [files[i] for i in missing],
+        max_workers=max_workers,
+        timeout=timeout,
+        drive_factory=_build_drive_session if DOWNLOAD_MODE == "ranged" else _build_drive_service,
+        cache=default_byte_cache(),
+        report=report,
+    )
+    # 파싱(EXCEL_PARSE_WORKERS > 1이면 프로세스풀), 개별 파일 오류는 None으로 건너뜀
+    try:
+        parsed_missing = parse_excels(contents, max_workers=parse_workers)
+    finally:
+        # 임계치를 넘어 디스크로 받은 임시 파일 정리
+        release_contents(contents)
+    for i, df in zip(missing, parsed_missing):
+        if df is None:
+            continue
+        parsed[i] = df
+        if store is not None:
+            store.put(files[i], df)
+    if store is not None:
+        store.retain(files)
+        store.save()
+
     frames: list[pd.DataFrame] = []
-    for f in files:
-        name = f.get("name") or ""
-        mime = f.get("mimeType")
-        try:
-            if name.lower().endswith((".xlsx", ".xls")) or mime in (
-                "application/vnd.ms-excel",
-                "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
-                "application/vnd.google-apps.spreadsheet",
-            ):
-                content = _drive_download_content(_drive, f.get("id"), mime)
-                bio = io.BytesIO(content)
-                df = pd.read_excel(bio)
-                df["__source_file__"] = name
-                frames.append(df)
-        except Exception as e:
-            # 개별 파일 오류는 건너뛰고 계속 진행
+    for f, df in zip(files, parsed):
+        if df is None:
             continue
+        df = df.copy(deep=False)
+        df["__source_file__"] = f.get("name") or ""
+        frames.append(df)
     if frames:
         return pd.concat(frames, ignore_index=True)
     return pd.DataFrame()
 
-def _extract_notion_table(df: pd.DataFrame) -> pd.DataFrame:
-    def _dedupe_headers_with_nan_to_prev_underscore(cols_in):
-        result = []
-        used = set()
-        last_non_empty = None
-        for raw in list(cols_in):
-            s = str(raw).strip()
-            if s == "" or s.lower() == "nan":
-                if last_non_empty is None:
-                    s = "_"
-                else:
-                    s = last_non_empty + "_"
-            else:
-                last_non_empty = s
-            # ensure uniqueness
-            base = s
-            while s in used:
-                s = base + "_"
-                base = s
-            used.add(s)
-            result.append(s)
-        return result
-    # 헤더 행 추정: 'NO'가 포함된 행을 찾아 그 행을 헤더로 사용
-    header_idx = None
-    needed = {"NO", "카테고리", "상품명"}
-    max_scan = min(30, len(df))
-    for i in range(max_scan):
-        row_vals = set(str(v).strip() for v in list(df.iloc[i].values))
-        if "NO" in row_vals and ("카테고리" in row_vals or "분류" in row_vals):
-            header_idx = i
-            break
-        # 느슨한 조건: 필요한 키 일부 만족
-        if len(needed.intersection(row_vals)) >= 2:
-            header_idx = i
-            break
-    if header_idx is None:
-        # 실패 시 현재 컬럼으로 시도
-        work = df.copy()
-        work.columns = _dedupe_headers_with_nan_to_prev_underscore(work.columns)
-    else:
-        work = df.iloc[header_idx + 1 :].copy()
-        cols = list(df.iloc[header_idx].values)
-        work.columns = _dedupe_headers_with_nan_to_prev_underscore(cols)
-
-    # 'NO' 열 정규화
-    if "NO" not in work.columns:
-        # 가장 왼쪽 컬럼이 NO일 가능성 처리
-        first_col = work.columns[0]
-        if str(first_col).strip().upper() == "NO":
-            work.rename(columns={first_col: "NO"}, inplace=True)
-        else:
-            return pd.DataFrame()
-
-    work["NO_num"] = pd.to_numeric(work["NO"], errors="coerce")
-    # 연속 구간: 첫 유효값부터 다음 NaN 전까지
-    mask = work["NO_num"].notna()
-    if not mask.any():
-        return pd.DataFrame()
-    start_idx = mask.idxmax()
-    after = work.loc[start_idx:]
-    # 첫 NaN 위치 찾기
-    stop_rel = after["NO_num"].isna()
-    if stop_rel.any():
-        stop_idx = stop_rel.idxmax()
-        sliced = work.loc[start_idx: stop_idx - 1]
-    else:
-        sliced = after
-    # 불필요 컬럼 제거 및 정리
-    if "NO_num" in sliced.columns:
-        sliced = sliced.drop(columns=["NO_num"])  # 표시용 제거
-    # 공백/Unnamed 컬럼 정리
-    sliced = sliced.loc[:, ~sliced.columns.astype(str).str.contains("^Unnamed")]
-    sliced = sliced.drop(columns=["상품명_","구성_"],axis=1)
-    return sliced.reset_index(drop=True)
-
-def _extract_page_title(page):
-    """검색 결과의 페이지 객체에서 사람이 읽을 수 있는 제목을 추출합니다."""
-    # 1) 데이터베이스 항목(행)인 경우: properties 안의 type==title 속성에서 추출
-    properties = page.get("properties", {}) or {}
-    for _, prop in properties.items():
-        if isinstance(prop, dict) and prop.get("type") == "title":
-            title_fragments = prop.get("title", [])
-            if title_fragments:
-                return "".join([frag.get("plain_text", "") for frag in title_fragments]) or None
-    # 2) 일반 페이지인 경우: URL slug에서 유추
-    url = page.get("url", "")
-    if url:
-        try:
-            last = url.split("/")[-1].split("?")[0]
-            parts = last.split("-")
-            if len(parts) > 1:
-                slug = "-".join(parts[:-1])
+def _normalize_notion_columns(df_notion: pd.DataFrame) -> pd.DataFrame:
+    # 컬럼명의 개행/스페이스 제거 및 중복 처리
+    try:
+        cols = pd.Index(map(str, df_notion.columns)).str.replace(r"\s+", "", regex=True)
+        seen = {}
+        new_cols = []
+        for name in cols:
+            if name in seen:
+                seen[name] += 1
+                new_cols.append(f"{name}_{seen[name]}")
             else:
-                slug = last
-            return urllib.parse.unquote(slug).replace("-", " ")
-        except Exception:
-            return None
-    return None
+                seen[name] = 0
+                new_cols.append(name)
+        df_notion.columns = new_cols
+    except Exception:
+        pass
+    return df_notion
 
-def _normalize_text(text):
-    return "".join((text or "").lower().split())
 
-def _decode_filename(text: str) -> str:
-    try:
-        return urllib.parse.unquote(text or "", encoding="utf-8", errors="replace")
-    except Exception:
-        try:
-            return urllib.parse.unquote(text or "")
-        except Exception:
-            return text or ""
+def _parse_notion_xlsx(content: bytes) -> dict:
+    """노션 xlsx bytes → {"df_raw": 첫 시트 원본, "tables": [(위치, 표)], "df_notion": 첫 번째 표}
+
+    모든 시트에서 'NO' 헤더로 시작하는 표를 전부 찾습니다(한 파일에 옵션 표가 여러 개인 경우).
+    """
+    sheets = read_raw_sheets(content)
+    tables = [(region, _normalize_notion_columns(df)) for region, df in find_notion_tables(content, sheets=sheets)]
+    df_raw = next(iter(sheets.values()), pd.DataFrame())
+    return {"df_raw": df_raw, "tables": tables, "df_notion": tables[0][1] if tables else pd.DataFrame()}
+
 
 def search_pages_by_title(title):
     """제목으로 페이지를 검색하고 후보 목록을 반환합니다.
 
     반환값: [{ id, title, url }]
+    로컬 카탈로그(백그라운드 동기화)에 정확히 같은 제목이 있으면 바로 반환하고,
+    접두/부분/유사 일치뿐이면 Notion 검색 API 결과를 앞에, 카탈로그 후보를 뒤에 붙여 반환합니다.
     """
+    norm_query = normalize_text(title)
+    catalog_hits = []
+    try:
+        catalog_hits = notion_page_catalog(notion).lookup(title)
+        # 정확 일치는 단독으로만 반환되므로 첫 후보만 확인
+        if catalog_hits and normalize_text(catalog_hits[0]["title"]) == norm_query:
+            return catalog_hits
+    except Exception:
+        pass
     try:
         resp = notion.search(
             query=title,
@@ -268,7 +220,7 @@ def search_pages_by_title(title):
         for page in results:
             if page.get("object") != "page":
                 continue
-            human_title = _extract_page_title(page) or "제목 없음"
+            human_title = extract_page_title(page) or "제목 없음"
             candidates.append({
                 "id": page.get("id"),
                 "title": human_title,
@@ -276,91 +228,24 @@ def search_pages_by_title(title):
             })
 
         # 우선 정확 일치, 다음 부분 일치 정렬
-        norm_query = _normalize_text(title)
-        exact = [c for c in candidates if _normalize_text(c["title"]) == norm_query]
+        exact = [c for c in candidates if normalize_text(c["title"]) == norm_query]
         if exact:
             return exact
-        partial = [c for c in candidates if norm_query in _normalize_text(c["title"])]
-        return partial or candidates
+        partial = [c for c in candidates if norm_query in normalize_text(c["title"])]
+        live = partial or candidates
+        seen = {c["id"] for c in live}
+        return live + [c for c in catalog_hits if c["id"] not in seen]
     except Exception as e:
+        if catalog_hits:
+            return catalog_hits
         st.error(f"페이지 검색 중 오류 발생: {str(e)}")
         return []
 
-def _list_all_blocks(block_id):
-    blocks = []
-    start_cursor = None
-    while True:
-        resp = notion.blocks.children.list(block_id=block_id, start_cursor=start_cursor)
-        blocks.extend(resp.get("results", []))
-        if not resp.get("has_more"):
-            break
-        start_cursor = resp.get("next_cursor")
-    return blocks
-
-
 def get_xlsx_files_from_page(page_id):
     """페이지(및 모든 하위 블록/하위 페이지/속성)에서 .xlsx/.xls 파일을 수집합니다."""
     try:
-        xlsx_files = []
-
-        def _is_excel_by_name_or_url(name: str, url: str) -> bool:
-            lname = (name or "").lower()
-            lurl = (url or "").lower()
-            return lname.endswith((".xlsx", ".xls")) or lurl.split("?")[0].endswith((".xlsx", ".xls"))
-
-        # 1) 페이지 속성에 첨부된 파일(데이터베이스 행 등) 수집
-        try:
-            page_obj = notion.pages.retrieve(page_id=page_id)
-            for prop in (page_obj.get("properties") or {}).values():
-                if isinstance(prop, dict) and prop.get("type") == "files":
-                    for item in prop.get("files", []):
-                        itype = item.get("type")  # file | external
-                        url = (item.get(itype) or {}).get("url")
-                        raw_name = item.get("name") or (url or "").rsplit("/", 1)[-1]
-                        name = _decode_filename(raw_name)
-                        if url and _is_excel_by_name_or_url(name, url):
-                            xlsx_files.append({"name": name, "url": url})
-        except Exception:
-            # 페이지가 권한 또는 형식 문제로 조회되지 않는 경우 무시하고 블록 탐색으로 계속
-            pass
-
-        # 2) 블록을 재귀적으로 순회하며 file 블록과 child_page, 그리고 has_children 블록을 탐색
-        def collect_from_blocks(blocks):
-            for block in blocks:
-                btype = block.get("type")
-                if btype == "file":
-                    file_info = block.get("file", {})
-                    ftype = file_info.get("type")  # file | external
-                    url = (file_info.get(ftype) or {}).get("url")
-                    # 블록에는 name이 없을 수 있어 URL에서 유추 (Windows/URL 모두 안전하게 처리)
-                    try:
-                        name_guess = os.path.basename(urllib.parse.urlparse(url or "").path) or (url or "").rsplit("/", 1)[-1]
-                    except Exception:
-                        name_guess = (url or "").rsplit("/", 1)[-1]
-                    decoded_name = _decode_filename(name_guess)
-                    if url and _is_excel_by_name_or_url(decoded_name, url):
-                        xlsx_files.append({"name": decoded_name or "download.xlsx", "url": url})
-
-                # 모든 블록에서 자식이 있으면 탐색
-                if block.get("has_children"):
-                    child_id = block.get("id")
-                    child_blocks = _list_all_blocks(child_id)
-                    collect_from_blocks(child_blocks)
-
-                # 별도로 child_page는 위 로직에 포함되지만 명시적으로 한 번 더 안전하게 처리
-                if btype == "child_page":
-                    child_id = block.get("id")
-                    child_blocks = _list_all_blocks(child_id)
-                    collect_from_blocks(child_blocks)
-
-        root_blocks = _list_all_blocks(page_id)
-        collect_from_blocks(root_blocks)
-
-        # 중복 제거(같은 url 기준)
-        uniq = {}
-        for f in xlsx_files:
-            uniq[f["url"]] = f
-        return list(uniq.values())
+        # 페이지/하위 페이지가 수정되지 않았으면 로컬 캐시 사용
+        return notion_file_list_cache().files_for_page(notion, page_id)
     except Exception as e:
         st.error(f"Notion API 오류: {str(e)}")
         return []
@@ -391,18 +276,25 @@ def main():
     st.info("1. 구글 드라이브 folders/ 뒷부분의 문자를 입력하고, 가져오기 버튼을 눌러주세요")
     folder_id = st.text_input("구글 폴더 ID",value="1t86O2qdONoW-8H5xN2unWg8YzW--Z4IM")
 
-    col1, col2 = st.columns([1,1])
+    col1, col2, col3 = st.columns([1,1,1])
     with col1:
         run = st.button("가져오기")
     with col2:
         reset = st.button("초기화")
+    with col3:
+        clear_notion_cache = st.button("노션 캐시 비우기")
+
+    if clear_notion_cache:
+        notion_file_list_cache().invalidate()
+        notion_xlsx_cache().clear()
+        st.info("노션 파일 목록/첨부 파일 캐시를 비웠습니다. 다음 가져오기 때 다시 수집합니다.")
 
     if reset:
         for k in [
             "drive_files", "product_name", "notion_page_id", "notion_xlsx_files",
             "selected_xlsx_index", "last_folder_id", "initialized", "df_invoice_raw",
             "df_notion", "raw_unique_keys", "notion_unique_keys", "matching_map",
-            "grid_current_df", "df_matching"
+            "grid_current_df", "df_matching", "drive_download_report", "incremental_settlement"
         ]:
             if k in st.session_state:
                 del st.session_state[k]
@@ -425,8 +317,10 @@ def main():
         st.session_state["last_folder_id"] = folder_id
 
         # 구글 xlsx 모두 concat → df_invoice_raw 저장
-        df_invoice_raw = _concat_drive_excels(drive, drive_files)
+        download_report = {}
+        df_invoice_raw = _concat_drive_excels(drive, drive_files, folder_id=folder_id, report=download_report)
         st.session_state["df_invoice_raw"] = df_invoice_raw
+        st.session_state["drive_download_report"] = download_report
         st.session_state["initialized"] = True
 
         first_name = drive_files[0].get("name") or ""
@@ -447,16 +341,30 @@ def main():
         st.session_state["notion_page_id"] = page_id
 
         st.session_state["notion_xlsx_files"] = get_xlsx_files_from_page(page_id)
+        # 후보 파일을 모두 백그라운드에서 미리 받아 두어 선택 전환을 즉시 처리
+        notion_xlsx_cache().prefetch(st.session_state["notion_xlsx_files"], _parse_notion_xlsx)
 
     # Render saved results regardless of run state (빠른 렌더)
     if "drive_files" in st.session_state:
         with st.expander("드라이브 발주서 파일 목록"):
             st.dataframe(pd.DataFrame(st.session_state["drive_files"]), use_container_width=True)
+    download_report = st.session_state.get("drive_download_report") or {}
+    if download_report.get("retried"):
+        retried = ", ".join(f"{r['name']}({r['retries']}회)" for r in download_report["retried"])
+        st.info(f"재시도 후 받은 파일: {retried}")
+    if download_report.get("failed"):
+        failed = ", ".join(f"{r['name']}" for r in download_report["failed"])
+        st.warning(f"다운로드에 실패해 제외된 파일: {failed}")
     if "df_invoice_raw" in st.session_state and not st.session_state["df_invoice_raw"].empty:
         with st.expander("발주서 취합본(구글 xlsx 병합)"):
             st.dataframe(_streamlit_safe_df(st.session_state["df_invoice_raw"]), use_container_width=True)
     if "product_name" in st.session_state and "notion_page_id" in st.session_state:
         st.success(f"추출된 품목: {st.session_state['product_name']}/노션 페이지 ID: {st.session_state['notion_page_id']}")
+        stats = notion_stats()
+        st.caption(
+            f"Notion API 요청 {stats['requests']}회 · 한도 초과(429) {stats['throttled']}회 · "
+            f"재시도 {stats['retried']}회 · 실패 {stats['failed']}회 · 현재 속도 {stats['current_rate']}/초"
+        )
 
     if "notion_xlsx_files" in st.session_state and st.session_state["notion_xlsx_files"]:
         files = st.session_state["notion_xlsx_files"]
@@ -464,49 +372,49 @@ def main():
         default_index = st.session_state.get("selected_xlsx_index", 0)
         st.divider()
         st.info("2. 노션 xlsx 파일을 선택해주세요")
-        selected_name = st.selectbox("노션 xlsx 파일선택", options=names, index=min(default_index, len(names)-1), key="xlsx_selector")
+        xlsx_cache = notion_xlsx_cache()
+        status_by_name = {f["name"]: xlsx_cache.status(f) for f in files}
+        status_labels = {"ready": "준비됨", "loading": "받는 중", "error": "오류", "pending": "대기"}
+        selected_name = st.selectbox(
+            "노션 xlsx 파일선택",
+            options=names,
+            index=min(default_index, len(names)-1),
+            key="xlsx_selector",
+            format_func=lambda n: f"{n} [{status_labels[status_by_name.get(n, 'pending')]}]",
+        )
+        pending = sum(1 for v in status_by_name.values() if v != "ready")
+        if pending:
+            st.caption(f"미리 받기 진행 중: {len(files) - pending}/{len(files)}개 준비됨")
         selected_index = names.index(selected_name)
         st.session_state["selected_xlsx_index"] = selected_index
         selected_file = files[selected_index]
 
         try:
-            import requests
-            with tempfile.NamedTemporaryFile(delete=False, suffix=".xlsx") as tmp_file:
-                response = requests.get(selected_file["url"], timeout=30)
-                response.raise_for_status()
-                tmp_file.write(response.content)
-            df_x = pd.read_excel(tmp_file.name)
-            # 노션 표 추출 → df_notion
-            df_notion = _extract_notion_table(df_x)
-            # 컬럼명의 개행/스페이스 제거 및 중복 처리
-            try:
-                cols = pd.Index(map(str, df_notion.columns)).str.replace(r"\s+", "", regex=True)
-                seen = {}
-                new_cols = []
-                for name in cols:
-                    if name in seen:
-                        seen[name] += 1
-                        new_cols.append(f"{name}_{seen[name]}")
-                    else:
-                        seen[name] = 0
-                        new_cols.append(name)
-                df_notion.columns = new_cols
-            except Exception:
-                pass
+            # 같은 파일은 rerun마다 다시 받거나 파싱하지 않음(블록 id + 파일명 기준 캐시)
+            loaded = xlsx_cache.load(selected_file, _parse_notion_xlsx)
+            df_x, df_notion = loaded["df_raw"], loaded["df_notion"]
+            tables = loaded.get("tables") or []
+            if len(tables) > 1:
+                labels = [region.label for region, _ in tables]
+                table_index = st.selectbox(
+                    f"표 선택 (이 파일에서 {len(tables)}개 발견)",
+                    options=range(len(tables)),
+                    format_func=lambda i: labels[i],
+                    key="notion_table_selector",
+                )
+                df_notion = tables[table_index][1]
             st.session_state["df_notion"] = df_notion.copy()
             if not df_notion.empty:
                 st.dataframe(_streamlit_safe_df(df_notion), use_container_width=True)
             else:
                 st.info("테이블 헤더/구간을 찾지 못했습니다. 원본을 표시합니다.")
                 st.dataframe(_streamlit_safe_df(df_x), use_container_width=True)
-            with open(tmp_file.name, "rb") as f:
-                st.download_button(
-                    label="다운로드 (.xlsx)",
-                    data=f,
-                    file_name=selected_file["name"] if selected_file["name"].lower().endswith(".xlsx") else f"{selected_file['name']}.xlsx",
-                    mime="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
-                )
-            os.unlink(tmp_file.name)
+            st.download_button(
+                label="다운로드 (.xlsx)",
+                data=loaded["content"],
+                file_name=selected_file["name"] if selected_file["name"].lower().endswith(".xlsx") else f"{selected_file['name']}.xlsx",
+                mime="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
+            )
         except Exception as e:
             st.error(f"노션 파일 처리 중 오류: {e}")
 
@@ -532,14 +440,27 @@ def main():
             sel_island_col = st.selectbox("1-8. 도서산간배송비 컬럼을 선택해주세요", options=["(없음)"] + raw_columns, key="raw_island_col")
             sel_island_mode = st.selectbox(
                 "1-9. 도서산간배송비 산출방법을 선택해주세요",
-                options=["실제 배송비가 raw 데이터에 존재", "도서산간 구분만 존재"],
+                options=["실제 배송비가 raw 데이터에 존재", "도서산간 구분만 존재", "우편번호로 판별(1-8에 우편번호 컬럼 선택)"],
                 key="raw_island_mode",
             )
             island_flag_text = ""
             island_fee_value = 0
             if sel_island_mode == "도서산간 구분만 존재":
-                island_flag_text = st.text_input("1-10. RAW 데이터 도서산간 구분 텍스트를 입력해주세요", value="", key="island_flag_text")
+                island_flag_text = st.text_input("1-10. RAW 데이터 도서산간 구분 텍스트를 입력해주세요(여러 개는 쉼표로 구분)", value="", key="island_flag_text")
                 island_fee_value = st.number_input("1-11. 도서산간배송비를 입력해주세요", min_value=0, step=1000, value=0, key="island_fee_value")
+            elif sel_island_mode.startswith("우편번호로 판별"):
+                island_flag_text = st.text_input("1-10. (선택) 우편번호를 읽지 못한 행에 쓸 구분 텍스트(쉼표로 구분)", value="", key="island_flag_text")
+                island_fee_value = st.number_input("1-11. 도서산간배송비를 입력해주세요", min_value=0, step=1000, value=0, key="island_fee_value")
+            sel_seller_col = st.selectbox("1-12. (선택) 판매자 컬럼을 선택해주세요(판매자별 배송비 규칙용)", options=["(없음)"] + raw_columns, key="raw_seller_col")
+            shipping_rules_text = st.text_area(
+                "1-13. (선택) 배송비 규칙(JSON). 비우면 1-6/1-7 설정을 사용합니다",
+                value="",
+                key="shipping_rules_json",
+                help='위에서부터 처음 맞는 규칙 적용. 예: [{"name": "소액", "fee": 3000, "max_amount": 30000}, '
+                     '{"name": "중액", "fee": 1500, "min_amount": 30000, "max_amount": 50000}, '
+                     '{"name": "묶음", "fee": 5000, "products": ["상품(구성)"], "min_qty": 3}] '
+                     '(항목: min_amount, max_amount, min_qty, max_qty, seller, products, ratio)',
+            )
             submitted = st.form_submit_button("제출")
 
         if submitted:
@@ -571,9 +492,16 @@ def main():
                 st.session_state["seller_shipping_ratio_value"] = int(input_seller_ratio or 0)
                 st.session_state["shipping_condition_amount_value"] = int(input_shipping_cond or 0)
                 st.session_state["island_col"] = None if sel_island_col == "(없음)" else sel_island_col
-                st.session_state["island_mode"] = ("raw" if sel_island_mode == "실제 배송비가 raw 데이터에 존재" else "flag")
+                if sel_island_mode == "실제 배송비가 raw 데이터에 존재":
+                    st.session_state["island_mode"] = "raw"
+                elif sel_island_mode.startswith("우편번호로 판별"):
+                    st.session_state["island_mode"] = "postcode"
+                else:
+                    st.session_state["island_mode"] = "flag"
                 st.session_state["island_flag_text_value"] = island_flag_text
                 st.session_state["island_fee_value_int"] = int(island_fee_value or 0)
+                st.session_state["seller_col"] = None if sel_seller_col == "(없음)" else sel_seller_col
+                st.session_state["shipping_rules_value"] = rules_from_json(shipping_rules_text)
             except Exception as e:
                 st.error(f"매핑 준비 중 오류: {e}")
 
@@ -627,22 +555,36 @@ def main():
                 st.divider()
                 st.info("5. RAW데이터와 정산 데이터 파일을 생성했습니다.")
                 df_matching = st.session_state["df_matching"]
-                df_final = make_final_df(
-                    df_raw,
-                    df_notion,
-                    df_matching,
-                    sel_product,
-                    sel_option,
-                    sel_qty,
-                    st.session_state.get("selected_orderno_col"),
-                    st.session_state.get("shipping_fee_value"),
-                    st.session_state.get("shipping_condition_amount_value"),
-                    st.session_state.get("seller_shipping_ratio_value"),
-                    st.session_state.get("island_col"),
-                    st.session_state.get("island_mode"),
-                    st.session_state.get("island_flag_text_value"),
-                    st.session_state.get("island_fee_value_int"),
-                )
+                # 매칭만 고친 경우 바뀐 주문상품 행/주문만 다시 계산(세션별 직전 결과 보관)
+                if "incremental_settlement" not in st.session_state:
+                    st.session_state["incremental_settlement"] = IncrementalSettlement()
+                incremental = st.session_state["incremental_settlement"]
+                try:
+                    # 입력(프레임 내용/설정)이 같으면 rerun 때 이전 결과를 그대로 사용
+                    df_final = cached_make_final_df(
+                        df_raw,
+                        df_notion,
+                        df_matching,
+                        sel_product,
+                        sel_option,
+                        sel_qty,
+                        st.session_state.get("selected_orderno_col"),
+                        st.session_state.get("shipping_fee_value"),
+                        st.session_state.get("shipping_condition_amount_value"),
+                        st.session_state.get("seller_shipping_ratio_value"),
+                        st.session_state.get("island_col"),
+                        st.session_state.get("island_mode"),
+                        st.session_state.get("island_flag_text_value"),
+                        st.session_state.get("island_fee_value_int"),
+                        shipping_rules=st.session_state.get("shipping_rules_value"),
+                        seller_column=st.session_state.get("seller_col"),
+                        compute=incremental.make_final_df,
+                    )
+                except Exception as e:
+                    st.error(f"RAW 데이터 생성 중 오류: {e}")
+                    st.stop()
+                # 정산 집계에는 원래 결과를 넘김(같은 컬럼 정리를 내부에서 하며, 증분 집계는 이 객체 기준)
+                df_final_result = df_final
                 
                 # 표시/집계 전, 표시 과정에서 생긴 중복 접미사 컬럼(__숫자) 제거
                 try:
@@ -657,23 +599,27 @@ def main():
 
                 # 5. 정산 정리 df_finance 생성
                 try:
-                    df_finance = make_finance_df(
-                        df_final,
+                    df_finance = cached_make_finance_df(
+                        df_final_result,
                         st.session_state.get("drive_files", []),
                         st.session_state.get("selected_qty_col"),
                         st.session_state.get("shipping_fee_value"),
                         st.session_state.get("seller_shipping_ratio_value"),
                         st.session_state.get("island_fee_value_int"),
+                        shipping_rules=st.session_state.get("shipping_rules_value"),
+                        compute=incremental.make_finance_df,
                     )
                     with st.expander("정산 집계 데이터보기"):
                         st.dataframe(_streamlit_safe_df(df_finance), use_container_width=True)
                     st.session_state["df_finance"] = df_finance
                     # 다운로드 버튼
-                    xls_bytes, final_filename = build_finance_excel(
+                    raw_output = {}
+                    xls_bytes, final_filename = cached_build_finance_excel(
                         df_finance,
                         df_final,
                         st.session_state.get("drive_files", []),
                         title="정산 리포트",
+                        raw_output=raw_output,
                     )
                     # 다운로드 버튼 (업로드는 별도 버튼으로 실행)
                     st.download_button(
@@ -683,6 +629,18 @@ def main():
                         mime="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
                         key="download_finance_excel",
                     )
+                    # RAW가 커서 별도 파일로 분리된 경우(정산 파일은 가볍게 유지)
+                    if raw_output.get("data"):
+                        st.info(f"RAW 데이터 {raw_output['rows']:,}행은 정산 파일과 별도 파일({raw_output['filename']})로 제공합니다.")
+                        st.download_button(
+                            label=f"RAW 데이터 다운로드 ({raw_output['filename'].split('.', 1)[-1]})",
+                            data=raw_output["data"],
+                            file_name=raw_output["filename"],
+                            mime=raw_output["mime"],
+                            key="download_raw_companion",
+                        )
+                    elif len(raw_output.get("sheets", [])) > 1:
+                        st.info(f"RAW 데이터가 시트 한도를 넘어 {len(raw_output['sheets'])}개 시트(raw_1..)로 나눠 저장했습니다.")
 
                     # 업로드 버튼 (눌렀을 때만 업로드)
                     if st.button("구글 드라이브로 업로드", key="upload_finance_to_drive"):
@@ -693,6 +651,10 @@ def main():
                                 media = MediaIoBaseUpload(io.BytesIO(xls_bytes), mimetype="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet")
                                 file_metadata = {"name": final_filename, "parents": [folder_id]}
                                 drive.files().create(body=file_metadata, media_body=media, fields="id", supportsAllDrives=True).execute()
+                                if raw_output.get("data"):
+                                    raw_media = MediaIoBaseUpload(io.BytesIO(raw_output["data"]), mimetype=raw_output["mime"], resumable=True)
+                                    raw_metadata = {"name": raw_output["filename"], "parents": [folder_id]}
+                                    drive.files().create(body=raw_metadata, media_body=raw_media, fields="id", supportsAllDrives=True).execute()
                                 st.success(f"구글 드라이브 업로드 완료, https://drive.google.com/drive/u/1/folders/{folder_id} 에서 확인해주세요")
                             else:
                                 st.info("업로드할 폴더 또는 파일 데이터가 없습니다.")
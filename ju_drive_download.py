@@ -0,0 +1,485 @@
+import io
+import mmap
+import os
+import random
+import re
+import tempfile
+import threading
+import time
+import urllib.parse
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable
+
+import requests
+from googleapiclient.http import MediaIoBaseDownload
+
+from ju_file_cache import DiskByteCache
+
+
+# 동시 다운로드 설정(환경변수로 조정 가능)
+DOWNLOAD_WORKERS = int(os.environ.get("DRIVE_DOWNLOAD_WORKERS", "8"))
+DOWNLOAD_TIMEOUT = float(os.environ.get("DRIVE_DOWNLOAD_TIMEOUT", "120"))
+# 구글 스프레드시트 내보내기 형식: "csv"(첫 시트, 빠름) | "xlsx"
+SHEETS_EXPORT_FORMAT = os.environ.get("DRIVE_SHEETS_EXPORT", "csv").lower()
+# 이 크기를 넘는 파일은 메모리 대신 임시 파일로 받음(여러 세션 동시 실행 시 메모리 피크 억제)
+SPILL_THRESHOLD = int(float(os.environ.get("DRIVE_SPILL_THRESHOLD_MB", "32")) * 1024 * 1024)
+# 다운로드 방식: "ranged"(HTTP Range 이어받기 + 재시도) | "chunked"(googleapiclient MediaIoBaseDownload)
+DOWNLOAD_MODE = os.environ.get("DRIVE_DOWNLOAD_MODE", "ranged").lower()
+DOWNLOAD_MAX_RETRIES = int(os.environ.get("DRIVE_DOWNLOAD_RETRIES", "5"))
+BACKOFF_BASE = 0.5
+BACKOFF_MAX = 30.0
+
+DRIVE_API_URL = "https://www.googleapis.com/drive/v3"
+_RETRY_STATUS = {408, 429, 500, 502, 503, 504}
+
+GOOGLE_SHEETS_MIME = "application/vnd.google-apps.spreadsheet"
+_EXPORT_MIME_TYPES = {
+    "csv": "text/csv",
+    "xlsx": "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
+}
+# CSV는 표시 형식 그대로 내보내지므로 통화/퍼센트 서식 숫자가 있으면 xlsx가 필요
+_CURRENCY_SIGNS = b"|".join(re.escape(c.encode("utf-8")) for c in ("₩", "￦", "$", "€", "¥"))
+_FORMATTED_NUMBER_RE = re.compile(
+    rb'(?:^|,)"?(?:(?:' + _CURRENCY_SIGNS + rb')\s?-?\d|-?\d[\d,.]*\s?%"?(?=,|\r?$))',
+    re.MULTILINE,
+)
+
+EXCEL_MIME_TYPES = (
+    "application/vnd.ms-excel",
+    "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
+    GOOGLE_SHEETS_MIME,
+)
+
+# 스레드별 Drive 서비스(googleapiclient/httplib2 객체는 스레드 간 공유 불가)
+_thread_local = threading.local()
+
+
+def is_excel_file(f: dict) -> bool:
+    name = (f.get("name") or "").lower()
+    return name.endswith((".xlsx", ".xls")) or f.get("mimeType") in EXCEL_MIME_TYPES
+
+
+class SpillWriter:
+    """다운로드 청크를 받는 쓰기 대상.
+
+    threshold까지는 BytesIO에 쌓고, 넘으면 그때까지의 내용과 이후 청크를 임시 파일로 넘깁니다.
+    result()는 메모리면 BytesIO(복사 없음), 디스크면 임시 파일 경로(str)를 반환합니다.
+    """
+
+    def __init__(self, threshold: int = SPILL_THRESHOLD):
+        self.threshold = threshold
+        self.size = 0
+        self.path: str | None = None
+        self._mem: io.BytesIO | None = io.BytesIO()
+        self._file = None
+
+    def write(self, data) -> int:
+        if self._file is None and self.size + len(data) > self.threshold:
+            fd, self.path = tempfile.mkstemp(prefix="ju_dl_", suffix=".bin")
+            self._file = os.fdopen(fd, "wb")
+            self._file.write(self._mem.getbuffer())
+            self._mem = None
+        (self._file or self._mem).write(data)
+        self.size += len(data)
+        return len(data)
+
+    def reset(self) -> None:
+        # 서버가 Range를 무시하고 처음부터 보내는 경우 처음부터 다시 씀
+        if self._file is not None:
+            self._file.seek(0)
+            self._file.truncate()
+        else:
+            self._mem = io.BytesIO()
+        self.size = 0
+
+    def result(self) -> io.BytesIO | str:
+        if self._file is not None:
+            self._file.close()
+            return self.path
+        self._mem.seek(0)
+        return self._mem
+
+    def discard(self) -> None:
+        if self._file is not None:
+            self._file.close()
+            release_content(self.path)
+        self._mem = None
+
+
+def release_content(content) -> None:
+    """임시 파일로 받은 내용(str 경로)을 삭제합니다. 메모리 내용은 무시."""
+    if isinstance(content, str):
+        try:
+            os.unlink(content)
+        except OSError:
+            pass
+
+
+def release_contents(contents: list) -> None:
+    for content in contents:
+        release_content(content)
+
+
+def content_view(content):
+    """내용을 복사 없이 훑어볼 수 있는 bytes-like(메모리: memoryview, 파일: mmap)를 반환합니다."""
+    if isinstance(content, io.BytesIO):
+        return content.getbuffer()
+    if isinstance(content, str):
+        with open(content, "rb") as f:
+            if os.fstat(f.fileno()).st_size == 0:
+                return b""
+            return mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+    return content
+
+
+def drive_download_content(
+    _drive,
+    file_id: str,
+    mime_type: str | None,
+    deadline: float | None = None,
+    export_format: str = "xlsx",
+    spill_threshold: int | None = None,
+) -> io.BytesIO | str:
+    """Drive 파일 1개를 내려받습니다.
+
+    구글 스프레드시트는 export_format("csv" | "xlsx")으로 내보냅니다.
+    spill_threshold 이하면 BytesIO, 초과하면 임시 파일 경로(str)를 반환합니다.
+    deadline(time.monotonic 기준)을 넘기면 TimeoutError를 발생시킵니다.
+    """
+    if mime_type == GOOGLE_SHEETS_MIME:
+        request = _drive.files().export_media(
+            fileId=file_id,
+            mimeType=_EXPORT_MIME_TYPES.get(export_format, _EXPORT_MIME_TYPES["xlsx"]),
+        )
+    else:
+        request = _drive.files().get_media(fileId=file_id, supportsAllDrives=True)
+    fh = SpillWriter(SPILL_THRESHOLD if spill_threshold is None else spill_threshold)
+    try:
+        downloader = MediaIoBaseDownload(fh, request)
+        done = False
+        while not done:
+            if deadline is not None and time.monotonic() > deadline:
+                raise TimeoutError(f"다운로드 시간 초과: {file_id}")
+            status, done = downloader.next_chunk()
+    except BaseException:
+        fh.discard()
+        raise
+    return fh.result()
+
+
+def csv_needs_xlsx(content) -> bool:
+    """CSV 내보내기 결과에 서식이 적용된 숫자(₩1,000 / 10% 등)가 있으면 True."""
+    view = content_view(content)
+    try:
+        return bool(_FORMATTED_NUMBER_RE.search(view))
+    finally:
+        if isinstance(view, mmap.mmap):
+            view.close()
+        elif isinstance(view, memoryview):
+            view.release()
+
+
+class RetryableDownloadError(Exception):
+    pass
+
+
+def _backoff_delay(attempt: int, retry_after: str | None = None) -> float:
+    # Retry-After(초)가 있으면 우선, 없으면 지수 백오프 + full jitter
+    if retry_after:
+        try:
+            return min(BACKOFF_MAX, max(0.0, float(retry_after)))
+        except ValueError:
+            pass
+    return random.uniform(0, min(BACKOFF_MAX, BACKOFF_BASE * (2 ** attempt)))
+
+
+def ranged_download(
+    session: requests.Session,
+    url: str,
+    sink: SpillWriter,
+    max_retries: int = DOWNLOAD_MAX_RETRIES,
+    deadline: float | None = None,
+    chunk_size: int = 1024 * 1024,
+    sleep: Callable[[float], None] = time.sleep,
+) -> int:
+    """url을 sink로 내려받고 사용한 재시도 횟수를 반환합니다.
+
+    연결 끊김/타임아웃/429·5xx는 지수 백오프(+jitter) 후 재시도하며, 이미 받은 바이트 이후부터
+    Range 요청으로 이어받습니다. 서버가 Range를 무시(200)하면 처음부터 다시 받습니다.
+    """
+    retries = 0
+    while True:
+        offset = sink.size
+        headers = {"Accept-Encoding": "identity"}
+        if offset:
+            headers["Range"] = f"bytes={offset}-"
+        remaining = None if deadline is None else deadline - time.monotonic()
+        if remaining is not None and remaining <= 0:
+            raise TimeoutError(f"다운로드 시간 초과: {url}")
+        retry_after = None
+        try:
+            with session.get(url, headers=headers, stream=True, timeout=(10, remaining or DOWNLOAD_TIMEOUT)) as resp:
+                if resp.status_code == 416 and offset:
+                    # 이미 끝까지 받은 상태
+                    return retries
+                if resp.status_code in _RETRY_STATUS:
+                    retry_after = resp.headers.get("Retry-After")
+                    raise RetryableDownloadError(f"HTTP {resp.status_code}")
+                resp.raise_for_status()
+                if offset and resp.status_code == 200:
+                    sink.reset()
+                total = None
+                content_range = resp.headers.get("Content-Range")
+                if content_range and "/" in content_range and not content_range.endswith("/*"):
+                    total = int(content_range.rsplit("/", 1)[1])
+                elif resp.headers.get("Content-Length") is not None:
+                    total = sink.size + int(resp.headers["Content-Length"])
+                for chunk in resp.iter_content(chunk_size):
+                    if deadline is not None and time.monotonic() > deadline:
+                        raise TimeoutError(f"다운로드 시간 초과: {url}")
+                    sink.write(chunk)
+                if total is not None and sink.size < total:
+                    raise RetryableDownloadError(f"응답이 중간에 끊김({sink.size}/{total} bytes)")
+                return retries
+        except (requests.ConnectionError, requests.Timeout, requests.exceptions.ChunkedEncodingError, RetryableDownloadError):
+            if retries >= max_retries:
+                raise
+            delay = _backoff_delay(retries, retry_after)
+            if deadline is not None and time.monotonic() + delay > deadline:
+                raise
+            retries += 1
+            sleep(delay)
+
+
+def drive_media_url(file_id: str, mime_type: str | None, export_format: str = "xlsx") -> str:
+    quoted = urllib.parse.quote(file_id, safe="")
+    if mime_type == GOOGLE_SHEETS_MIME:
+        export_mime = _EXPORT_MIME_TYPES.get(export_format, _EXPORT_MIME_TYPES["xlsx"])
+        return f"{DRIVE_API_URL}/files/{quoted}/export?mimeType={urllib.parse.quote(export_mime, safe='')}"
+    return f"{DRIVE_API_URL}/files/{quoted}?alt=media&supportsAllDrives=true"
+
+
+def ranged_drive_download(
+    session: requests.Session,
+    file_id: str,
+    mime_type: str | None,
+    deadline: float | None = None,
+    export_format: str = "xlsx",
+    spill_threshold: int | None = None,
+    stats: dict | None = None,
+) -> io.BytesIO | str:
+    """drive_download_content와 같은 결과를 인증된 requests 세션 + Range 이어받기로 얻습니다.
+
+    stats가 주어지면 stats["retries"]에 재시도 횟수를 누적합니다.
+    """
+    sink = SpillWriter(SPILL_THRESHOLD if spill_threshold is None else spill_threshold)
+    try:
+        retries = ranged_download(session, drive_media_url(file_id, mime_type, export_format), sink, deadline=deadline)
+    except BaseException:
+        sink.discard()
+        raise
+    if stats is not None:
+        stats["retries"] = stats.get("retries", 0) + retries
+    return sink.result()
+
+
+def download_sheet_or_file(
+    _drive,
+    f: dict,
+    deadline: float | None = None,
+    sheets_export: str = SHEETS_EXPORT_FORMAT,
+    stats: dict | None = None,
+) -> io.BytesIO | str:
+    """스프레드시트는 CSV로 먼저 받고, 실패하거나 서식 숫자가 있으면 xlsx로 다시 받습니다.
+
+    _drive가 requests 세션이면 Range 이어받기 방식, googleapiclient 서비스면 청크 방식으로 받습니다.
+    """
+    if isinstance(_drive, requests.Session):
+        def fetch(export_format):
+            return ranged_drive_download(_drive, f.get("id"), mime, deadline=deadline, export_format=export_format, stats=stats)
+    else:
+        def fetch(export_format):
+            return drive_download_content(_drive, f.get("id"), mime, deadline=deadline, export_format=export_format)
+
+    mime = f.get("mimeType")
+    if mime == GOOGLE_SHEETS_MIME and sheets_export == "csv":
+        try:
+            content = fetch("csv")
+            if not csv_needs_xlsx(content):
+                return content
+            release_content(content)
+        except TimeoutError:
+            raise
+        except Exception:
+            pass
+    return fetch("xlsx")
+
+
+def cache_key(f: dict) -> tuple | None:
+    # modifiedTime이 없으면 변경 여부를 알 수 없으므로 캐시하지 않음
+    if not f.get("id") or not f.get("modifiedTime"):
+        return None
+    key = (f.get("id"), f.get("modifiedTime"), f.get("mimeType") or "")
+    if f.get("mimeType") == GOOGLE_SHEETS_MIME:
+        key += (SHEETS_EXPORT_FORMAT,)
+    return key
+
+
+def _thread_drive(drive_factory: Callable):
+    services = getattr(_thread_local, "services", None)
+    if services is None:
+        services = _thread_local.services = {}
+    if drive_factory not in services:
+        services[drive_factory] = drive_factory()
+    return services[drive_factory]
+
+
+def download_drive_files(
+    _drive,
+    files: list[dict],
+    max_workers: int | None = None,
+    timeout: float | None = None,
+    drive_factory: Callable | None = None,
+    cache: DiskByteCache | None = None,
+    report: dict | None = None,
+) -> list[io.BytesIO | bytes | str | None]:
+    """files 순서 그대로 내용을 내려받아 리스트로 반환합니다.
+
+    - 내용은 BytesIO/bytes(메모리) 또는 임시 파일 경로(str, SPILL_THRESHOLD 초과분)
+      → 사용 후 release_contents()로 임시 파일을 정리해야 합니다
+    - 엑셀이 아니거나 실패한 파일 자리는 None
+    - max_workers > 1 이고 drive_factory가 있으면 스레드풀로 동시 다운로드
+      (drive_factory는 스레드마다 한 번 호출되어 전용 Drive 서비스 또는 인증된 requests 세션을 만듭니다)
+    - timeout: 파일당 최대 소요 시간(초)
+    - cache: 지정 시 (id, modifiedTime)이 같은 파일은 로컬 디스크에서 읽음
+    - report: 지정 시 {"retried": [{name, retries}], "failed": [{name, error}]}를 채움
+    """
+    workers = DOWNLOAD_WORKERS if max_workers is None else max(1, int(max_workers))
+    per_file_timeout = DOWNLOAD_TIMEOUT if timeout is None else timeout
+    report_lock = threading.Lock()
+
+    def _fetch(f: dict, get_drive: Callable) -> io.BytesIO | str | None:
+        deadline = time.monotonic() + per_file_timeout if per_file_timeout else None
+        key = cache_key(f) if cache is not None else None
+        stats: dict = {}
+        try:
+            content = download_sheet_or_file(get_drive(), f, deadline=deadline, stats=stats)
+        except Exception as e:
+            # 개별 파일 오류는 건너뛰고 계속 진행(보고서에는 기록)
+            if report is not None:
+                with report_lock:
+                    report.setdefault("failed", []).append({"name": f.get("name"), "error": str(e), "retries": stats.get("retries", 0)})
+            return None
+        if report is not None and stats.get("retries"):
+            with report_lock:
+                report.setdefault("retried", []).append({"name": f.get("name"), "retries": stats["retries"]})
+        if key is not None:
+            cache.put(key, content)
+        return content
+
+    # 캐시 적중분은 네트워크 없이 바로 채움
+    results: list[io.BytesIO | bytes | str | None] = [None] * len(files)
+    pending: list[int] = []
+    for i, f in enumerate(files):
+        if not is_excel_file(f):
+            continue
+        key = cache_key(f) if cache is not None else None
+        cached = cache.get(key, spill_threshold=SPILL_THRESHOLD) if key is not None else None
+        if cached is not None:
+            results[i] = cached
+        else:
+            pending.append(i)
+
+    get_drive = (lambda: _thread_drive(drive_factory)) if drive_factory is not None else (lambda: _drive)
+    if workers <= 1 or drive_factory is None or len(pending) <= 1:
+        for i in pending:
+            results[i] = _fetch(files[i], get_drive)
+        return results
+
+    with ThreadPoolExecutor(max_workers=min(workers, len(pending)), thread_name_prefix="drive-dl") as pool:
+        futures = {i: pool.submit(_fetch, files[i], get_drive) for i in pending}
+        for i, fut in futures.items():
+            results[i] = fut.result()
+    return results
+
+
+def self_check() -> None:
+    """로컬 가짜 HTTP 서버로 Range 이어받기/재시도를 확인합니다.
+
+    파일별로 첫 응답을 망가뜨립니다: 본문 중간 끊김(다음 요청은 Range 206), 중간 끊김 후 Range 무시(200 전체),
+    503 + Retry-After. 받은 bytes가 원본과 같고 report에 재시도가 기록되는지 확인합니다.
+    """
+    import socket
+    from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+    global DRIVE_API_URL
+    # 1MB 청크보다 커야 끊기기 전에 받은 부분이 남아 이어받기가 일어남
+    data = random.Random(0).randbytes(2_500_000)
+    seen: dict[str, int] = {}
+    ranged: set[str] = set()
+
+    class Handler(BaseHTTPRequestHandler):
+        def log_message(self, *args):
+            pass
+
+        def _send(self, status: int, body: bytes, headers: dict, cut: bool = False) -> None:
+            self.send_response(status)
+            for k, v in headers.items():
+                self.send_header(k, v)
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            if cut:
+                # Content-Length보다 적게 보내고 연결을 끊음
+                self.wfile.write(body[: len(body) // 2])
+                self.wfile.flush()
+                self.connection.shutdown(socket.SHUT_RDWR)
+                self.close_connection = True
+                return
+            self.wfile.write(body)
+
+        def do_GET(self):
+            scenario = self.path.split("?")[0].rsplit("/", 1)[-1]
+            attempt = seen[scenario] = seen.get(scenario, 0) + 1
+            rng = self.headers.get("Range")
+            offset = int(rng.split("=", 1)[1].rstrip("-")) if rng else 0
+            if offset:
+                ranged.add(scenario)
+            if scenario == "busy" and attempt == 1:
+                self._send(503, b"", {"Retry-After": "0"})
+            elif scenario in ("cut", "norange") and attempt == 1:
+                self._send(200, data, {}, cut=True)
+            elif offset and scenario == "cut":
+                self._send(206, data[offset:], {"Content-Range": f"bytes {offset}-{len(data) - 1}/{len(data)}"})
+            else:
+                # Range 무시: 항상 전체를 200으로
+                self._send(200, data, {})
+
+    server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    saved_url = DRIVE_API_URL
+    DRIVE_API_URL = f"http://127.0.0.1:{server.server_address[1]}"
+    try:
+        files = [{"id": name, "name": f"{name}.xlsx"} for name in ("cut", "norange", "busy", "clean")]
+        report: dict = {}
+        with requests.Session() as session:
+            contents = download_drive_files(session, files, max_workers=1, timeout=30, report=report)
+        for f, content in zip(files, contents):
+            assert content is not None, f["id"]
+            got = content.getvalue() if isinstance(content, io.BytesIO) else open(content, "rb").read()
+            assert got == data, f"{f['id']}: {len(got)} bytes"
+        release_contents(contents)
+        retried = {item["name"]: item["retries"] for item in report.get("retried", [])}
+        assert retried == {"cut.xlsx": 1, "norange.xlsx": 1, "busy.xlsx": 1}, retried
+        assert not report.get("failed"), report
+        assert seen == {"cut": 2, "norange": 2, "busy": 2, "clean": 1}, seen
+        # 끊긴 두 파일은 이어받기(Range)를 요청했어야 함
+        assert ranged == {"cut", "norange"}, ranged
+    finally:
+        DRIVE_API_URL = saved_url
+        server.shutdown()
+        server.server_close()
+    print("ok", retried)
+
+
+if __name__ == "__main__":
+    self_check()
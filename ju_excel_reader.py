@@ -0,0 +1,338 @@
+import importlib.util
+import io
+import mmap
+import multiprocessing
+import os
+import pickle
+import re
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+
+import pandas as pd
+
+from ju_frame_store import restore_object_nulls
+
+
+# 엑셀 읽기 엔진 설정: "auto" | "calamine" | "openpyxl" | "xlrd" (환경변수로 조정 가능)
+EXCEL_READER_ENGINE = os.environ.get("EXCEL_READER_ENGINE", "auto")
+# 프로세스풀 파싱 워커 수: 0/1이면 현재 프로세스에서 순차 파싱
+EXCEL_PARSE_WORKERS = int(os.environ.get("EXCEL_PARSE_WORKERS", "0"))
+
+# auto 선택 시 우선순위(설치된 것 중 빠른 순)
+_ENGINE_MODULES = {
+    "calamine": "python_calamine",  # Rust 구현, openpyxl 대비 수 배~수십 배 빠름
+    "openpyxl": "openpyxl",         # pandas 기본값(read_only 스트리밍 모드로 열림)
+    "xlrd": "xlrd",                 # 구형 .xls 전용
+}
+_XLSX_ORDER = ("calamine", "openpyxl")
+_XLS_ORDER = ("calamine", "xlrd")
+
+
+def available_engines() -> list[str]:
+    return [name for name, module in _ENGINE_MODULES.items() if importlib.util.find_spec(module) is not None]
+
+
+def _head(src, n: int = 4) -> bytes:
+    if isinstance(src, (bytes, bytearray, memoryview)):
+        return bytes(src[:n])
+    if hasattr(src, "read") and hasattr(src, "seek"):
+        pos = src.tell()
+        head = src.read(n)
+        src.seek(pos)
+        return head
+    if isinstance(src, (str, os.PathLike)):
+        try:
+            with open(src, "rb") as f:
+                return f.read(n)
+        except OSError:
+            return b""
+    return b""
+
+
+def _is_legacy_xls(src) -> bool:
+    # OLE2 시그니처(D0 CF 11 E0)면 .xls
+    return _head(src) == b"\xd0\xcf\x11\xe0"
+
+
+def engine_candidates(src, engine: str | None = None) -> list[str]:
+    """읽기 시도할 엔진 목록(앞에서부터 시도)을 반환합니다."""
+    choice = (engine or EXCEL_READER_ENGINE or "auto").lower()
+    installed = available_engines()
+    order = _XLS_ORDER if _is_legacy_xls(src) else _XLSX_ORDER
+    if choice == "auto":
+        return [e for e in order if e in installed]
+    # 지정 엔진이 없거나 실패하면 auto 순서로 대체
+    return [choice] + [e for e in order if e in installed and e != choice]
+
+
+def read_excel(src, engine: str | None = None, **kwargs) -> pd.DataFrame:
+    """pd.read_excel 대체: 설치된 가장 빠른 엔진으로 읽고, 실패하면 다음 엔진으로 넘어갑니다.
+
+    src: 경로, bytes 또는 파일 객체. engine 미지정 시 EXCEL_READER_ENGINE 설정을 따릅니다.
+    """
+    if isinstance(src, (bytes, bytearray, memoryview)):
+        src = io.BytesIO(src)
+    candidates = engine_candidates(src, engine)
+    last_error = None
+    for name in candidates:
+        if hasattr(src, "seek"):
+            src.seek(0)
+        try:
+            return pd.read_excel(src, engine=name, **kwargs)
+        except Exception as e:
+            last_error = e
+    if last_error is not None:
+        raise last_error
+    # 사용할 수 있는 엔진이 없으면 pandas 자동 판별에 맡김
+    return pd.read_excel(src, **kwargs)
+
+
+def _is_csv(content) -> bool:
+    # xlsx(zip: PK..) / xls(OLE2)가 아니면 스프레드시트 CSV 내보내기로 간주
+    head = _head(content)
+    return not (head.startswith(b"PK") or head == b"\xd0\xcf\x11\xe0")
+
+
+# 0 다음 숫자로 시작하는 CSV 필드("01234", 우편번호/상품코드 등). 숫자로 추론되면 앞자리 0이 사라짐
+# (따옴표 안 천 단위 숫자 "1,000"의 ",000"은 뒤에 따옴표가 오므로 제외)
+_LEADING_ZERO_RE = re.compile(rb'[,\n](?:"[+-]?0\d|[+-]?0\d[\d.]*(?=[,\r\n]|\Z))')
+
+
+def _has_leading_zero_field(content) -> bool:
+    if isinstance(content, io.BytesIO):
+        view = content.getbuffer()
+        try:
+            return bool(_LEADING_ZERO_RE.search(view))
+        finally:
+            view.release()
+    if isinstance(content, (str, os.PathLike)):
+        with open(content, "rb") as f:
+            if os.fstat(f.fileno()).st_size == 0:
+                return False
+            with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as view:
+                return bool(_LEADING_ZERO_RE.search(view))
+    return True
+
+
+def _read_csv(content, **kwargs) -> pd.DataFrame:
+    if hasattr(content, "seek"):
+        content.seek(0)
+    return pd.read_csv(
+        content,
+        encoding="utf-8-sig",
+        low_memory=False,
+        memory_map=isinstance(content, (str, os.PathLike)),
+        **kwargs,
+    )
+
+
+def read_sheet(content, engine: str | None = None, **kwargs) -> pd.DataFrame:
+    """내려받은 내용(bytes / BytesIO / 임시 파일 경로)을 형식(xlsx/xls/CSV)에 맞게 읽습니다.
+
+    - 메모리 내용은 BytesIO를 그대로 넘겨 복사하지 않고, 파일은 핸들(CSV는 memory map)로 읽습니다
+    - CSV는 C 파서로 한 번에 읽어 컬럼 dtype을 전체 기준으로 한 번만 추론합니다(low_memory=False)
+    - 앞자리 0 값("01234")이 있으면 숫자로 추론된 컬럼만 문자열로 다시 읽어, 0으로 시작하는 값이 있는 컬럼은 문자열로 둡니다
+    """
+    if isinstance(content, (bytes, bytearray, memoryview)):
+        content = io.BytesIO(content)
+    if not _is_csv(content):
+        return read_excel(content, engine=engine, **kwargs)
+    check_zeros = "dtype" not in kwargs and "usecols" not in kwargs and _has_leading_zero_field(content)
+    df = _read_csv(content, thousands=",", **kwargs)
+    numeric = [i for i, dtype in enumerate(df.dtypes) if pd.api.types.is_numeric_dtype(dtype) and not pd.api.types.is_bool_dtype(dtype)]
+    if not check_zeros or not numeric:
+        return df
+    text = _read_csv(content, **{**kwargs, "usecols": numeric, "dtype": str})
+    for i, col in zip(numeric, text.columns):
+        values = text[col]
+        if values.str.match(r"[+-]?0\d", na=False).any():
+            df.isetitem(i, values.to_numpy())
+    return df
+
+
+def _parse_to_payload(content: bytes | str, engine: str | None) -> tuple[str, bytes]:
+    """(워커 프로세스) 파싱 후 Arrow IPC 스트림으로 직렬화합니다. Arrow 변환 불가 시 pickle."""
+    df = read_sheet(content, engine=engine)
+    try:
+        import pyarrow as pa
+
+        table = pa.Table.from_pandas(df, preserve_index=False)
+        sink = pa.BufferOutputStream()
+        with pa.ipc.new_stream(sink, table.schema) as writer:
+            writer.write_table(table)
+        return "arrow", sink.getvalue().to_pybytes()
+    except Exception:
+        return "pickle", pickle.dumps(df, protocol=pickle.HIGHEST_PROTOCOL)
+
+
+def _payload_to_frame(kind: str, payload: bytes) -> pd.DataFrame:
+    if kind == "arrow":
+        import pyarrow as pa
+
+        # Arrow를 거치면 object 결측이 None이 되므로 현재 프로세스에서 읽은 것과 같게 NaN으로
+        return restore_object_nulls(pa.ipc.open_stream(payload).read_all().to_pandas())
+    return pickle.loads(payload)
+
+
+_pool: ProcessPoolExecutor | None = None
+_pool_workers = 0
+_pool_lock = threading.Lock()
+
+
+def _get_pool(workers: int) -> ProcessPoolExecutor:
+    # 세션/재실행 간 재사용. Streamlit은 멀티스레드이므로 fork 대신 spawn으로 워커 생성
+    global _pool, _pool_workers
+    with _pool_lock:
+        if _pool is None or _pool_workers != workers:
+            if _pool is not None:
+                _pool.shutdown(wait=False, cancel_futures=True)
+            _pool = ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context("spawn"))
+            _pool_workers = workers
+        return _pool
+
+
+def _reset_pool() -> None:
+    global _pool
+    with _pool_lock:
+        if _pool is not None:
+            _pool.shutdown(wait=False, cancel_futures=True)
+        _pool = None
+
+
+def _picklable(content) -> bytes | str:
+    if isinstance(content, io.BytesIO):
+        return content.getvalue()
+    if isinstance(content, (bytearray, memoryview)):
+        return bytes(content)
+    return content
+
+
+def parse_excels(contents: list, max_workers: int | None = None, engine: str | None = None) -> list[pd.DataFrame | None]:
+    """여러 워크북(또는 CSV) 내용(bytes / BytesIO / 임시 파일 경로)을 파싱해 같은 순서의 DataFrame 리스트로 반환합니다.
+
+    - None이거나 파싱에 실패한 자리는 None
+    - max_workers > 1이면 프로세스풀에서 병렬 파싱(GIL 회피), 결과는 Arrow IPC로 전달
+    """
+    workers = EXCEL_PARSE_WORKERS if max_workers is None else int(max_workers)
+    results: list[pd.DataFrame | None] = [None] * len(contents)
+    pending = [i for i, c in enumerate(contents) if c is not None]
+
+    def _parse_inline(i: int) -> None:
+        try:
+            results[i] = read_sheet(contents[i], engine=engine)
+        except Exception:
+            results[i] = None
+
+    if workers <= 1 or len(pending) <= 1:
+        for i in pending:
+            _parse_inline(i)
+        return results
+
+    try:
+        pool = _get_pool(min(workers, os.cpu_count() or 1))
+        # 임시 파일은 경로만 넘기고(워커가 직접 읽음), 메모리 내용만 bytes로 전달
+        futures = {i: pool.submit(_parse_to_payload, _picklable(contents[i]), engine) for i in pending}
+    except (BrokenProcessPool, RuntimeError, OSError):
+        _reset_pool()
+        for i in pending:
+            _parse_inline(i)
+        return results
+    for i, fut in futures.items():
+        try:
+            results[i] = _payload_to_frame(*fut.result())
+        except BrokenProcessPool:
+            # 워커가 죽으면 풀을 버리고 남은 파일은 현재 프로세스에서 처리
+            _reset_pool()
+            _parse_inline(i)
+        except Exception:
+            results[i] = None
+    return results
+
+
+def _make_workbook(n_rows: int, n_cols: int = 12) -> bytes:
+    from openpyxl import Workbook
+
+    wb = Workbook(write_only=True)
+    ws = wb.create_sheet("Sheet1")
+    ws.append([f"컬럼{j}" for j in range(n_cols)])
+    for i in range(n_rows):
+        ws.append([
+            (f"상품{i % 500}" if j % 3 == 0 else (i * j if j % 3 == 1 else float(i) / (j + 1)))
+            for j in range(n_cols)
+        ])
+    bio = io.BytesIO()
+    wb.save(bio)
+    return bio.getvalue()
+
+
+def benchmark(sizes: tuple[int, ...] = (1_000, 10_000, 100_000), repeat: int = 3) -> pd.DataFrame:
+    """설치된 엔진별 읽기 시간을 생성한 워크북 크기별로 비교합니다."""
+    rows = []
+    for n in sizes:
+        content = _make_workbook(n)
+        for name in available_engines():
+            if name == "xlrd":
+                continue
+            best = None
+            for _ in range(repeat):
+                t0 = time.perf_counter()
+                df = pd.read_excel(io.BytesIO(content), engine=name)
+                elapsed = time.perf_counter() - t0
+                best = elapsed if best is None else min(best, elapsed)
+            rows.append({
+                "rows": n,
+                "bytes": len(content),
+                "engine": name,
+                "seconds": round(best, 4),
+                "rows_per_sec": int(len(df) / best) if best else 0,
+            })
+    return pd.DataFrame(rows)
+
+
+def self_check() -> None:
+    """워커 경로(Arrow IPC 왕복) 결과가 현재 프로세스에서 바로 읽은 것과 같은지 확인합니다."""
+    from openpyxl import Workbook
+    from pandas.testing import assert_frame_equal
+
+    wb = Workbook()
+    ws = wb.active
+    ws.append(["상품명", "옵션", "수량", "비고"])
+    ws.append(["상품A", "옵션1", 1, None])
+    ws.append(["상품B", None, 2, None])
+    ws.append([None, "옵션2", 3, None])
+    bio = io.BytesIO()
+    wb.save(bio)
+    content = bio.getvalue()
+
+    inline = read_sheet(content)
+    via_payload = _payload_to_frame(*_parse_to_payload(content, None))
+    assert_frame_equal(via_payload, inline)
+    # None과 NaN은 assert_frame_equal에서 같게 취급되므로 문자열로도 비교
+    assert_frame_equal(via_payload.astype(str), inline.astype(str))
+
+    # CSV 내보내기: 앞자리 0 코드는 문자열 그대로, 천 단위 쉼표 숫자는 숫자로
+    csv = "상품코드,우편번호,수량,금액,비고\n01234,06236,1,\"1,000\",\n00500,12345,2,2500.5,NA\n"
+    got = read_sheet(csv.encode("utf-8-sig"))
+    expected = pd.DataFrame({
+        "상품코드": ["01234", "00500"],
+        "우편번호": ["06236", "12345"],
+        "수량": [1, 2],
+        "금액": [1000.0, 2500.5],
+        "비고": [float("nan"), float("nan")],
+    })
+    assert_frame_equal(got, expected)
+    assert_frame_equal(got.astype(str), expected.astype(str))
+    print("ok")
+
+
+if __name__ == "__main__":
+    # 사용법: python ju_excel_reader.py [행수 ...] | python ju_excel_reader.py --check
+    import sys
+
+    if sys.argv[1:] == ["--check"]:
+        self_check()
+        sys.exit(0)
+    sizes = tuple(int(x) for x in sys.argv[1:]) or (1_000, 10_000, 100_000)
+    print(benchmark(sizes).to_string(index=False))
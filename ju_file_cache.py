@@ -0,0 +1,161 @@
+import hashlib
+import io
+import os
+import shutil
+import tempfile
+import threading
+
+
+# 로컬 바이트 캐시 설정(환경변수로 조정 가능)
+CACHE_DIR = os.environ.get("DRIVE_CACHE_DIR") or os.path.join(tempfile.gettempdir(), "ju_drive_cache")
+CACHE_MAX_BYTES = int(float(os.environ.get("DRIVE_CACHE_MAX_MB", "1024")) * 1024 * 1024)
+# 이 횟수만큼 저장할 때마다 디렉터리를 다시 훑어 합계를 맞춤(다른 프로세스가 같은 디렉터리를 쓰는 경우)
+CACHE_RESCAN_PUTS = int(os.environ.get("DRIVE_CACHE_RESCAN_PUTS", "64"))
+
+
+class DiskByteCache:
+    """(파일 id, modifiedTime) 키로 Drive 파일 bytes를 로컬 디스크에 보관합니다.
+
+    - 키가 같으면 내용도 같다고 보고 그대로 재사용(파일이 수정되면 modifiedTime이 바뀜)
+    - 전체 용량이 max_bytes를 넘으면 가장 오래 사용하지 않은 항목부터 삭제(LRU, mtime 기준)
+    - 전체 용량은 저장할 때마다 증분으로 더하고, 한도를 넘거나 rescan_puts번 저장했을 때만 디렉터리를 훑음
+    """
+
+    def __init__(self, root: str = CACHE_DIR, max_bytes: int = CACHE_MAX_BYTES, rescan_puts: int = CACHE_RESCAN_PUTS):
+        self.root = root
+        self.max_bytes = max_bytes
+        self.rescan_puts = max(1, rescan_puts)
+        self._lock = threading.Lock()
+        # 추정 전체 용량(None이면 아직 훑지 않음)과 마지막으로 훑은 뒤 저장 횟수
+        self._total: int | None = None
+        self._puts = 0
+        try:
+            os.makedirs(self.root, exist_ok=True)
+        except OSError:
+            # 만들 수 없으면 get은 항상 없음, put은 건너뜀
+            pass
+
+    def _path(self, key: tuple) -> str:
+        digest = hashlib.sha256("\x1f".join(map(str, key)).encode("utf-8")).hexdigest()
+        return os.path.join(self.root, digest[:2], digest + ".bin")
+
+    def get(self, key: tuple, spill_threshold: int | None = None) -> bytes | str | None:
+        """캐시 내용을 반환합니다. spill_threshold보다 크면 임시 파일로 복사해 그 경로(str)를 반환."""
+        path = self._path(key)
+        try:
+            size = os.path.getsize(path)
+            if spill_threshold is not None and size > spill_threshold:
+                fd, tmp_path = tempfile.mkstemp(prefix="ju_dl_", suffix=".bin")
+                os.close(fd)
+                shutil.copyfile(path, tmp_path)
+                data = tmp_path
+            else:
+                with open(path, "rb") as f:
+                    data = f.read()
+            # 사용 시각 갱신(LRU)
+            os.utime(path, None)
+            return data
+        except OSError:
+            return None
+
+    def put(self, key: tuple, data) -> None:
+        """data: bytes / BytesIO / 파일 경로(str)"""
+        if isinstance(data, str):
+            try:
+                size = os.path.getsize(data)
+            except OSError:
+                return
+        else:
+            if isinstance(data, io.BytesIO):
+                data = data.getbuffer()
+            size = len(data)
+        path = self._path(key)
+        tmp_path = None
+        # 캐시는 보조 수단이므로 디스크 부족/쓰기 권한 없음 등은 저장만 건너뜀(다운로드는 성공 처리)
+        try:
+            if size > self.max_bytes:
+                return
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path), suffix=".tmp")
+            with os.fdopen(fd, "wb") as f:
+                if isinstance(data, str):
+                    with open(data, "rb") as src:
+                        shutil.copyfileobj(src, f)
+                else:
+                    f.write(data)
+            try:
+                replaced = os.path.getsize(path)
+            except OSError:
+                replaced = 0
+            # 다른 세션/스레드와 경쟁해도 반쯤 쓰인 파일이 보이지 않도록 원자적 교체
+            os.replace(tmp_path, path)
+        except OSError:
+            if tmp_path is not None:
+                try:
+                    os.unlink(tmp_path)
+                except OSError:
+                    pass
+            return
+        finally:
+            if isinstance(data, memoryview):
+                data.release()
+        with self._lock:
+            self._puts += 1
+            if self._total is not None:
+                self._total += size - replaced
+            if self._total is not None and self._total <= self.max_bytes and self._puts < self.rescan_puts:
+                return
+        self._evict()
+
+    def _evict(self) -> None:
+        """디렉터리를 훑어 실제 합계를 구하고, 한도를 넘으면 오래된 항목부터 지웁니다."""
+        with self._lock:
+            self._puts = 0
+            entries = []
+            total = 0
+            for dirpath, _, filenames in os.walk(self.root):
+                for name in filenames:
+                    if not name.endswith(".bin"):
+                        continue
+                    path = os.path.join(dirpath, name)
+                    try:
+                        st_ = os.stat(path)
+                    except OSError:
+                        continue
+                    entries.append((st_.st_mtime, st_.st_size, path))
+                    total += st_.st_size
+            if total > self.max_bytes:
+                entries.sort()
+                for _, size, path in entries:
+                    if total <= self.max_bytes:
+                        break
+                    try:
+                        os.unlink(path)
+                        total -= size
+                    except OSError:
+                        pass
+            self._total = total
+
+    def clear(self) -> None:
+        with self._lock:
+            for dirpath, _, filenames in os.walk(self.root):
+                for name in filenames:
+                    try:
+                        os.unlink(os.path.join(dirpath, name))
+                    except OSError:
+                        pass
+            self._total = 0
+            self._puts = 0
+
+
+_default_cache: DiskByteCache | None = None
+_default_lock = threading.Lock()
+
+
+def default_byte_cache() -> DiskByteCache:
+    """프로세스 공용 캐시 인스턴스(세션 간 공유)."""
+    global _default_cache
+    with _default_lock:
+        if _default_cache is None:
+            _default_cache = DiskByteCache()
+        return _default_cache
@@ -0,0 +1,159 @@
+import hashlib
+import json
+import os
+import tempfile
+import threading
+
+import numpy as np
+import pandas as pd
+
+
+# 파싱 결과 스냅샷 저장 위치(환경변수로 조정 가능)
+STORE_DIR = os.environ.get("FRAME_STORE_DIR") or os.path.join(tempfile.gettempdir(), "ju_frame_store")
+
+
+def _atomic_write(path: str, write) -> None:
+    fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path), suffix=".tmp")
+    os.close(fd)
+    try:
+        write(tmp_path)
+        os.replace(tmp_path, path)
+    except Exception:
+        try:
+            os.unlink(tmp_path)
+        except OSError:
+            pass
+        raise
+
+
+def restore_object_nulls(df: pd.DataFrame) -> pd.DataFrame:
+    """Arrow(Parquet/IPC)를 거친 object 컬럼의 결측(None)을 새로 파싱한 프레임처럼 NaN으로 되돌립니다.
+
+    키를 astype(str)로 만들 때 "None"과 "nan"이 섞이지 않도록 합니다.
+    """
+    for col in df.columns[(df.dtypes == object).to_numpy()]:
+        values = df[col]
+        if values.isna().any():
+            df[col] = values.where(values.notna(), np.nan)
+    return df
+
+
+class FolderFrameStore:
+    """드라이브 폴더별로 발주서 파일의 파싱 결과(DataFrame)를 보관합니다.
+
+    - 파일 1개 = 조각 1개(Parquet, 변환 불가 시 pickle)
+    - manifest.json에 파일 id → modifiedTime/조각 경로를 기록
+    - 재수집 시 modifiedTime이 같은 파일은 조각을 그대로 읽고, 목록에서 빠진 파일은 삭제
+    """
+
+    def __init__(self, folder_id: str, root: str = STORE_DIR):
+        digest = hashlib.sha256(str(folder_id).encode("utf-8")).hexdigest()[:16]
+        self.dir = os.path.join(root, digest)
+        self._lock = threading.Lock()
+        os.makedirs(self.dir, exist_ok=True)
+        self._manifest_path = os.path.join(self.dir, "manifest.json")
+        self.manifest = self._load_manifest()
+
+    def _load_manifest(self) -> dict:
+        try:
+            with open(self._manifest_path, "r", encoding="utf-8") as f:
+                data = json.load(f)
+            return data if isinstance(data, dict) else {}
+        except (OSError, ValueError):
+            return {}
+
+    def save(self) -> None:
+        with self._lock:
+            payload = json.dumps(self.manifest, ensure_ascii=False)
+
+            def _write(path):
+                with open(path, "w", encoding="utf-8") as f:
+                    f.write(payload)
+
+            _atomic_write(self._manifest_path, _write)
+
+    def get(self, f: dict) -> pd.DataFrame | None:
+        entry = self.manifest.get(f.get("id") or "")
+        if not entry or not f.get("modifiedTime") or entry.get("modifiedTime") != f.get("modifiedTime"):
+            return None
+        path = os.path.join(self.dir, entry.get("piece", ""))
+        try:
+            if entry.get("format") == "parquet":
+                return restore_object_nulls(pd.read_parquet(path))
+            return pd.read_pickle(path)
+        except Exception:
+            return None
+
+    def put(self, f: dict, df: pd.DataFrame) -> None:
+        file_id = f.get("id")
+        if not file_id or not f.get("modifiedTime"):
+            return
+        stem = hashlib.sha256(f"{file_id}\x1f{f.get('modifiedTime')}".encode("utf-8")).hexdigest()[:24]
+        try:
+            # 컬럼명이 문자열이 아니거나 혼합 타입 object 컬럼은 Parquet 변환이 실패하므로 pickle로 대체
+            piece, fmt = stem + ".parquet", "parquet"
+            _atomic_write(os.path.join(self.dir, piece), lambda p: df.to_parquet(p, index=False))
+        except Exception:
+            piece, fmt = stem + ".pkl", "pickle"
+            try:
+                _atomic_write(os.path.join(self.dir, piece), lambda p: df.to_pickle(p))
+            except Exception:
+                return
+        with self._lock:
+            old = self.manifest.get(file_id)
+            self.manifest[file_id] = {
+                "modifiedTime": f.get("modifiedTime"),
+                "name": f.get("name"),
+                "piece": piece,
+                "format": fmt,
+            }
+        if old and old.get("piece") != piece:
+            self._remove_piece(old.get("piece"))
+
+    def retain(self, files: list[dict]) -> None:
+        """목록에 없는 파일의 조각을 삭제합니다."""
+        keep = {f.get("id") for f in files}
+        with self._lock:
+            removed = [fid for fid in self.manifest if fid not in keep]
+            pieces = [self.manifest.pop(fid).get("piece") for fid in removed]
+        for piece in pieces:
+            self._remove_piece(piece)
+
+    def _remove_piece(self, piece: str | None) -> None:
+        if not piece:
+            return
+        try:
+            os.unlink(os.path.join(self.dir, piece))
+        except OSError:
+            pass
+
+
+def self_check() -> None:
+    """get(put(df))가 df와 같은지 확인합니다(object 컬럼 결측, 숫자/날짜, pickle 대체 경로)."""
+    from pandas.testing import assert_frame_equal
+
+    frames = [
+        pd.DataFrame({
+            "상품": ["x", np.nan, "y"],
+            "옵션": [np.nan, np.nan, np.nan],
+            "수량": [1, 2, 3],
+            "금액": [1.5, np.nan, 2.0],
+            "일시": pd.to_datetime(["2024-01-01", None, "2024-01-03"]),
+        }),
+        # 혼합 타입 object 컬럼(pickle로 저장)
+        pd.DataFrame({"a": [1, "b", np.nan]}),
+    ]
+    with tempfile.TemporaryDirectory() as root:
+        store = FolderFrameStore("self-check", root=root)
+        for i, df in enumerate(frames):
+            f = {"id": str(i), "modifiedTime": "t"}
+            store.put(f, df)
+            got = store.get(f)
+            assert_frame_equal(got, df)
+            # assert_frame_equal은 None과 NaN을 같게 보므로 키를 만들 때처럼 문자열로도 비교
+            assert_frame_equal(got.astype(str), df.astype(str))
+    print("frame store round-trip ok")
+
+
+if __name__ == "__main__":
+    self_check()
@@ -0,0 +1,401 @@
+import inspect
+import os
+
+import numpy as np
+import pandas as pd
+
+from ju_make_final_df import (
+    _add_line_totals,
+    _factorized_text_key,
+    _lookup_positions,
+    _normalized_notion,
+    _reindexed,
+    make_final_df,
+)
+from ju_make_finance_df import _finance_view, make_finance_df, option_inputs
+from ju_shipping_rules import apply_shipping_rules, legacy_rules
+from ju_stage_cache import value_fingerprint
+
+
+# 매칭표만 바뀐 경우 바뀐 주문상품 키의 행/주문만 다시 계산(0이면 항상 전체 계산)
+FINAL_INCREMENTAL = os.environ.get("FINAL_INCREMENTAL", "1") not in ("0", "false", "False", "")
+
+_FINAL_SIGNATURE = inspect.signature(make_final_df)
+# 같은 객체인지로 비교하는 입력(세션 상태에 보관되며 수정하지 않는 프레임), 매칭표는 내용으로 비교
+_FRAME_PARAMS = ("df_invoice_raw", "df_notion")
+_MATCHING_PARAM = "df_matching"
+
+
+def _same(a, b) -> bool:
+    if a is b:
+        return True
+    a_na, b_na = pd.isna(a), pd.isna(b)
+    if a_na or b_na:
+        return a_na and b_na and type(a) is type(b)
+    return a == b
+
+
+def _rows_of(order: np.ndarray, starts: np.ndarray, codes: np.ndarray) -> np.ndarray:
+    """코드별 행 목록(정렬된 행 번호 + 코드별 시작 위치)에서 codes에 속한 행을 오름차순으로."""
+    if not len(codes):
+        return np.zeros(0, dtype=np.int64)
+    return np.sort(np.concatenate([order[starts[c]:starts[c + 1]] for c in codes]))
+
+
+def _grouped_rows(codes: np.ndarray, n_groups: int) -> tuple[np.ndarray, np.ndarray]:
+    valid = np.flatnonzero(codes >= 0)
+    order = valid[np.argsort(codes[valid], kind="stable")]
+    starts = np.r_[0, np.cumsum(np.bincount(codes[valid], minlength=n_groups))]
+    return order, starts
+
+
+def _first_valid(values: np.ndarray, rows: np.ndarray, codes: np.ndarray, n_keys: int) -> tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """키별 첫 유효값(행 번호가 가장 작은 값). 반환: (해당 키, 행 번호, 값)"""
+    valid = ~np.isnan(values)
+    rows, codes, values = rows[valid], codes[valid], values[valid]
+    idx = np.argsort(codes, kind="stable")
+    keys, first = np.unique(codes[idx], return_index=True)
+    return keys, rows[idx[first]], values[idx[first]]
+
+
+class IncrementalSettlement:
+    """매칭표(주문상품 → 노션상품)를 고칠 때마다 전체를 다시 계산하지 않도록 직전 결과와 색인을 보관합니다(세션별).
+
+    - 처음(또는 매칭표 외 입력/설정이 바뀐 경우)에는 make_final_df로 전체 계산 후 색인 구성:
+      행별 주문상품 키 코드, 키 → 행 목록, 키별 노션 행 위치, 주문 → 행 목록
+    - 이후 매칭표만 바뀌면 노션상품이 달라진 키만 찾아
+      해당 행의 노션상품을 고치고, 노션 컬럼은 보관한 행별 위치로 다시 꺼내며(dtype까지 전체 계산과 동일),
+      배송비는 그 행이 속한 주문만 다시 평가합니다. 도서산간배송비는 매칭과 무관하므로 그대로 둡니다.
+    - make_finance_df의 옵션별 집계는 키별 부분합(수량/판매가합계 합, 단가 첫 유효값과 그 행 번호)을
+      바뀐 키만 갱신한 뒤 노션상품 단위로 다시 묶습니다.
+    - 원본/노션 프레임은 같은 객체면 같은 내용으로 봅니다(다른 객체가 오면 전체 계산).
+      반환 프레임은 다음 갱신의 기준이 되므로 호출 측에서 수정하지 않습니다.
+    """
+
+    def __init__(self):
+        self._state: dict | None = None
+        self.last_mode: str | None = None  # "full" | "incremental" | "unchanged"
+        self.last_changed_keys = 0
+
+    def reset(self) -> None:
+        self._state = None
+
+    # ---- make_final_df ----
+
+    def make_final_df(self, *args, **kwargs) -> pd.DataFrame:
+        bound = _FINAL_SIGNATURE.bind(*args, **kwargs)
+        bound.apply_defaults()
+        params = dict(bound.arguments)
+        state = self._state
+        if FINAL_INCREMENTAL and state is not None and self._same_inputs(state, params):
+            final = self._update(state, params[_MATCHING_PARAM])
+            if final is not None:
+                return final
+        final = make_final_df(*args, **kwargs)
+        self._state = self._build(params, final) if FINAL_INCREMENTAL else None
+        self.last_mode = "full"
+        self.last_changed_keys = 0
+        return final
+
+    @staticmethod
+    def _static_key(params: dict) -> tuple:
+        return tuple(
+            (name, value_fingerprint(value))
+            for name, value in params.items()
+            if name not in _FRAME_PARAMS and name != _MATCHING_PARAM
+        )
+
+    def _same_inputs(self, state: dict, params: dict) -> bool:
+        for name in _FRAME_PARAMS:
+            frame = params[name]
+            if frame is not state["frames"][name] or frame.shape != state["shapes"][name]:
+                return False
+        return self._static_key(params) == state["static_key"]
+
+    @staticmethod
+    def _matching_ok(df_matching: pd.DataFrame) -> bool:
+        return (
+            isinstance(df_matching, pd.DataFrame)
+            and sorted(map(str, df_matching.columns)) == ["노션상품", "주문상품"]
+            and len(df_matching.columns) == 2
+            and df_matching["주문상품"].dtype == object
+            and df_matching["노션상품"].dtype == object
+        )
+
+    def _build(self, params: dict, final: pd.DataFrame) -> dict | None:
+        """전체 계산 결과에 맞는 색인을 만듭니다. 증분 갱신 조건이 안 맞으면 None(계속 전체 계산)."""
+        raw = params["df_invoice_raw"]
+        notion = _normalized_notion(params["df_notion"])
+        matching = params[_MATCHING_PARAM]
+        raw_cols = set(raw.columns)
+        row_columns = [params[c] for c in ("quantity_column", "order_number_column", "island_column", "seller_column")]
+        if (
+            not self._matching_ok(matching)
+            or len(final) != len(raw)
+            or raw.columns.duplicated().any()
+            or notion.columns.duplicated().any()
+            or {"주문상품", "노션상품"} & raw_cols
+            or not {"상품명", "구성"}.issubset(notion.columns)
+            or "노션상품키" in notion.columns
+            or any(c is not None and c not in raw_cols for c in row_columns)
+        ):
+            return None
+        option_column = params["option_column"]
+        use_option = bool(option_column and option_column != "없음" and option_column in raw.columns)
+        key_codes, key_uniques = _factorized_text_key(raw, params["product_column"], option_column if use_option else None)
+        n_keys = len(key_uniques)
+        key_mpos = _lookup_positions(np.arange(n_keys), key_uniques, matching["주문상품"])
+        notion_keys = notion["상품명"].astype(str).str.strip() + "(" + notion["구성"].astype(str).str.strip() + ")"
+        if key_mpos is None:
+            return None
+        key_notion = _reindexed(matching["노션상품"], key_mpos, pd.RangeIndex(n_keys)).to_numpy(dtype=object)
+        key_npos = _lookup_positions(np.arange(n_keys), key_notion, notion_keys)
+        if key_npos is None:
+            return None
+        merged_cols = raw_cols | {"주문상품", "노션상품"}
+        notion_columns = []
+        for c in notion.columns:
+            name = f"{c}_notion" if c in merged_cols else c
+            if name in final.columns and name not in raw_cols:
+                notion_columns.append((name, c))
+
+        order_column = params["order_number_column"]
+        rules = params["shipping_rules"] or legacy_rules(params["shipping_fee"], params["shipping_condition_amount"])
+        shipping = bool(order_column and order_column in final.columns and "공구판매가" in final.columns and rules)
+        key_order, key_starts = _grouped_rows(key_codes, n_keys)
+        state = {
+            "frames": {name: params[name] for name in _FRAME_PARAMS},
+            "shapes": {name: params[name].shape for name in _FRAME_PARAMS},
+            "static_key": self._static_key(params),
+            "params": params,
+            "notion": notion,
+            "notion_keys": notion_keys,
+            "notion_columns": notion_columns,
+            "key_codes": key_codes,
+            "key_uniques": key_uniques,
+            "key_order": key_order,
+            "key_starts": key_starts,
+            "key_notion": key_notion,
+            "row_npos": key_npos[key_codes],
+            "rules": rules if shipping else None,
+            "final": final,
+            "version": 0,
+            "history": [],
+            "finance": None,
+        }
+        if shipping:
+            order_codes, uniques = pd.factorize(final[order_column])
+            state["order_codes"] = order_codes
+            state["order_order"], state["order_starts"] = _grouped_rows(order_codes, len(uniques))
+        return state
+
+    def _update(self, state: dict, df_matching: pd.DataFrame) -> pd.DataFrame | None:
+        if not self._matching_ok(df_matching):
+            return None
+        n_keys = len(state["key_uniques"])
+        key_mpos = _lookup_positions(np.arange(n_keys), state["key_uniques"], df_matching["주문상품"])
+        if key_mpos is None:
+            return None
+        key_notion = _reindexed(df_matching["노션상품"], key_mpos, pd.RangeIndex(n_keys)).to_numpy(dtype=object)
+        old_notion = state["key_notion"]
+        changed = np.array([k for k in range(n_keys) if not _same(old_notion[k], key_notion[k])], dtype=np.int64)
+        self.last_changed_keys = len(changed)
+        if not len(changed):
+            self.last_mode = "unchanged"
+            return state["final"]
+
+        changed_npos = _lookup_positions(np.arange(len(changed)), key_notion[changed], state["notion_keys"])
+        if changed_npos is None:
+            return None
+        rows = _rows_of(state["key_order"], state["key_starts"], changed)
+        key_codes = state["key_codes"]
+        npos_by_key = np.full(n_keys, -1, dtype=np.int64)
+        npos_by_key[changed] = changed_npos
+        row_npos = state["row_npos"].copy()
+        row_npos[rows] = npos_by_key[key_codes[rows]]
+
+        prev = state["final"]
+        final = prev.copy(deep=False)
+        notion_product = prev["노션상품"].to_numpy(dtype=object, copy=True)
+        notion_product[rows] = key_notion[key_codes[rows]]
+        final["노션상품"] = notion_product
+        # 노션 컬럼은 위치 배열에서 열 단위로 다시 꺼냄(매칭 여부에 따른 int/float 변환이 전체 계산과 같도록)
+        for name, source in state["notion_columns"]:
+            final[name] = _reindexed(state["notion"][source], row_npos, final.index)
+        params = state["params"]
+        _add_line_totals(final, params["quantity_column"])
+
+        if state["rules"]:
+            orders = np.unique(state["order_codes"][rows])
+            orders = orders[orders >= 0]
+            order_rows = _rows_of(state["order_order"], state["order_starts"], orders)
+            shipping = apply_shipping_rules(
+                final.iloc[order_rows],
+                params["order_number_column"],
+                state["rules"],
+                seller_ratio=params["seller_shipping_ratio"],
+                quantity_column=params["quantity_column"],
+                seller_column=params["seller_column"],
+            )
+            fee = prev["배송비"].to_numpy(copy=True)
+            fee[order_rows] = shipping["배송비"].to_numpy()
+            final["배송비"] = fee
+            if params["shipping_rules"]:
+                fired = prev["배송비규칙"].to_numpy(dtype=object, copy=True)
+                fired[order_rows] = shipping["배송비규칙"].to_numpy()
+                final["배송비규칙"] = fired
+
+        state["key_notion"] = key_notion
+        state["row_npos"] = row_npos
+        state["final"] = final
+        state["version"] += 1
+        state["history"].append(changed)
+        self.last_mode = "incremental"
+        return final
+
+    # ---- make_finance_df ----
+
+    def make_finance_df(self, df_final: pd.DataFrame, *args, **kwargs) -> pd.DataFrame:
+        """make_finance_df와 같은 인자. df_final이 직전 make_final_df 결과면 옵션별 집계를 키별 부분합에서 만듭니다."""
+        bound = inspect.signature(make_finance_df).bind(df_final, *args, **kwargs)
+        bound.apply_defaults()
+        agg = None
+        state = self._state
+        if state is not None and df_final is state["final"] and len(df_final):
+            agg = self._option_aggregates(state, df_final, bound.arguments["quantity_column"])
+        kwargs = {k: v for k, v in bound.arguments.items() if k not in ("df_final", "option_aggregates_df")}
+        return make_finance_df(df_final, option_aggregates_df=agg, **kwargs)
+
+    @staticmethod
+    def _key_partials(view: pd.DataFrame, quantity_column: str | None, rows: np.ndarray, codes: np.ndarray, n_keys: int) -> dict:
+        values, _ = option_inputs(view.iloc[rows], quantity_column)
+        part = {
+            "qty": np.bincount(codes, weights=values["qty"].to_numpy(dtype=float), minlength=n_keys),
+            "sale_sum": np.bincount(codes, weights=values["sale_sum"].to_numpy(dtype=float), minlength=n_keys),
+        }
+        for col in ("unit_sale", "unit_cost"):
+            pos = np.full(n_keys, np.iinfo(np.int64).max, dtype=np.int64)
+            val = np.full(n_keys, np.nan)
+            keys, first_rows, first_values = _first_valid(values[col].to_numpy(dtype=float), rows, codes, n_keys)
+            pos[keys] = first_rows
+            val[keys] = first_values
+            part[col] = (pos, val)
+        return part
+
+    def _option_aggregates(self, state: dict, df_final: pd.DataFrame, quantity_column: str | None) -> pd.DataFrame | None:
+        # make_finance_df가 빼는 컬럼(중복 이름 등)이 있으면 기존 방식으로
+        if _finance_view(df_final) is not df_final or "노션상품" not in df_final.columns:
+            return None
+        view = df_final
+        n_keys = len(state["key_uniques"])
+        key_codes = state["key_codes"]
+        finance = state["finance"]
+        if finance is None or finance["quantity_column"] != quantity_column:
+            rows = np.arange(len(key_codes))
+            finance = {"quantity_column": quantity_column, **self._key_partials(view, quantity_column, rows, key_codes, n_keys)}
+        elif finance["version"] != state["version"]:
+            # 마지막 집계 이후 바뀐 키만 다시 계산
+            changed = np.unique(np.concatenate(state["history"][finance["version"]:]))
+            rows = _rows_of(state["key_order"], state["key_starts"], changed)
+            part = self._key_partials(view, quantity_column, rows, key_codes[rows], n_keys)
+            for col in ("qty", "sale_sum"):
+                finance[col] = finance[col].copy()
+                finance[col][changed] = part[col][changed]
+            for col in ("unit_sale", "unit_cost"):
+                pos, val = finance[col][0].copy(), finance[col][1].copy()
+                pos[changed], val[changed] = part[col][0][changed], part[col][1][changed]
+                finance[col] = (pos, val)
+        finance["version"] = state["version"]
+        state["finance"] = finance
+
+        # 키별 부분합 → 노션상품 단위(groupby와 같은 정렬/결측 그룹)
+        groups = pd.Series(state["key_notion"], dtype=object)
+        sums = pd.DataFrame({"qty": finance["qty"], "sale_sum": finance["sale_sum"]}).groupby(groups, dropna=False).sum()
+        firsts = {}
+        for col in ("unit_sale", "unit_cost"):
+            pos, val = finance[col]
+            order = np.argsort(pos, kind="stable")
+            firsts[col] = pd.Series(val[order]).groupby(groups.iloc[order].reset_index(drop=True), dropna=False).first()
+        return pd.DataFrame({
+            "qty": sums["qty"],
+            "unit_sale": firsts["unit_sale"].reindex(sums.index),
+            "unit_cost": firsts["unit_cost"].reindex(sums.index),
+            "sale_sum": sums["sale_sum"],
+        }, index=sums.index)
+
+
+def self_check(n_rows: int = 20_000, steps: int = 12, seed: int = 0) -> pd.DataFrame:
+    """무작위 매칭표 수정을 이어서 적용하며 증분 결과가 전체 계산(make_final_df/make_finance_df)과 같은지 확인합니다.
+
+    배송비 설정(기존 단일 설정 / 사용자 규칙 + 판매자 조건), 도서산간(flag), 매칭 해제 키, 여러 번 수정 후
+    정산 집계 호출을 섞습니다. 프레임은 dtype까지 같아야 합니다.
+    """
+    import time
+
+    from pandas.testing import assert_frame_equal
+
+    from ju_make_final_df import _make_sample
+    from ju_shipping_rules import ShippingRule
+
+    rng = np.random.default_rng(seed)
+    df_raw, df_notion, df_matching = _make_sample(n_rows, n_extra=2, seed=seed)
+    df_raw["판매자"] = np.array(["A", "B", "C"], dtype=object)[rng.integers(0, 3, n_rows)]
+    df_raw["도서산간"] = np.where(rng.random(n_rows) < 0.05, "도서산간", "")
+    notion_names = df_notion["상품명"].astype(str) + "(" + df_notion["구성"].astype(str) + ")"
+    rules = [
+        ShippingRule(name="B무료", fee=0, seller="B"),
+        ShippingRule(name="소액", fee=3000, max_amount=20_000),
+        ShippingRule(name="묶음", fee=5000, products=tuple(notion_names[:20])),
+    ]
+    base = dict(
+        product_column="상품명",
+        option_column="옵션",
+        quantity_column="수량",
+        order_number_column="주문번호",
+        seller_shipping_ratio=50,
+        island_column="도서산간",
+        island_mode="flag",
+        island_flag_text="도서산간",
+        island_fee_value=4000,
+    )
+    configs = {
+        "legacy": dict(base, shipping_fee=3000, shipping_condition_amount=30_000),
+        "rules": dict(base, shipping_rules=rules, seller_column="판매자"),
+        "no_shipping": dict(base, order_number_column=None),
+    }
+    files = [{"name": "a_b_상품_셀러.xlsx"}]
+    finance_args = (files, "수량", 3000, 50, None)
+    report = []
+    for name, params in configs.items():
+        inc = IncrementalSettlement()
+        matching = df_matching.copy()
+        modes = []
+        for step in range(steps):
+            if step:
+                # 일부 키를 다른 노션상품/매칭 해제(None, "")로 바꿈
+                matching = matching.copy()
+                picked = rng.choice(len(matching), size=max(1, len(matching) // 20), replace=False)
+                choices = np.concatenate([notion_names.to_numpy(dtype=object), np.array([None, ""], dtype=object)])
+                matching.loc[picked, "노션상품"] = choices[rng.integers(0, len(choices), len(picked))]
+            t0 = time.perf_counter()
+            got = inc.make_final_df(df_raw, df_notion, matching, **params)
+            inc_s = time.perf_counter() - t0
+            modes.append(inc.last_mode)
+            t0 = time.perf_counter()
+            expected = make_final_df(df_raw, df_notion, matching, **params)
+            full_s = time.perf_counter() - t0
+            assert_frame_equal(got, expected)
+            # 정산 집계는 몇 번의 수정을 건너뛰고 호출(누적된 변경 키 반영 확인)
+            if step % 3 == 2 or step == steps - 1:
+                assert_frame_equal(inc.make_finance_df(got, *finance_args), make_finance_df(expected, *finance_args))
+            report.append({"config": name, "step": step, "mode": inc.last_mode, "incremental_s": round(inc_s, 4), "full_s": round(full_s, 4)})
+        assert modes[0] == "full" and set(modes[1:]) <= {"incremental", "unchanged"}, (name, modes)
+    return pd.DataFrame(report)
+
+
+if __name__ == "__main__":
+    # 사용법: python ju_incremental.py [행수]
+    import sys
+
+    rows = int(sys.argv[1]) if len(sys.argv) > 1 else 20_000
+    print(self_check(rows).to_string(index=False))
@@ -0,0 +1,97 @@
+import os
+import re
+import threading
+
+import numpy as np
+import pandas as pd
+
+
+# 도서산간(제주 포함) 우편번호 구간표. 택배사 기준이 바뀌면 CSV만 교체(환경변수로 다른 파일 지정 가능)
+ISLAND_POSTCODE_CSV = os.environ.get("ISLAND_POSTCODE_CSV") or os.path.join(
+    os.path.dirname(os.path.abspath(__file__)), "ju_island_postcodes.csv"
+)
+
+
+class PostcodeIntervalIndex:
+    """우편번호(5자리) 구간표를 시작값 기준 정렬 배열로 보관하고 searchsorted로 판별합니다.
+
+    CSV 컬럼: start, end(포함), region, kind. 겹치는 구간이 있으면 ValueError.
+    """
+
+    def __init__(self, table: pd.DataFrame):
+        table = table.sort_values("start", kind="stable").reset_index(drop=True)
+        self.starts = table["start"].to_numpy(dtype=np.int64)
+        self.ends = table["end"].to_numpy(dtype=np.int64)
+        self.regions = table["region"].astype(str).to_numpy(dtype=object)
+        if (self.ends < self.starts).any():
+            raise ValueError("우편번호 구간의 end가 start보다 작습니다.")
+        if len(self.starts) > 1 and (self.starts[1:] <= self.ends[:-1]).any():
+            raise ValueError("우편번호 구간이 서로 겹칩니다.")
+
+    @classmethod
+    def from_csv(cls, path: str = ISLAND_POSTCODE_CSV) -> "PostcodeIntervalIndex":
+        return cls(pd.read_csv(path, dtype={"start": "int64", "end": "int64", "region": str, "kind": str}))
+
+    def locate(self, codes: np.ndarray) -> np.ndarray:
+        """정수 우편번호 배열 → 구간 번호(해당 없음/결측은 -1)."""
+        codes = np.asarray(codes, dtype=np.int64)
+        if not len(self.starts):
+            return np.full(len(codes), -1, dtype=np.int64)
+        pos = np.searchsorted(self.starts, codes, side="right") - 1
+        hit = (pos >= 0) & (codes <= self.ends[np.maximum(pos, 0)])
+        return np.where(hit, pos, -1)
+
+    def classify(self, values: pd.Series) -> tuple[np.ndarray, np.ndarray, np.ndarray]:
+        """(도서산간 여부, 지역명("" = 해당 없음), 우편번호를 읽지 못한 행 여부)"""
+        codes = parse_postcodes(values)
+        parsed = codes >= 0
+        pos = self.locate(codes)
+        pos[~parsed] = -1
+        regions = np.append(self.regions, "")[pos]
+        return pos >= 0, regions, ~parsed
+
+
+def _codes_from_numbers(numeric: np.ndarray) -> np.ndarray:
+    ok = np.isfinite(numeric) & (numeric >= 0) & (numeric <= 99999) & (numeric == np.floor(numeric))
+    return np.where(ok, numeric, -1).astype(np.int64)
+
+
+def parse_postcodes(values: pd.Series) -> np.ndarray:
+    """우편번호 컬럼 → 5자리 정수 배열(읽지 못하면 -1).
+
+    숫자 컬럼은 바로 변환하고, 문자열 컬럼은 고유값 단위로 숫자 변환 후 실패한 값(주소 등)에서 5자리 숫자를 찾습니다.
+    """
+    if pd.api.types.is_numeric_dtype(values.dtype) and not pd.api.types.is_bool_dtype(values.dtype):
+        return _codes_from_numbers(values.to_numpy(dtype=float, na_value=np.nan))
+    codes, uniques = pd.factorize(values)
+    uniques = pd.Series(uniques, dtype=object)
+    parsed = _codes_from_numbers(pd.to_numeric(uniques, errors="coerce").to_numpy(dtype=float))
+    rest = parsed < 0
+    if rest.any():
+        found = uniques[rest].astype(str).str.extract(r"(?<!\d)(\d{5})(?!\d)", expand=False)
+        parsed[rest] = pd.to_numeric(found, errors="coerce").fillna(-1).astype(np.int64).to_numpy()
+    return np.append(parsed, -1)[codes]
+
+
+def literal_flag_mask(values: pd.Series, text: str | None) -> np.ndarray:
+    """쉼표(또는 |)로 구분한 문자열 중 하나라도 포함하면 True(정규식으로 해석하지 않음).
+
+    값은 기존처럼 astype(str) 기준이며, 같은 값은 한 번만 검사합니다. 빈 문자열은 모든 행에 해당.
+    """
+    patterns = [p.strip() for p in re.split(r"[,|]", str(text or "")) if p.strip()] or [""]
+    codes, uniques = pd.factorize(values.astype(str))
+    hit = np.array([any(p in u for p in patterns) for u in uniques], dtype=bool)
+    return hit[codes] if len(codes) else np.zeros(0, dtype=bool)
+
+
+_default_index: PostcodeIntervalIndex | None = None
+_default_lock = threading.Lock()
+
+
+def island_postcode_index() -> PostcodeIntervalIndex:
+    """번들 구간표로 만든 프로세스 공용 인덱스."""
+    global _default_index
+    with _default_lock:
+        if _default_index is None:
+            _default_index = PostcodeIntervalIndex.from_csv()
+        return _default_index
@@ -1,12 +1,162 @@
 import io
+import json
+import os
+import subprocess
+import sys
+import time
+from copy import copy
 from datetime import datetime
 import pandas as pd
 from openpyxl import Workbook
-from openpyxl.styles import Alignment, Border, Side, Font, PatternFill
-from openpyxl.utils import get_column_letter
+from openpyxl.cell import WriteOnlyCell
+from openpyxl.worksheet.cell_range import CellRange
 
+from ju_report_template import SETTLEMENT_TEMPLATE, render_report
 
-def build_finance_excel(df_finance: pd.DataFrame, df_final: pd.DataFrame | None = None, drive_files: list | None = None, title: str = "정산 리포트", sheet_name: str = "정산") -> tuple[bytes, str]:
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+
+# raw 시트 기록 방식: "stream"(write_only 워크북에 열 단위로 묶어 스트리밍) | "cell"(기존 셀 단위 기록)
+RAW_SHEET_WRITER = os.environ.get("RAW_SHEET_WRITER", "stream")
+# 스트리밍 시 한 번에 파이썬 객체로 바꾸는 행 수(메모리 상한)
+RAW_SHEET_CHUNK_ROWS = int(os.environ.get("RAW_SHEET_CHUNK_ROWS", "20000"))
+# raw 출력 정책: "auto" | "sheet"(시트에 기록, 한도 초과 시 raw_1..n) | "csv"(csv.gz 별도 파일) | "parquet" | "none"
+RAW_OUTPUT_POLICY = os.environ.get("RAW_OUTPUT_POLICY", "auto")
+# 시트 하나에 넣을 최대 데이터 행 수(엑셀 한도 1,048,576행 - 헤더 1행)
+RAW_SHEET_MAX_ROWS = int(os.environ.get("RAW_SHEET_MAX_ROWS", "1048575"))
+# auto일 때 정산 파일에 raw를 넣는 최대 크기(행 수 또는 셀 수), 넘으면 별도 압축 파일로
+RAW_EMBED_MAX_ROWS = int(os.environ.get("RAW_EMBED_MAX_ROWS", "100000"))
+RAW_EMBED_MAX_CELLS = int(os.environ.get("RAW_EMBED_MAX_CELLS", "3000000"))
+
+
+def _write_settlement_sheet(ws, df_finance: pd.DataFrame, title: str) -> None:
+    """정산 시트(일반 워크시트)에 서식이 들어간 정산표를 그립니다(배치/스타일은 SETTLEMENT_TEMPLATE)."""
+    render_report(ws, df_finance, title, SETTLEMENT_TEMPLATE)
+
+
+def _copy_sheet_to_write_only(src, dst) -> None:
+    """일반 워크시트의 값/서식/병합/열 너비를 write_only 워크시트로 옮깁니다(작은 시트용)."""
+    for key, dim in src.column_dimensions.items():
+        if dim.width:
+            dst.column_dimensions[key].width = dim.width
+    for rng in src.merged_cells.ranges:
+        dst.merged_cells.add(CellRange(rng.coord))
+    by_row: dict[int, dict[int, object]] = {}
+    for (r, c), cell in src._cells.items():
+        by_row.setdefault(r, {})[c] = cell
+    # 같은 서식은 한 번만 옮기고 이후에는 대상 워크북의 스타일 배열만 복사(이름 있는 스타일도 유지)
+    converted: dict[tuple, object] = {}
+    for r in range(1, src.max_row + 1):
+        cells = by_row.get(r, {})
+        row = [None] * (max(cells) if cells else 0)
+        for c, cell in cells.items():
+            out = WriteOnlyCell(dst, value=cell.value)
+            if cell.has_style:
+                key = tuple(cell._style)
+                if key not in converted:
+                    if cell.style != "Normal":
+                        if cell.style not in dst.parent.named_styles:
+                            dst.parent.add_named_style(copy(src.parent._named_styles[cell.style]))
+                        out.style = cell.style
+                    out.font = copy(cell.font)
+                    out.fill = copy(cell.fill)
+                    out.border = copy(cell.border)
+                    out.alignment = copy(cell.alignment)
+                    out.number_format = cell.number_format
+                    out.protection = copy(cell.protection)
+                    converted[key] = copy(out._style)
+                else:
+                    out._style = copy(converted[key])
+            row[c - 1] = out
+        dst.append(row)
+
+
+def _stream_raw_sheet(ws, df_final: pd.DataFrame, chunk_rows: int = RAW_SHEET_CHUNK_ROWS) -> None:
+    """df_final을 열 배열 단위로 변환해 행 묶음으로 write_only 시트에 추가합니다."""
+    ws.append([str(col) for col in df_final.columns])
+    n = len(df_final)
+    for start in range(0, n, max(1, chunk_rows)):
+        chunk = df_final.iloc[start:start + chunk_rows]
+        columns = []
+        for j in range(chunk.shape[1]):
+            values = chunk.iloc[:, j].astype(object).to_numpy()
+            # 결측(NaN/NaT/None/pd.NA)은 빈 셀로
+            mask = pd.isna(values)
+            if mask.any():
+                values = values.copy()
+                values[mask] = None
+            columns.append(values.tolist())
+        for row in zip(*columns):
+            ws.append(row)
+
+
+def _write_raw_sheet_cells(ws2, df_final: pd.DataFrame) -> None:
+    """기존 방식: 셀 단위 기록."""
+    # 헤더
+    for j, col in enumerate(list(df_final.columns), start=1):
+        ws2.cell(row=1, column=j, value=str(col))
+    # 데이터
+    for i, (_, row) in enumerate(df_final.iterrows(), start=2):
+        for j, col in enumerate(list(df_final.columns), start=1):
+            ws2.cell(row=i, column=j, value=row.get(col))
+
+
+def resolve_raw_policy(df_final: pd.DataFrame | None, policy: str | None = None) -> str:
+    """"sheet" / "csv" / "parquet" / "none" 중 실제로 쓸 방식을 고릅니다.
+
+    auto: 작으면 시트로, RAW_EMBED_MAX_ROWS/RAW_EMBED_MAX_CELLS를 넘으면 엑셀에서도 열 수 있는 csv.gz로.
+    parquet은 pyarrow가 없으면 csv.gz로 대체합니다.
+    """
+    policy = (policy or RAW_OUTPUT_POLICY).lower()
+    if df_final is None:
+        return "none"
+    if policy == "auto":
+        if len(df_final) <= RAW_EMBED_MAX_ROWS and df_final.size <= RAW_EMBED_MAX_CELLS:
+            return "sheet"
+        policy = "csv"
+    if policy == "parquet" and not _has_pyarrow():
+        policy = "csv"
+    return policy if policy in ("sheet", "csv", "parquet", "none") else "sheet"
+
+
+def _has_pyarrow() -> bool:
+    try:
+        import pyarrow  # noqa: F401
+        return True
+    except ImportError:
+        return False
+
+
+def raw_shards(n_rows: int, max_rows: int = RAW_SHEET_MAX_ROWS) -> list[tuple[str, int, int]]:
+    """[(시트명, 시작 행, 끝 행)]. 한 시트에 들어가면 기존과 같은 "raw" 하나."""
+    max_rows = max(1, min(max_rows, 1048575))
+    if n_rows <= max_rows:
+        return [("raw", 0, n_rows)]
+    return [(f"raw_{i + 1}", start, min(start + max_rows, n_rows)) for i, start in enumerate(range(0, n_rows, max_rows))]
+
+
+def export_raw_file(df_final: pd.DataFrame, fmt: str, base_filename: str) -> dict:
+    """raw 데이터를 별도 파일로 만듭니다. {"data": bytes, "filename": str, "mime": str}"""
+    stem = base_filename.rsplit(".", 1)[0] + "_raw"
+    bio = io.BytesIO()
+    if fmt == "parquet":
+        out = df_final.copy(deep=False)
+        out.columns = [str(c) for c in out.columns]
+        # 혼합형 object 컬럼은 문자열로 맞춰 저장
+        for col in out.columns:
+            if out[col].dtype == object:
+                out[col] = out[col].where(out[col].isna(), out[col].astype(str))
+        out.to_parquet(bio, index=False, compression="zstd")
+        return {"data": bio.getvalue(), "filename": f"{stem}.parquet", "mime": "application/vnd.apache.parquet"}
+    # 엑셀에서 한글이 깨지지 않도록 utf-8-sig
+    df_final.to_csv(bio, index=False, encoding="utf-8-sig", compression={"method": "gzip", "mtime": 0})
+    return {"data": bio.getvalue(), "filename": f"{stem}.csv.gz", "mime": "application/gzip"}
+
+
+def build_finance_excel(df_finance: pd.DataFrame, df_final: pd.DataFrame | None = None, drive_files: list | None = None, title: str = "정산 리포트", sheet_name: str = "정산", raw_writer: str | None = None, raw_policy: str | None = None, raw_output: dict | None = None) -> tuple[bytes, str]:
     """df_finance를 받아 정산 리포트 형태의 xlsx 바이너리를 반환합니다.
 
     배치 규칙:
@@ -16,211 +166,37 @@ def build_finance_excel(df_finance: pd.DataFrame, df_final: pd.DataFrame | None
     - B6:H6 '정산내역' (흰 글씨, 회색 배경)
     - 헤더는 B7부터, 본문은 B8부터
     - 마지막에 소계/계, 그리고 3줄 아래 '실 정산액' 박스
-    """
-    wb = Workbook()
-    ws = wb.active
-    ws.title = sheet_name
-
-    # 스타일
-    thin = Side(border_style="thin", color="000000")
-    border_all = Border(left=thin, right=thin, top=thin, bottom=thin)
-    center = Alignment(horizontal="center", vertical="center")
-    right = Alignment(horizontal="right", vertical="center")
-    header_fill = PatternFill("solid", fgColor="D9D9D9")
-    title_font = Font(size=16, bold=True)
-    bold_font = Font(bold=True)
-
-    # 컬럼 정의 (보이는 순서 고정)
-    columns = [
-        "상품명",
-        "옵션",
-        "수량",
-        "공구판매가",
-        "공구판매가합계(vat포함)",
-        "공급가(vat포함)",
-        "정산금액(vat포함)",
-    ]
-
-    # 배치 시작 위치
-    start_col = 2  # B
-    end_col = start_col + len(columns) - 1  # H
-
-    # 타이틀: B2:H2
-    ws.merge_cells(start_row=2, start_column=start_col, end_row=2, end_column=end_col)
-    tcell = ws.cell(row=2, column=start_col, value=title)
-    tcell.font = Font(size=25, bold=True)
-    tcell.alignment = center
-
-    # 브랜드 라벨: B3
-    ws.cell(row=3, column=start_col, value="소셜라운지").font = Font(size=10)
-
-    # Divider: B4:H4 하단 굵은 선
-    thick = Side(border_style="medium", color="000000")
-    for c in range(start_col, end_col + 1):
-        cell = ws.cell(row=4, column=c, value=None)
-        cell.border = Border(bottom=thick)
-
-    # 정산내역: B6:H6
-    ws.merge_cells(start_row=6, start_column=start_col, end_row=6, end_column=end_col)
-    s = ws.cell(row=6, column=start_col, value="정산내역")
-    s.font = Font(size=10, color="FFFFFF", bold=True)
-    s.fill = PatternFill("solid", fgColor="808080")
-    s.alignment = center
-
-    # 헤더: B7~H7 (옅은 회색)
-    header_row = 7
-    for idx, col_name in enumerate(columns):
-        c = ws.cell(row=header_row, column=start_col + idx, value=col_name)
-        c.fill = PatternFill("solid", fgColor="EDEDED")
-        c.font = bold_font
-        c.alignment = center
-        c.border = border_all
-
-    # 본문: B8부터
-    data_row_start = header_row + 1
-    current_row = data_row_start
-    number_cols = {"수량", "공구판매가", "공구판매가합계(vat포함)", "공급가(vat포함)", "정산금액(vat포함)"}
-    df_iter = df_finance if df_finance is not None else pd.DataFrame(columns=columns)
-    for _, r in df_iter.iterrows():
-        for j, col_name in enumerate(columns):
-            val = r.get(col_name)
-            c = ws.cell(row=current_row, column=start_col + j, value=val)
-            c.border = border_all
-            if col_name in number_cols:
-                c.number_format = "#,##0"
-                c.alignment = right
-            else:
-                c.alignment = Alignment(vertical="center")
-        current_row += 1
-
-    data_row_end = current_row - 1
-    has_data = data_row_end >= data_row_start
-
-    # '상품명' 컬럼 병합 (B열): B8 ~ B{data_row_end}
-    if has_data:
-        ws.merge_cells(start_row=data_row_start, start_column=start_col, end_row=data_row_end, end_column=start_col)
-        ws.cell(row=data_row_start, column=start_col).alignment = center
-
-    # 소계 행: 한 줄 추가(항상 표시)
-    subtotal_row = max(data_row_start, data_row_end + 1)
-    # 병합 B:C 에 소계
-    ws.merge_cells(start_row=subtotal_row, start_column=start_col, end_row=subtotal_row, end_column=start_col + 1)
-    sc = ws.cell(row=subtotal_row, column=start_col, value="소계")
-    sc.fill = PatternFill("solid", fgColor="EDEDED")
-    sc.font = bold_font
-    sc.alignment = center
-    sc.border = border_all
-    # 행 전체 회색 음영 및 테두리
-    for c in range(start_col, end_col + 1):
-        cell = ws.cell(row=subtotal_row, column=c)
-        cell.fill = PatternFill("solid", fgColor="EDEDED")
-        cell.border = border_all
-    # 합계: D, F, H
-    col_map = {"수량": 2, "공구판매가합계(vat포함)": 4, "정산금액(vat포함)": 6}  # offset from start_col
-    for name, off in col_map.items():
-        col_idx = start_col + off
-        col_letter = get_column_letter(col_idx)
-        if has_data:
-            val = f"=SUM({col_letter}{data_row_start}:{col_letter}{data_row_end})"
-        else:
-            val = 0
-        cell = ws.cell(row=subtotal_row, column=col_idx, value=val)
-        cell.number_format = "#,##0"
-        cell.border = border_all
-        cell.alignment = right
-
-    # 계 행: 다음 줄(항상 표시)
-    total_row = subtotal_row + 1
-    ws.merge_cells(start_row=total_row, start_column=start_col, end_row=total_row, end_column=end_col - 1)
-    tc = ws.cell(row=total_row, column=start_col, value="계")
-    tc.fill = PatternFill("solid", fgColor="FFD966")
-    tc.font = bold_font
-    tc.alignment = center
-    # 행 전체 연한 주황색 음영 및 테두리
-    for c in range(start_col, end_col + 1):
-        cell = ws.cell(row=total_row, column=c)
-        cell.fill = PatternFill("solid", fgColor="FFD966")
-        cell.border = border_all
-    # H열(정산금액 총계)
-    sum_col_idx = start_col + columns.index("정산금액(vat포함)")
-    total_val = (f"=SUM({get_column_letter(sum_col_idx)}{data_row_start}:{get_column_letter(sum_col_idx)}{data_row_end})" if has_data else 0)
-    ws.cell(row=total_row, column=end_col, value=total_val).number_format = "#,##0"
-
-    # 실 정산액 박스: total_row + 3
-    final_row = total_row + 3
-    # B..C 병합
-    ws.merge_cells(start_row=final_row, start_column=start_col, end_row=final_row, end_column=start_col + 1)
-    fc = ws.cell(row=final_row, column=start_col, value="실 정산액")
-    fc.fill = PatternFill("solid", fgColor="FFC000")
-    fc.font = Font(size=12, bold=True)
-    fc.alignment = center
-    # 굵은 테두리
-    thick_border = Border(left=thick, right=thick, top=thick, bottom=thick)
-    for c in range(start_col, start_col + 2):
-        ws.cell(row=final_row, column=c).border = thick_border
-    # D..H 병합 + 값
-    ws.merge_cells(start_row=final_row, start_column=start_col + 2, end_row=final_row, end_column=end_col)
-    tv = ws.cell(row=final_row, column=start_col + 2, value=(f"=SUM({get_column_letter(sum_col_idx)}{data_row_start}:{get_column_letter(sum_col_idx)}{data_row_end})" if has_data else 0))
-    tv.number_format = "₩#,##0"
-    tv.font = Font(bold=True)
-    tv.alignment = right
-    for c in range(start_col + 2, end_col + 1):
-        ws.cell(row=final_row, column=c).border = thick_border
-
-    # 실 정산액 아래 Divider: (final_row + 1) 행의 B..H 아래 테두리 굵게
-    divider_row = final_row + 1
-    for c in range(start_col, end_col + 1):
-        cell = ws.cell(row=divider_row, column=c)
-        cell.border = Border(bottom=thick)
-
-    # 안내 문구 4줄
-    notes_row_start = divider_row + 1
-    notes = [
-        "*위 금액을 확인하여 주시길 바랍니다.",
-        "*이상이 없을 경우 계산서 발행 요청드립니다",
-        "사업자 번호 : 790-88-03127",
-        "계산서 발행 이메일 : master@sociallounge.company",
-    ]
-    for i, txt in enumerate(notes):
-        ws.cell(row=notes_row_start + i, column=start_col, value=txt)
-
-    # 마지막 Divider 한 줄 더 (안내문구 하단)
-    final_divider_row = notes_row_start + len(notes)
-    for c in range(start_col, end_col + 1):
-        cell = ws.cell(row=final_divider_row, column=c)
-        cell.border = Border(bottom=thick)
-
-    # 범위 외곽 굵은 테두리 (정산내역 ~ 계)
-    top = 6
-    bottom = total_row
-    left = start_col
-    right_col = end_col
-    for r in range(top, bottom + 1):
-        for c in range(left, right_col + 1):
-            cell = ws.cell(row=r, column=c)
-            new_border = Border(
-                left=thick if c == left else cell.border.left,
-                right=thick if c == right_col else cell.border.right,
-                top=thick if r == top else cell.border.top,
-                bottom=thick if r == bottom else cell.border.bottom,
-            )
-            cell.border = new_border
+    (배치와 서식은 ju_report_template.SETTLEMENT_TEMPLATE, 서식은 이름 있는 스타일로 한 번만 등록)
 
-    # 열 너비 (B..H)
-    widths = [22, 38, 10, 14, 20, 16, 18]
-    for i, w in enumerate(widths, start=start_col):
-        ws.column_dimensions[get_column_letter(i)].width = w
+    raw_writer(기본 RAW_SHEET_WRITER): "stream"이면 정산 시트는 같은 서식으로 옮기고 raw 시트는 스트리밍 기록,
+    "cell"이면 기존처럼 한 워크북에 셀 단위로 기록합니다.
 
-    # 두번째 시트: raw에 df_final 전체 기록
-    if df_final is not None:
-        ws2 = wb.create_sheet("raw")
-        # 헤더
-        for j, col in enumerate(list(df_final.columns), start=1):
-            ws2.cell(row=1, column=j, value=str(col))
-        # 데이터
-        for i, (_, row) in enumerate(df_final.iterrows(), start=2):
-            for j, col in enumerate(list(df_final.columns), start=1):
-                ws2.cell(row=i, column=j, value=row.get(col))
+    raw_policy(기본 RAW_OUTPUT_POLICY, resolve_raw_policy 참고): 시트 한도를 넘으면 raw_1..raw_n으로 나누고,
+    csv/parquet이면 raw 시트 대신 별도 파일을 raw_output에 {"data", "filename", "mime", "rows"}로 채웁니다.
+    none이면 raw를 기록하지 않습니다. raw_output을 받지 않으면(csv/parquet/none 모두) raw가 빠지지 않도록 시트로 기록합니다.
+    """
+    writer = (raw_writer or RAW_SHEET_WRITER).lower()
+    policy = resolve_raw_policy(df_final, raw_policy)
+    # 별도 파일(csv/parquet)을 돌려받을 곳이 없거나 raw를 빼라는(none) 설정이어도, raw_output을 받지 않으면 시트로
+    if policy in ("csv", "parquet", "none") and raw_output is None and df_final is not None:
+        policy = "sheet"
+    shards = raw_shards(len(df_final)) if policy == "sheet" else []
+    if writer == "cell":
+        wb = Workbook()
+        ws = wb.active
+        ws.title = sheet_name
+        _write_settlement_sheet(ws, df_finance, title)
+        # 두번째 시트: raw에 df_final 전체 기록(한도를 넘으면 여러 시트)
+        for name, start, stop in shards:
+            _write_raw_sheet_cells(wb.create_sheet(name), df_final.iloc[start:stop])
+    else:
+        # 정산 시트는 작으므로 일반 워크북에서 그린 뒤 write_only 워크북으로 옮김
+        scratch = Workbook()
+        _write_settlement_sheet(scratch.active, df_finance, title)
+        wb = Workbook(write_only=True)
+        _copy_sheet_to_write_only(scratch.active, wb.create_sheet(sheet_name))
+        for name, start, stop in shards:
+            _stream_raw_sheet(wb.create_sheet(name), df_final.iloc[start:stop])
 
     # 파일명 구성: 정산서_{yymmdd}_{3}_{4}.xlsx (드라이브 첫 파일명 기준)
     yymmdd = datetime.now().strftime('%y%m%d')
@@ -234,9 +210,76 @@ def build_finance_excel(df_finance: pd.DataFrame, df_final: pd.DataFrame | None
             base_name = fname
     final_filename = f"정산서_{yymmdd}_{base_name}.xlsx" if base_name else f"정산서_{yymmdd}.xlsx"
 
+    if raw_output is not None:
+        raw_output.clear()
+        raw_output["policy"] = policy
+        raw_output["sheets"] = [name for name, _, _ in shards]
+        if policy in ("csv", "parquet"):
+            raw_output.update(export_raw_file(df_final, policy, final_filename))
+            raw_output["rows"] = len(df_final)
+
     # 저장
     bio = io.BytesIO()
     wb.save(bio)
     bio.seek(0)
     return bio.getvalue(), final_filename
 
+
+
+def _sample_final(n_rows: int, n_cols: int = 20) -> pd.DataFrame:
+    data = {}
+    for j in range(n_cols):
+        if j % 3 == 0:
+            data[f"문자{j}"] = [f"주문{i % 1000}" for i in range(n_rows)]
+        elif j % 3 == 1:
+            data[f"정수{j}"] = list(range(n_rows))
+        else:
+            data[f"실수{j}"] = [i * 0.5 for i in range(n_rows)]
+    return pd.DataFrame(data)
+
+
+def _peak_rss_mb() -> float | None:
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux는 KB, macOS는 bytes
+    return round(peak / (1024 * 1024 if sys.platform == "darwin" else 1024), 1)
+
+
+def _run_once(writer: str, n_rows: int) -> dict:
+    df_final = _sample_final(n_rows)
+    base_rss = _peak_rss_mb()
+    t0 = time.perf_counter()
+    data, _ = build_finance_excel(pd.DataFrame(), df_final, raw_writer=writer)
+    elapsed = time.perf_counter() - t0
+    return {
+        "rows": n_rows,
+        "writer": writer,
+        "seconds": round(elapsed, 2),
+        "rows_per_sec": int(n_rows / elapsed) if elapsed else 0,
+        "peak_rss_mb": _peak_rss_mb(),
+        "rss_before_mb": base_rss,
+        "xlsx_mb": round(len(data) / 1024 / 1024, 1),
+    }
+
+
+def benchmark(sizes: tuple[int, ...] = (10_000, 50_000), writers: tuple[str, ...] = ("cell", "stream")) -> pd.DataFrame:
+    """raw 시트 기록 방식별 소요 시간/초당 행 수/최대 RSS를 비교합니다(방식마다 별도 프로세스)."""
+    rows = []
+    for n in sizes:
+        for writer in writers:
+            out = subprocess.run(
+                [sys.executable, os.path.abspath(__file__), "--one", writer, str(n)],
+                capture_output=True, text=True, check=True,
+            )
+            rows.append(json.loads(out.stdout.strip().splitlines()[-1]))
+    return pd.DataFrame(rows)
+
+
+if __name__ == "__main__":
+    # 사용법: python ju_make_excel.py [행수 ...]
+    if len(sys.argv) == 4 and sys.argv[1] == "--one":
+        print(json.dumps(_run_once(sys.argv[2], int(sys.argv[3]))))
+    else:
+        sizes = tuple(int(x) for x in sys.argv[1:]) or (10_000, 50_000)
+        print(benchmark(sizes).to_string(index=False))
@@ -1,35 +1,75 @@
+import os
+import time
+import tracemalloc
+
+import numpy as np
 import pandas as pd
 import streamlit as st
 
+from ju_island_postcodes import island_postcode_index, literal_flag_mask
+from ju_shipping_rules import ShippingRule, apply_shipping_rules, legacy_rules
 
-def make_final_df(
-    df_invoice_raw: pd.DataFrame,
-    df_notion: pd.DataFrame,
-    df_matching: pd.DataFrame,
-    product_column: str,
-    option_column: str | None = None,
-    quantity_column: str | None = None,
-    order_number_column: str | None = None,
-    shipping_fee: int | None = None,
-    shipping_condition_amount: int | None = None,
-    seller_shipping_ratio: int | None = 100,
-    island_column: str | None = None,
-    island_mode: str | None = None,  # "raw" | "flag"
-    island_flag_text: str | None = None,
-    island_fee_value: int | None = None,
-) -> pd.DataFrame:
-    """사용자 선택 컬럼으로 키를 만들어 df_matching과 조인합니다.
 
-    - 매칭 키 형식:
-      - 옵션 없음:  {상품명}
-      - 옵션 있음:  {상품명}({옵션명})
-    - df_matching은 '주문상품' 컬럼을 기준으로 조인됩니다.
-    """
-    if product_column not in df_invoice_raw.columns:
-        raise KeyError(f"상품명 컬럼이 존재하지 않습니다: {product_column}")
+# 조인 방식: "factorized"(정수 코드 조인, 조건이 안 맞으면 자동으로 merge) | "merge"(기존 방식)
+FINAL_JOIN_ENGINE = os.environ.get("FINAL_JOIN_ENGINE", "factorized")
+# 저메모리 모드: 필요한 컬럼만 골라 원본 위에 새 컬럼으로 붙임(결과는 기본 경로와 동일)
+FINAL_LEAN_MODE = os.environ.get("FINAL_LEAN_MODE", "1") not in ("0", "false", "False", "")
 
-    df_result = df_invoice_raw.copy()
-    # df_notion 컬럼명의 개행/스페이스 제거 및 중복 처리(안전)
+# df_invoice_raw 컬럼 뒤에 남기는 결과 컬럼
+_RESULT_COLUMNS = [
+    "노션상품",
+    "공급가(vat포함)",
+    "공급가합계(vat포함)",
+    "공구판매가",
+    "공구판매가합계(vat포함)",
+    "배송비",
+    "배송비규칙",
+    "도서산간배송비",
+]
+
+
+def _safe_codes(values: pd.Series) -> tuple[np.ndarray, np.ndarray]:
+    """값 기준 factorize. astype(str) 결과가 달라질 수 있는 값(1과 1.0, 0.0과 -0.0 등)이
+    같은 코드로 묶이지 않도록 정수/불리언/순수 문자열 열만 값 그대로, 나머지는 문자열로 바꿔서 나눕니다."""
+    if pd.api.types.is_integer_dtype(values.dtype) or pd.api.types.is_bool_dtype(values.dtype):
+        safe = values.dtype.kind in "iub"  # nullable 정수는 <NA> 문자열 처리 차이로 제외
+    else:
+        safe = values.dtype == object
+    if safe:
+        codes, uniques = pd.factorize(values, use_na_sentinel=False)
+        if values.dtype != object or pd.api.types.infer_dtype(uniques, skipna=False) == "string":
+            return codes, np.asarray(uniques, dtype=object)
+    return pd.factorize(values.astype(str), use_na_sentinel=False)
+
+
+def _factorized_text_key(df: pd.DataFrame, product_column: str, option_column: str | None) -> tuple[np.ndarray, np.ndarray]:
+    """(행별 코드, 코드별 키 문자열). 문자열 정리/결합은 고유값에 대해서만 수행합니다."""
+    p_codes, p_uniq = _safe_codes(df[product_column])
+    p_text = pd.Series(p_uniq, dtype=object).astype(str).str.strip().to_numpy(dtype=object)
+    if option_column is None:
+        return p_codes, p_text
+    o_codes, o_uniq = _safe_codes(df[option_column])
+    o_text = pd.Series(o_uniq, dtype=object).astype(str).str.strip().to_numpy(dtype=object)
+    pair_codes, pair_uniq = pd.factorize(p_codes.astype(np.int64) * max(1, len(o_uniq)) + o_codes)
+    keys = p_text[pair_uniq // max(1, len(o_uniq))] + "(" + o_text[pair_uniq % max(1, len(o_uniq))] + ")"
+    return pair_codes, keys
+
+
+def _lookup_positions(left_codes: np.ndarray, left_keys: np.ndarray, right_keys: pd.Series) -> np.ndarray | None:
+    """left 행마다 right에서 키가 같은 행 위치(없으면 -1). right 키가 중복이면 None(merge로 처리)."""
+    if right_keys.dtype != object or right_keys.duplicated().any():
+        return None
+    codes, _ = pd.factorize(
+        np.concatenate([left_keys, right_keys.to_numpy(dtype=object)]), use_na_sentinel=False
+    )
+    n_left = len(left_keys)
+    pos = np.full(len(codes) + 1, -1, dtype=np.int64)
+    pos[codes[n_left:]] = np.arange(len(right_keys))
+    return pos[codes[:n_left]][left_codes]
+
+
+def _normalized_notion(df_notion: pd.DataFrame) -> pd.DataFrame:
+    """df_notion 컬럼명의 개행/스페이스 제거 및 중복 처리(안전, 호출 측 프레임은 그대로 둠)"""
     try:
         cols = pd.Index(map(str, df_notion.columns)).str.replace(r"\s+", "", regex=True)
         seen = {}
@@ -41,23 +81,135 @@ def make_final_df(
             else:
                 seen[name] = 0
                 new_cols.append(name)
+        df_notion = df_notion.copy(deep=False)
         df_notion.columns = new_cols
     except Exception:
         pass
-    if option_column and option_column != "없음" and option_column in df_result.columns:
-        key_series = (
-            df_result[product_column].astype(str).str.strip()
-            + "("
-            + df_result[option_column].astype(str).str.strip()
-            + ")"
-        )
+    return df_notion
+
+
+def _reindexed(series: pd.Series, positions: np.ndarray, index: pd.Index) -> pd.Series:
+    # merge(how="left")와 같은 결측 처리/형 변환(int → float 등)
+    picked = series.reset_index(drop=True).reindex(positions)
+    picked.index = index
+    return picked
+
+
+def _lean_join(
+    df_invoice_raw: pd.DataFrame,
+    df_notion: pd.DataFrame,
+    df_matching: pd.DataFrame,
+    product_column: str,
+    option_column: str | None,
+    needed: set,
+) -> pd.DataFrame | None:
+    """원본을 얕게 복사한 뒤 needed에 든 매칭표/노션 컬럼만 위치 조회로 붙입니다.
+
+    결과 컬럼 이름은 기존 두 번의 merge와 같게 정하며(노션 쪽 중복 이름은 '_notion' 접미사),
+    키 중복 등으로 행이 늘어나는 경우처럼 그대로 붙일 수 없으면 None을 반환합니다.
+    """
+    matching_cols = [c for c in df_matching.columns if c != "주문상품"]
+    raw_cols = set(df_invoice_raw.columns)
+    if (
+        "주문상품" not in df_matching.columns
+        or "노션상품" not in matching_cols
+        or df_matching.columns.duplicated().any()
+        or df_invoice_raw.columns.duplicated().any()
+        or df_notion.columns.duplicated().any()
+        or (set(matching_cols) | {"주문상품"}) & raw_cols
+    ):
+        return None
+    key_codes, key_uniques = _factorized_text_key(df_invoice_raw, product_column, option_column)
+    positions = _lookup_positions(key_codes, key_uniques, df_matching["주문상품"])
+    if positions is None:
+        return None
+
+    out = df_invoice_raw.copy(deep=False)
+    out.index = pd.RangeIndex(len(out))
+    out["주문상품"] = key_uniques[key_codes]
+    has_notion_key = {"상품명", "구성"}.issubset(df_notion.columns)
+    for c in matching_cols:
+        # 노션 표가 조인되지 않으면 기존처럼 매칭표 컬럼을 모두 반환
+        if c in needed or c == "노션상품" or not has_notion_key:
+            out[c] = _reindexed(df_matching[c], positions, out.index)
+    if not has_notion_key:
+        return out
+
+    notion_product = out["노션상품"]
+    if notion_product.dtype != object:
+        return None
+    notion_key = (
+        df_notion["상품명"].astype(str).str.strip()
+        + "("
+        + df_notion["구성"].astype(str).str.strip()
+        + ")"
+    )
+    if "노션상품키" in df_notion.columns:
+        return None
+    left_codes, left_uniques = pd.factorize(notion_product, use_na_sentinel=False)
+    positions = _lookup_positions(left_codes, np.asarray(left_uniques, dtype=object), notion_key)
+    if positions is None:
+        return None
+    merged_cols = set(df_invoice_raw.columns) | {"주문상품"} | set(matching_cols)
+    for c in df_notion.columns:
+        name = f"{c}_notion" if c in merged_cols else c
+        if name in needed:
+            out[name] = _reindexed(df_notion[c], positions, out.index)
+    return out
+
+
+def _take_join(left: pd.DataFrame, right: pd.DataFrame, positions: np.ndarray, suffix: str) -> pd.DataFrame:
+    """left merge(how="left", 1:1 또는 n:1)와 같은 결과를 위치 기반 reindex로 만듭니다."""
+    picked = right.reset_index(drop=True).reindex(positions)
+    picked.index = left.index
+    overlap = set(picked.columns) & set(left.columns)
+    if overlap:
+        picked = picked.rename(columns={c: f"{c}{suffix}" for c in overlap})
+    return pd.concat([left, picked], axis=1)
+
+
+def _joined_full(
+    df_invoice_raw: pd.DataFrame,
+    df_notion: pd.DataFrame,
+    df_matching: pd.DataFrame,
+    product_column: str,
+    option_column: str | None,
+    use_option: bool,
+    engine: str,
+) -> pd.DataFrame:
+    """매칭표/노션 표의 모든 컬럼을 붙인 전체 프레임(기존 경로)."""
+    df_result = df_invoice_raw.copy()
+    matching_cols = [c for c in df_matching.columns if c != "주문상품"]
+    factorized = (
+        engine == "factorized"
+        and "주문상품" in df_matching.columns
+        and not df_matching.columns.duplicated().any()
+        and not (set(matching_cols) & set(df_result.columns) | {"주문상품"} & set(df_result.columns))
+    )
+    positions = None
+    if factorized:
+        key_codes, key_uniques = _factorized_text_key(df_result, product_column, option_column if use_option else None)
+        positions = _lookup_positions(key_codes, key_uniques, df_matching["주문상품"])
+    if positions is not None:
+        df_result["주문상품"] = key_uniques[key_codes]
+        # 1) 매칭표와 조인하여 df_result에 '노션상품' 열 부여
+        merged = _take_join(df_result.reset_index(drop=True), df_matching[matching_cols], positions, "_y")
     else:
-        key_series = df_result[product_column].astype(str).str.strip()
+        engine = "merge"
+        if use_option:
+            key_series = (
+                df_result[product_column].astype(str).str.strip()
+                + "("
+                + df_result[option_column].astype(str).str.strip()
+                + ")"
+            )
+        else:
+            key_series = df_result[product_column].astype(str).str.strip()
 
-    df_result["주문상품"] = key_series.fillna("")
+        df_result["주문상품"] = key_series.fillna("")
 
-    # 1) 매칭표와 조인하여 df_result에 '노션상품' 열 부여
-    merged = df_result.merge(df_matching, on="주문상품", how="left")
+        # 1) 매칭표와 조인하여 df_result에 '노션상품' 열 부여
+        merged = df_result.merge(df_matching, on="주문상품", how="left")
 
     # 2) 노션 테이블에서 '{상품명}({구성})' 키 생성 후 df_result의 '노션상품'과 조인
     if not {"상품명", "구성"}.issubset(df_notion.columns):
@@ -73,17 +225,27 @@ def make_final_df(
     df_notion_with_key = df_notion.copy()
     df_notion_with_key["노션상품키"] = notion_key_series
 
-    final_df = merged.merge(
-        df_notion_with_key,
-        how="left",
-        left_on="노션상품",
-        right_on="노션상품키",
-        suffixes=("", "_notion"),
-    )
+    positions = None
+    if engine == "factorized" and "노션상품" in merged.columns and merged["노션상품"].dtype == object:
+        left_codes, left_uniques = pd.factorize(merged["노션상품"], use_na_sentinel=False)
+        positions = _lookup_positions(left_codes, np.asarray(left_uniques, dtype=object), df_notion_with_key["노션상품키"])
+    if positions is not None and not df_notion_with_key.columns.duplicated().any():
+        final_df = _take_join(merged, df_notion_with_key, positions, "_notion")
+    else:
+        final_df = merged.merge(
+            df_notion_with_key,
+            how="left",
+            left_on="노션상품",
+            right_on="노션상품키",
+            suffixes=("", "_notion"),
+        )
     if "노션상품키" in final_df.columns:
         final_df = final_df.drop(columns=["노션상품키"])
+    return final_df
 
-    # 3) 공급가합계(vat포함) 계산: 공급가(vat포함) * 수량
+
+def _add_line_totals(final_df: pd.DataFrame, quantity_column: str | None) -> None:
+    """공급가합계/공구판매가합계(vat포함) = 단가 * 수량 (final_df에 바로 기록)"""
     if quantity_column and quantity_column in final_df.columns and "공급가(vat포함)" in final_df.columns:
         qty = pd.to_numeric(final_df[quantity_column], errors="coerce").fillna(0)
         unit_price = pd.to_numeric(final_df["공급가(vat포함)"], errors="coerce").fillna(0)
@@ -91,27 +253,85 @@ def make_final_df(
         final_df["공급가합계(vat포함)"] = unit_price * qty
         final_df["공구판매가합계(vat포함)"] = unit_price_sale * qty
 
-    # 4) 배송비 계산: 주문번호 그룹의 공구판매가 합이 조건 미만이면 첫 행에만 부과
+
+def make_final_df(
+    df_invoice_raw: pd.DataFrame,
+    df_notion: pd.DataFrame,
+    df_matching: pd.DataFrame,
+    product_column: str,
+    option_column: str | None = None,
+    quantity_column: str | None = None,
+    order_number_column: str | None = None,
+    shipping_fee: int | None = None,
+    shipping_condition_amount: int | None = None,
+    seller_shipping_ratio: int | None = 100,
+    island_column: str | None = None,
+    island_mode: str | None = None,  # "raw" | "flag" | "postcode"
+    island_flag_text: str | None = None,
+    island_fee_value: int | None = None,
+    join_engine: str | None = None,
+    lean: bool | None = None,
+    shipping_rules: list[ShippingRule] | None = None,
+    seller_column: str | None = None,
+) -> pd.DataFrame:
+    """사용자 선택 컬럼으로 키를 만들어 df_matching과 조인합니다.
+
+    - 매칭 키 형식:
+      - 옵션 없음:  {상품명}
+      - 옵션 있음:  {상품명}({옵션명})
+    - df_matching은 '주문상품' 컬럼을 기준으로 조인됩니다.
+    - join_engine: "factorized"면 키를 정수 코드로 한 번만 만들어 위치 조회로 조인(결과는 merge와 동일),
+      매칭표/노션 키가 중복되거나 컬럼명이 겹치는 경우에는 merge로 처리합니다.
+    - lean: 정수 코드 조인일 때 필요한 컬럼만 원본에 새 컬럼으로 붙여 넓은 중간 프레임을 만들지 않음
+    - shipping_rules: 주문 단위 배송비 규칙(ju_shipping_rules). 없으면 shipping_fee/조건 금액으로 기본 규칙 1개,
+      있으면 적용된 규칙명을 '배송비규칙' 컬럼으로 추가(판매자별 규칙은 seller_column 필요)
+    - 입력 DataFrame(df_notion 컬럼명 포함)은 변경하지 않습니다.
+    """
+    engine = (join_engine or FINAL_JOIN_ENGINE).lower()
+    lean = FINAL_LEAN_MODE if lean is None else lean
+    if product_column not in df_invoice_raw.columns:
+        raise KeyError(f"상품명 컬럼이 존재하지 않습니다: {product_column}")
+
+    df_notion = _normalized_notion(df_notion)
+    use_option = bool(option_column and option_column != "없음" and option_column in df_invoice_raw.columns)
+    keep_cols = list(df_invoice_raw.columns) + _RESULT_COLUMNS
+
+    final_df = None
+    if lean and engine == "factorized":
+        needed = set(_RESULT_COLUMNS) | {quantity_column, order_number_column, island_column, seller_column}
+        final_df = _lean_join(
+            df_invoice_raw, df_notion, df_matching, product_column, option_column if use_option else None, needed
+        )
+        if final_df is not None and not {"상품명", "구성"}.issubset(df_notion.columns):
+            return final_df
+    if final_df is None:
+        final_df = _joined_full(df_invoice_raw, df_notion, df_matching, product_column, option_column, use_option, engine)
+        if not {"상품명", "구성"}.issubset(df_notion.columns):
+            return final_df
+
+    # 3) 공급가합계(vat포함) 계산: 공급가(vat포함) * 수량
+    _add_line_totals(final_df, quantity_column)
+
+    # 4) 배송비 계산: 주문번호 단위 규칙 평가(기본은 공구판매가 합이 조건 미만이면 첫 행에만 부과)
+    rules = shipping_rules if shipping_rules else legacy_rules(shipping_fee, shipping_condition_amount)
     if (
         order_number_column
         and order_number_column in final_df.columns
         and "공구판매가" in final_df.columns
-        and shipping_fee is not None
-        and shipping_condition_amount is not None
+        and rules
     ):
-        try:
-            order_sum = (
-                pd.to_numeric(final_df["공구판매가"], errors="coerce").fillna(0)
-                .groupby(final_df[order_number_column])
-                .transform("sum")
-            )
-            first_row = ~final_df[order_number_column].duplicated()
-            seller_ratio = 100 if seller_shipping_ratio is None else max(0, min(100, int(seller_shipping_ratio)))
-            ship_unit = int(round(int(shipping_fee) * seller_ratio / 100))
-            final_df["배송비"] = 0
-            final_df.loc[first_row & (order_sum < int(shipping_condition_amount)), "배송비"] = ship_unit
-        except Exception:
-            final_df["배송비"] = 0
+        shipping = apply_shipping_rules(
+            final_df,
+            order_number_column,
+            rules,
+            seller_ratio=seller_shipping_ratio,
+            quantity_column=quantity_column,
+            seller_column=seller_column,
+        )
+        final_df["배송비"] = shipping["배송비"]
+        if shipping_rules:
+            # 사용자 규칙을 쓴 경우 주문별로 적용된 규칙명을 남김
+            final_df["배송비규칙"] = shipping["배송비규칙"]
 
     # 5) 도서산간 배송비 처리
     if island_column and island_column in final_df.columns:
@@ -120,9 +340,15 @@ def make_final_df(
             if island_mode == "raw":
                 base_fee = pd.to_numeric(final_df[island_column], errors="coerce").fillna(0)
                 final_df["도서산간배송비"] = (base_fee * ratio / 100).round().astype(int)
-            elif island_mode == "flag" and order_number_column in final_df.columns:
-                flag_mask = final_df[island_column].astype(str).str.contains(str(island_flag_text or ""), na=False)
-                is_first = ~final_df[order_number_column].duplicated()
+            elif island_mode in ("flag", "postcode") and order_number_column in final_df.columns:
+                if island_mode == "postcode":
+                    # 우편번호 구간표로 판별, 우편번호를 읽지 못한 행만 구분 텍스트로 보조 판별
+                    flag_mask, _, unparsed = island_postcode_index().classify(final_df[island_column])
+                    if island_flag_text:
+                        flag_mask = flag_mask | (unparsed & literal_flag_mask(final_df[island_column], island_flag_text))
+                else:
+                    flag_mask = literal_flag_mask(final_df[island_column], island_flag_text)
+                is_first = ~final_df[order_number_column].duplicated().to_numpy()
                 final_df["도서산간배송비"] = 0
                 if island_fee_value is not None:
                     fee_unit = int(round(int(island_fee_value) * ratio / 100))
@@ -131,17 +357,89 @@ def make_final_df(
             pass
 
     # 6) 컬럼 정리: 원래 df_raw 컬럼 + 지정 컬럼만 유지
-    keep_cols = list(df_invoice_raw.columns) + [
-        "노션상품",
-        "공급가(vat포함)",
-        "공급가합계(vat포함)",
-        "공구판매가",
-        "공구판매가합계(vat포함)",
-        "배송비",
-        "도서산간배송비",
-    ]
     existing = [c for c in keep_cols if c in final_df.columns]
     final_df = final_df.loc[:, existing]
     return final_df
 
 
+
+
+def _make_sample(n_rows: int, n_products: int = 200, n_extra: int = 10, seed: int = 0) -> tuple[pd.DataFrame, pd.DataFrame, pd.DataFrame]:
+    """(df_invoice_raw, df_notion, df_matching) 예시 데이터(양쪽에 n_extra개의 부가 컬럼)."""
+    rng = np.random.default_rng(seed)
+    products = np.array([f"상품{i} " for i in range(n_products)], dtype=object)
+    options = np.array(["1개", "2개", "3개"], dtype=object)
+    df_raw = pd.DataFrame({
+        "주문번호": rng.integers(0, max(1, n_rows // 3), n_rows),
+        "상품명": products[rng.integers(0, n_products, n_rows)],
+        "옵션": options[rng.integers(0, len(options), n_rows)],
+        "수량": rng.integers(1, 4, n_rows),
+    })
+    df_notion = pd.DataFrame({
+        "NO": range(1, n_products + 1),
+        "상품명": [f"노션{i}" for i in range(n_products)],
+        "구성": ["기본"] * n_products,
+        "공급가(vat포함)": rng.integers(1_000, 5_000, n_products),
+        "공구판매가": rng.integers(5_000, 9_000, n_products),
+    })
+    for i in range(n_extra):
+        df_raw[f"주문정보{i}"] = np.array([f"값{j}" for j in range(50)], dtype=object)[rng.integers(0, 50, n_rows)]
+        df_notion[f"상품정보{i}"] = rng.integers(0, 100, n_products)
+    df_matching = pd.DataFrame({
+        "주문상품": [f"{p.strip()}({o})" for p in products for o in options],
+        "노션상품": [f"노션{i}(기본)" for i in range(n_products) for _ in options],
+    })
+    return df_raw, df_notion, df_matching
+
+
+def benchmark(sizes: tuple[int, ...] = (10_000, 100_000, 500_000), repeat: int = 3) -> pd.DataFrame:
+    """merge / factorized 조인 방식의 make_final_df 소요 시간을 비교합니다(결과 동일 여부 포함)."""
+    rows = []
+    for n in sizes:
+        df_raw, df_notion, df_matching = _make_sample(n)
+        results = {}
+        for engine in ("merge", "factorized"):
+            best = None
+            for _ in range(repeat):
+                t0 = time.perf_counter()
+                results[engine] = make_final_df(
+                    df_raw, df_notion.copy(), df_matching, "상품명", "옵션", "수량", "주문번호",
+                    3000, 30000, 100, join_engine=engine, lean=False,
+                )
+                elapsed = time.perf_counter() - t0
+                best = elapsed if best is None else min(best, elapsed)
+            rows.append({"rows": n, "engine": engine, "seconds": round(best, 4)})
+        same = results["merge"].equals(results["factorized"])
+        for row in rows[-2:]:
+            row["identical"] = same
+    return pd.DataFrame(rows)
+
+
+def memory_benchmark(n_rows: int = 500_000) -> pd.DataFrame:
+    """기본 경로와 저메모리 모드의 make_final_df 실행 중 최대 추가 메모리(tracemalloc)를 비교합니다."""
+    df_raw, df_notion, df_matching = _make_sample(n_rows)
+    rows = []
+    for label, engine, lean in (("merge", "merge", False), ("factorized", "factorized", False), ("lean", "factorized", True)):
+        tracemalloc.start()
+        t0 = time.perf_counter()
+        make_final_df(
+            df_raw, df_notion, df_matching, "상품명", "옵션", "수량", "주문번호",
+            3000, 30000, 100, join_engine=engine, lean=lean,
+        )
+        elapsed = time.perf_counter() - t0
+        _, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+        rows.append({"rows": n_rows, "mode": label, "seconds": round(elapsed, 3), "peak_mb": round(peak / 1024 / 1024, 1)})
+    base = rows[0]["peak_mb"]
+    for row in rows:
+        row["vs_merge"] = f"{row['peak_mb'] / base:.0%}" if base else "-"
+    return pd.DataFrame(rows)
+
+
+if __name__ == "__main__":
+    # 사용법: python ju_make_final_df.py [행수 ...]
+    import sys
+
+    sizes = tuple(int(x) for x in sys.argv[1:]) or (10_000, 100_000, 500_000)
+    print(benchmark(sizes).to_string(index=False))
+    print(memory_benchmark(max(sizes)).to_string(index=False))
@@ -1,6 +1,70 @@
+import time
+
+import numpy as np
 import pandas as pd
 import streamlit as st
 
+from ju_shipping_rules import ShippingRule, shipping_summary
+
+
+def _finance_view(df_final: pd.DataFrame) -> pd.DataFrame:
+    """표시/집계 안전화: '__숫자' 접미사 컬럼과 이름이 완전히 같은 중복 컬럼(첫 번째만 유지)을 뺍니다."""
+    try:
+        cols = pd.Index(map(str, df_final.columns))
+        keep_mask = ~cols.str.contains(r"__\\d+$") & ~pd.Index(df_final.columns).duplicated(keep="first")
+        # 뺄 컬럼이 없으면 복사하지 않음
+        if not keep_mask.all():
+            df_final = df_final.loc[:, ~cols.str.contains(r"__\\d+$")]
+            df_final = df_final.loc[:, ~pd.Index(df_final.columns).duplicated(keep="first")]
+    except Exception:
+        pass
+    return df_final
+
+
+def _ensure_series(df: pd.DataFrame, col: str) -> pd.Series:
+    """중복 컬럼명으로 DataFrame이 반환되는 경우 첫 컬럼 Series로 축소(없으면 빈 Series)."""
+    if col not in df.columns:
+        return pd.Series(dtype=float, index=df.index)
+    obj = df[col]
+    if isinstance(obj, pd.DataFrame):
+        return obj.iloc[:, 0]
+    return obj
+
+
+def option_inputs(df_final: pd.DataFrame, quantity_column: str | None) -> tuple[pd.DataFrame, pd.Series]:
+    """옵션별 집계 입력: 컬럼별로 한 번만 숫자 변환한 행 단위 값(qty/unit_sale/unit_cost/sale_sum)과 그룹 기준(노션상품)."""
+    if "노션상품" not in df_final.columns:
+        df_final = df_final.assign(노션상품="")
+    index = df_final.index
+    if quantity_column and quantity_column in df_final.columns:
+        qty = pd.to_numeric(_ensure_series(df_final, quantity_column), errors="coerce").fillna(0)
+    else:
+        qty = pd.Series(0, index=index)
+
+    def numeric_or(col: str, default: float) -> pd.Series:
+        if col not in df_final.columns:
+            return pd.Series(default, index=index, dtype=float)
+        values = pd.to_numeric(_ensure_series(df_final, col), errors="coerce")
+        return values if default != default else values.fillna(default)
+
+    values = pd.DataFrame({
+        "qty": qty,
+        "unit_sale": numeric_or("공구판매가", float("nan")),
+        "unit_cost": numeric_or("공급가(vat포함)", float("nan")),
+        "sale_sum": numeric_or("공구판매가합계(vat포함)", 0),
+    }, index=index)
+    return values, _ensure_series(df_final, "노션상품")
+
+
+def option_aggregates(values: pd.DataFrame, groups: pd.Series) -> pd.DataFrame:
+    """노션상품별 수량/판매가합계는 합계, 단가는 그룹 내 첫 유효값(한 번의 groupby)."""
+    return values.groupby(groups, dropna=False).agg(
+        qty=("qty", "sum"),
+        unit_sale=("unit_sale", "first"),
+        unit_cost=("unit_cost", "first"),
+        sale_sum=("sale_sum", "sum"),
+    )
+
 
 def make_finance_df(
     df_final: pd.DataFrame,
@@ -9,10 +73,14 @@ def make_finance_df(
     shipping_fee_sale: int | None,
     seller_shipping_ratio: int | None,
     island_fee_input: int | None,
+    shipping_rules: list[ShippingRule] | None = None,
+    option_aggregates_df: pd.DataFrame | None = None,
 ) -> pd.DataFrame:
     """df_final로부터 정산 요약 df_finance를 생성합니다.
 
     컬럼 순서: '상품명','옵션','수량','공구판매가','공구판매가합계(vat포함)','공급가(vat포함)','정산금액(vat포함)'
+    shipping_rules가 있고 df_final에 '배송비규칙' 컬럼이 있으면 배송비를 규칙별 행('배송비(규칙명)')으로 나눕니다.
+    option_aggregates_df: 이미 계산해 둔 옵션별 집계(option_aggregates와 같은 형태, 증분 재계산용). 없으면 여기서 집계.
     """
     # 상품명 라벨: 드라이브 첫 파일명 기준 "{3번째요소}X{4번째요소}"
     fname = (drive_files[0].get("name") if (isinstance(drive_files, list) and len(drive_files) > 0 and isinstance(drive_files[0], dict)) else "") or ""
@@ -20,48 +88,18 @@ def make_finance_df(
     parts = base_name.split("_")
     product_label = f"{parts[2]}X{parts[3]}" if len(parts) >= 4 else base_name
 
-    # 표시/집계 안전화: 컬럼명 문자열화 및 중복 처리
-    try:
-        cols = pd.Index(map(str, df_final.columns))
-        # '__숫자' 접미사 제거 대상 제외 마스크
-        keep_mask = ~cols.str.contains(r"__\\d+$")
-        df_final = df_final.loc[:, list(keep_mask)]
-        # 완전 동일 중복 컬럼은 첫 번째만 유지
-        df_final = df_final.loc[:, ~pd.Index(df_final.columns).duplicated(keep="first")]
-    except Exception:
-        pass
-
-    # 보조: 중복 컬럼명으로 DataFrame이 반환되는 경우 첫 컬럼 Series로 축소
-    def ensure_series(df: pd.DataFrame, col: str) -> pd.Series:
-        if col not in df.columns:
-            return pd.Series(dtype=float, index=df.index)
-        obj = df[col]
-        if isinstance(obj, pd.DataFrame):
-            return obj.iloc[:, 0]
-        return obj
+    df_final = _finance_view(df_final)
 
     rows: list[dict] = []
 
     # 옵션별 집계
     if df_final is not None and not df_final.empty:
-        # 그룹 기준 보정
-        if "노션상품" not in df_final.columns:
-            df_final = df_final.assign(노션상품="")
-        grp = df_final.groupby("노션상품", dropna=False)
-        for opt, g in grp:
-            if quantity_column and quantity_column in g.columns:
-                qty_series = pd.to_numeric(ensure_series(g, quantity_column), errors="coerce").fillna(0)
-            else:
-                qty_series = pd.Series(0, index=g.index)
-            qty_sum = qty_series.sum()
-            unit_sale_series = pd.to_numeric(ensure_series(g, "공구판매가"), errors="coerce").dropna() if "공구판매가" in g.columns else pd.Series(dtype=float)
-            unit_cost_series = pd.to_numeric(ensure_series(g, "공급가(vat포함)"), errors="coerce").dropna() if "공급가(vat포함)" in g.columns else pd.Series(dtype=float)
-            sale_sum = (
-                pd.to_numeric(ensure_series(g, "공구판매가합계(vat포함)"), errors="coerce").fillna(0).sum()
-                if "공구판매가합계(vat포함)" in g.columns else 0
-            )
-            unit_sale = int(unit_sale_series.iloc[0]) if not unit_sale_series.empty else 0
-            unit_cost = int(unit_cost_series.iloc[0]) if not unit_cost_series.empty else 0
+        agg = option_aggregates_df
+        if agg is None:
+            agg = option_aggregates(*option_inputs(df_final, quantity_column))
+        for opt, qty_sum, unit_sale, unit_cost, sale_sum in agg.itertuples(name=None):
+            unit_sale = 0 if pd.isna(unit_sale) else int(unit_sale)
+            unit_cost = 0 if pd.isna(unit_cost) else int(unit_cost)
             settle_sum = int(round(unit_cost * qty_sum))
             rows.append({
                 "상품명": product_label,
@@ -78,8 +116,20 @@ def make_finance_df(
 
     # 배송비 row
     ship_fee_sale = int(shipping_fee_sale or 0)
-    if df_final is not None and "배송비" in df_final.columns:
-        ship_cnt = int((pd.to_numeric(ensure_series(df_final, "배송비"), errors="coerce").fillna(0) > 0).sum())
+    if shipping_rules and df_final is not None and "배송비규칙" in df_final.columns:
+        for item in shipping_summary(_ensure_series(df_final, "배송비규칙"), shipping_rules, seller_ratio):
+            rows.append({
+                "상품명": product_label,
+                "옵션": f"배송비({item['name']})",
+                "수량": item["count"],
+                "공구판매가": item["sale_fee"],
+                "공구판매가합계(vat포함)": int(item["count"] * item["sale_fee"]),
+                "공급가(vat포함)": item["cost_fee"],
+                "정산금액(vat포함)": int(item["count"] * item["cost_fee"]),
+            })
+        ship_cnt = 0
+    elif df_final is not None and "배송비" in df_final.columns:
+        ship_cnt = int((pd.to_numeric(_ensure_series(df_final, "배송비"), errors="coerce").fillna(0) > 0).sum())
     else:
         ship_cnt = 0
     if ship_cnt > 0 and ship_fee_sale > 0:
@@ -96,14 +146,14 @@ def make_finance_df(
 
     # 도서산간배송비 row
     if df_final is not None and "도서산간배송비" in df_final.columns:
-        island_cnt = int((pd.to_numeric(ensure_series(df_final, "도서산간배송비"), errors="coerce").fillna(0) > 0).sum())
+        island_cnt = int((pd.to_numeric(_ensure_series(df_final, "도서산간배송비"), errors="coerce").fillna(0) > 0).sum())
     else:
         island_cnt = 0
     if island_cnt > 0:
         island_fee_sale = int(island_fee_input or 0)
         if island_fee_sale <= 0:
             # df_final의 도서산간배송비 평균(셀러부담 금액) → 원래 판매가로 역산
-            avg_fee_series = pd.to_numeric(ensure_series(df_final, "도서산간배송비"), errors="coerce").fillna(0) if "도서산간배송비" in df_final.columns else pd.Series(dtype=float)
+            avg_fee_series = pd.to_numeric(_ensure_series(df_final, "도서산간배송비"), errors="coerce").fillna(0) if "도서산간배송비" in df_final.columns else pd.Series(dtype=float)
             avg_cost = float(avg_fee_series[avg_fee_series > 0].mean()) if (avg_fee_series > 0).any() else 0.0
             if avg_cost > 0 and seller_ratio > 0:
                 island_fee_sale = int(round(avg_cost / (seller_ratio / 100)))
@@ -124,4 +174,94 @@ def make_finance_df(
     df_finance = pd.DataFrame(rows, columns=[
         "상품명","옵션","수량","공구판매가","공구판매가합계(vat포함)","공급가(vat포함)","정산금액(vat포함)"
     ])
-    return df_finance
\ No newline at end of file
+    return df_finance
+
+
+def _legacy_option_rows(df_final: pd.DataFrame, quantity_column: str | None) -> list[dict]:
+    """비교 기준: groupby 한 번으로 바꾸기 전의 옵션(노션상품)별 반복 집계."""
+    df_final = _finance_view(df_final)
+    rows = []
+    if "노션상품" not in df_final.columns:
+        df_final = df_final.assign(노션상품="")
+    for opt, g in df_final.groupby("노션상품", dropna=False):
+        if quantity_column and quantity_column in g.columns:
+            qty_series = pd.to_numeric(_ensure_series(g, quantity_column), errors="coerce").fillna(0)
+        else:
+            qty_series = pd.Series(0, index=g.index)
+        qty_sum = qty_series.sum()
+        unit_sale_series = pd.to_numeric(_ensure_series(g, "공구판매가"), errors="coerce").dropna() if "공구판매가" in g.columns else pd.Series(dtype=float)
+        unit_cost_series = pd.to_numeric(_ensure_series(g, "공급가(vat포함)"), errors="coerce").dropna() if "공급가(vat포함)" in g.columns else pd.Series(dtype=float)
+        sale_sum = (
+            pd.to_numeric(_ensure_series(g, "공구판매가합계(vat포함)"), errors="coerce").fillna(0).sum()
+            if "공구판매가합계(vat포함)" in g.columns else 0
+        )
+        unit_sale = int(unit_sale_series.iloc[0]) if not unit_sale_series.empty else 0
+        unit_cost = int(unit_cost_series.iloc[0]) if not unit_cost_series.empty else 0
+        rows.append({
+            "옵션": "" if opt is None else str(opt),
+            "수량": int(qty_sum),
+            "공구판매가": unit_sale,
+            "공구판매가합계(vat포함)": int(round(sale_sum)),
+            "공급가(vat포함)": unit_cost,
+            "정산금액(vat포함)": int(round(unit_cost * qty_sum)),
+        })
+    return rows
+
+
+def _make_sample(n_rows: int, n_options: int = 300, seed: int = 0) -> pd.DataFrame:
+    """df_final 예시: 옵션 결측, 문자열/결측 단가, 중복 컬럼과 '__숫자' 컬럼을 섞은 데이터."""
+    rng = np.random.default_rng(seed)
+    options = np.array([f"상품{i % 50} 옵션{i}" for i in range(n_options)] + [None], dtype=object)
+    opt = options[rng.integers(0, len(options), n_rows)]
+    base = rng.integers(1, 50, n_rows) * 1000
+    unit_sale = pd.Series(base, dtype=object)
+    unit_sale[rng.random(n_rows) < 0.1] = None
+    unit_sale[rng.random(n_rows) < 0.05] = "문의"
+    unit_cost = pd.Series(base * 0.8, dtype=object)
+    unit_cost[rng.random(n_rows) < 0.1] = np.nan
+    qty = pd.Series(rng.integers(1, 4, n_rows), dtype=object)
+    qty[rng.random(n_rows) < 0.05] = "2"
+    df = pd.DataFrame({
+        "노션상품": opt,
+        "수량": qty,
+        "공구판매가": unit_sale,
+        "공구판매가합계(vat포함)": base * rng.integers(1, 4, n_rows),
+        "공급가(vat포함)": unit_cost,
+        "수량__1": rng.integers(0, 9, n_rows),
+    })
+    dup = pd.DataFrame({"수량": rng.integers(100, 200, n_rows)})
+    return pd.concat([df, dup], axis=1)
+
+
+def self_check(sizes: tuple[int, ...] = (0, 1, 1_000, 50_000)) -> pd.DataFrame:
+    """옵션 행이 이전 반복 집계와 행 단위로 같은지 확인하고 소요 시간을 비교합니다."""
+    columns = ["옵션", "수량", "공구판매가", "공구판매가합계(vat포함)", "공급가(vat포함)", "정산금액(vat포함)"]
+    files = [{"name": "a_b_상품_셀러.xlsx"}]
+    rows = []
+    for n in sizes:
+        df_final = _make_sample(n, seed=n)
+        for quantity_column in ("수량", None):
+            t0 = time.perf_counter()
+            expected = pd.DataFrame(_legacy_option_rows(df_final, quantity_column), columns=columns)
+            legacy_s = time.perf_counter() - t0
+            t0 = time.perf_counter()
+            got = make_finance_df(df_final, files, quantity_column, None, None, None)
+            grouped_s = time.perf_counter() - t0
+            pd.testing.assert_frame_equal(got[columns].reset_index(drop=True), expected, check_dtype=False)
+            assert (got["상품명"] == "상품X셀러").all()
+            rows.append({
+                "rows": n,
+                "quantity_column": quantity_column,
+                "options": len(expected),
+                "legacy_s": round(legacy_s, 4),
+                "grouped_s": round(grouped_s, 4),
+            })
+    return pd.DataFrame(rows)
+
+
+if __name__ == "__main__":
+    # 사용법: python ju_make_finance_df.py [행수 ...]
+    import sys
+
+    sizes = tuple(int(x) for x in sys.argv[1:]) or (0, 1, 1_000, 50_000)
+    print(self_check(sizes).to_string(index=False))
@@ -0,0 +1,111 @@
+import json
+import os
+import sqlite3
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+
+from ju_notion_files import NOTION_CRAWL_WORKERS, collect_xlsx_files
+
+
+# 페이지별 파일 목록 캐시(세션/프로세스 재시작 후에도 유지되는 로컬 sqlite)
+NOTION_CACHE_PATH = os.environ.get("NOTION_CACHE_PATH") or os.path.join(tempfile.gettempdir(), "ju_notion_cache.sqlite3")
+# Notion 호스팅 파일의 서명 URL은 약 1시간 뒤 만료되므로 TTL은 그보다 짧게
+NOTION_FILE_LIST_TTL = float(os.environ.get("NOTION_FILE_LIST_TTL", "3000"))
+_EXPIRY_MARGIN = 300.0
+
+
+def _parse_iso(ts: str) -> float | None:
+    try:
+        return datetime.fromisoformat(ts.replace("Z", "+00:00")).timestamp()
+    except (AttributeError, ValueError):
+        return None
+
+
+class NotionFileListCache:
+    """get_xlsx_files_from_page 결과를 페이지 id별로 보관합니다.
+
+    - TTL(및 첨부 URL 만료 시각) 안이라도, 루트 페이지 pages.retrieve 1회와 하위 페이지별
+      blocks.retrieve 1회로 last_edited_time을 비교해 하나라도 바뀌었으면 다시 수집
+    - invalidate()로 명시적으로 비울 수 있음
+    """
+
+    def __init__(self, path: str = NOTION_CACHE_PATH, ttl: float = NOTION_FILE_LIST_TTL):
+        self.path = path
+        self.ttl = ttl
+        self._lock = threading.Lock()
+        with self._connect() as conn:
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS page_files ("
+                " page_id TEXT PRIMARY KEY, files TEXT NOT NULL, meta TEXT NOT NULL, expires_at REAL NOT NULL)"
+            )
+
+    def _connect(self) -> sqlite3.Connection:
+        return sqlite3.connect(self.path, timeout=10)
+
+    def get(self, notion, page_id: str) -> list[dict] | None:
+        with self._lock, self._connect() as conn:
+            row = conn.execute("SELECT files, meta, expires_at FROM page_files WHERE page_id = ?", (page_id,)).fetchone()
+        if row is None or row[2] <= time.time():
+            return None
+        files, meta = json.loads(row[0]), json.loads(row[1])
+        try:
+            for pid, edited in (meta.get("last_edited") or {}).items():
+                if notion.pages.retrieve(page_id=pid).get("last_edited_time") != edited:
+                    return None
+            subpages = meta.get("subpages") or {}
+            if subpages:
+                with ThreadPoolExecutor(max_workers=NOTION_CRAWL_WORKERS) as pool:
+                    current = pool.map(lambda sub_id: notion.blocks.retrieve(block_id=sub_id).get("last_edited_time"), subpages)
+                    if any(now != edited for now, edited in zip(current, subpages.values())):
+                        return None
+        except Exception:
+            return None
+        return files
+
+    def put(self, page_id: str, files: list[dict], meta: dict) -> None:
+        # 루트 페이지 수정 시각을 모르면 검증할 수 없으므로 저장하지 않음
+        if not (meta.get("last_edited") or {}).get(page_id):
+            return
+        expires_at = time.time() + self.ttl
+        for ts in meta.get("expiry_times") or []:
+            expiry = _parse_iso(ts)
+            if expiry is not None:
+                expires_at = min(expires_at, expiry - _EXPIRY_MARGIN)
+        with self._lock, self._connect() as conn:
+            conn.execute(
+                "INSERT OR REPLACE INTO page_files (page_id, files, meta, expires_at) VALUES (?, ?, ?, ?)",
+                (page_id, json.dumps(files, ensure_ascii=False), json.dumps(meta, ensure_ascii=False), expires_at),
+            )
+
+    def invalidate(self, page_id: str | None = None) -> None:
+        with self._lock, self._connect() as conn:
+            if page_id is None:
+                conn.execute("DELETE FROM page_files")
+            else:
+                conn.execute("DELETE FROM page_files WHERE page_id = ?", (page_id,))
+
+    def files_for_page(self, notion, page_id: str, max_workers: int | None = None) -> list[dict]:
+        """캐시가 유효하면 캐시를, 아니면 다시 수집해 저장한 결과를 반환합니다."""
+        cached = self.get(notion, page_id)
+        if cached is not None:
+            return cached
+        meta: dict = {}
+        files = collect_xlsx_files(notion, page_id, max_workers=max_workers, meta=meta)
+        self.put(page_id, files, meta)
+        return files
+
+
+_default_cache: NotionFileListCache | None = None
+_default_lock = threading.Lock()
+
+
+def notion_file_list_cache() -> NotionFileListCache:
+    """프로세스 공용 인스턴스."""
+    global _default_cache
+    with _default_lock:
+        if _default_cache is None:
+            _default_cache = NotionFileListCache()
+        return _default_cache
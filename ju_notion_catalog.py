@@ -0,0 +1,236 @@
+import bisect
+import os
+import sqlite3
+import threading
+import time
+import urllib.parse
+from collections import defaultdict
+
+from ju_notion_cache import NOTION_CACHE_PATH
+
+
+# 페이지 제목 카탈로그 동기화 주기(초): 증분 동기화 / 전체 재동기화(삭제·권한 해제 반영)
+NOTION_CATALOG_SYNC_INTERVAL = float(os.environ.get("NOTION_CATALOG_SYNC_INTERVAL", "300"))
+NOTION_CATALOG_FULL_SYNC_INTERVAL = float(os.environ.get("NOTION_CATALOG_FULL_SYNC_INTERVAL", "86400"))
+
+
+def extract_page_title(page):
+    """검색 결과의 페이지 객체에서 사람이 읽을 수 있는 제목을 추출합니다."""
+    # 1) 데이터베이스 항목(행)인 경우: properties 안의 type==title 속성에서 추출
+    properties = page.get("properties", {}) or {}
+    for _, prop in properties.items():
+        if isinstance(prop, dict) and prop.get("type") == "title":
+            title_fragments = prop.get("title", [])
+            if title_fragments:
+                return "".join([frag.get("plain_text", "") for frag in title_fragments]) or None
+    # 2) 일반 페이지인 경우: URL slug에서 유추
+    url = page.get("url", "")
+    if url:
+        try:
+            last = url.split("/")[-1].split("?")[0]
+            parts = last.split("-")
+            if len(parts) > 1:
+                slug = "-".join(parts[:-1])
+            else:
+                slug = last
+            return urllib.parse.unquote(slug).replace("-", " ")
+        except Exception:
+            return None
+    return None
+
+
+def normalize_text(text):
+    return "".join((text or "").lower().split())
+
+
+def _bigrams(norm: str) -> set[str]:
+    if len(norm) < 2:
+        return {norm} if norm else set()
+    return {norm[i:i + 2] for i in range(len(norm) - 1)}
+
+
+class _TitleIndex:
+    """정확 일치(dict) / 접두 일치(정렬 목록 + bisect) / 부분·유사 일치(bigram 역색인)."""
+
+    def __init__(self, rows: list[dict]):
+        # 최근 수정 순(검색 API 정렬과 동일)
+        self.rows = sorted(rows, key=lambda r: r.get("last_edited_time") or "", reverse=True)
+        self.by_norm: dict[str, list[int]] = defaultdict(list)
+        self.grams: dict[str, set[int]] = defaultdict(set)
+        for i, row in enumerate(self.rows):
+            self.by_norm[row["norm_title"]].append(i)
+            for gram in _bigrams(row["norm_title"]):
+                self.grams[gram].add(i)
+        self.sorted_norms = sorted(self.by_norm)
+
+    def _prefix(self, norm: str) -> list[int]:
+        found = []
+        pos = bisect.bisect_left(self.sorted_norms, norm)
+        while pos < len(self.sorted_norms) and self.sorted_norms[pos].startswith(norm):
+            found.extend(self.by_norm[self.sorted_norms[pos]])
+            pos += 1
+        return sorted(found)
+
+    def lookup(self, title: str, min_similarity: float = 0.5) -> list[dict]:
+        norm = normalize_text(title)
+        if not norm or not self.rows:
+            return []
+        exact = self.by_norm.get(norm)
+        if exact:
+            return [self._candidate(i) for i in exact]
+
+        query_grams = _bigrams(norm)
+        postings = [self.grams.get(g, set()) for g in query_grams]
+        prefix = self._prefix(norm)
+        prefix_set = set(prefix)
+        # 부분 일치: 모든 bigram을 가진 후보만 실제 포함 여부 확인
+        shared = set.intersection(*postings) if postings and all(postings) else set()
+        partial = sorted(i for i in shared if i not in prefix_set and norm in self.rows[i]["norm_title"])
+        if prefix or partial:
+            return [self._candidate(i) for i in prefix + partial]
+
+        # 유사 일치: bigram Dice 계수 상위
+        counts: dict[int, int] = defaultdict(int)
+        for posting in postings:
+            for i in posting:
+                counts[i] += 1
+        scored = []
+        for i, hit in counts.items():
+            score = 2 * hit / (len(query_grams) + len(_bigrams(self.rows[i]["norm_title"])))
+            if score >= min_similarity:
+                scored.append((-score, i))
+        return [self._candidate(i) for _, i in sorted(scored)]
+
+    def _candidate(self, i: int) -> dict:
+        row = self.rows[i]
+        return {"id": row["id"], "title": row["title"], "url": row["url"]}
+
+
+class NotionPageCatalog:
+    """Notion 페이지 id/제목/정규화 제목을 로컬 sqlite에 보관하고 메모리 색인으로 조회합니다.
+
+    - 백그라운드 스레드가 last_edited_time 내림차순 검색으로 마지막 동기화 이후 수정분만 반영
+    - 주기적으로 전체 재동기화하여 삭제/보관/권한 해제된 페이지를 정리
+    """
+
+    def __init__(self, notion, path: str = NOTION_CACHE_PATH):
+        self.notion = notion
+        self.path = path
+        self._lock = threading.Lock()
+        self._sync_lock = threading.Lock()
+        self._thread: threading.Thread | None = None
+        self.last_full_sync = 0.0
+        with self._connect() as conn:
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS page_catalog ("
+                " id TEXT PRIMARY KEY, title TEXT NOT NULL, norm_title TEXT NOT NULL,"
+                " url TEXT, last_edited_time TEXT)"
+            )
+            conn.execute("CREATE INDEX IF NOT EXISTS page_catalog_edited ON page_catalog (last_edited_time)")
+        self._index = _TitleIndex(self._load_rows())
+
+    def _connect(self) -> sqlite3.Connection:
+        return sqlite3.connect(self.path, timeout=10)
+
+    def _load_rows(self) -> list[dict]:
+        with self._connect() as conn:
+            cur = conn.execute("SELECT id, title, norm_title, url, last_edited_time FROM page_catalog")
+            return [
+                {"id": r[0], "title": r[1], "norm_title": r[2], "url": r[3], "last_edited_time": r[4]}
+                for r in cur.fetchall()
+            ]
+
+    @property
+    def size(self) -> int:
+        return len(self._index.rows)
+
+    def lookup(self, title: str) -> list[dict]:
+        """[{id, title, url}] (정확 → 접두/부분 → 유사 순, 없으면 빈 목록)"""
+        with self._lock:
+            index = self._index
+        return index.lookup(title)
+
+    def sync(self, full: bool = False) -> int:
+        """search API로 변경분을 반영하고 반영한 페이지 수를 반환합니다."""
+        with self._sync_lock:
+            with self._connect() as conn:
+                watermark = None if full else conn.execute("SELECT MAX(last_edited_time) FROM page_catalog").fetchone()[0]
+            seen: set[str] = set()
+            upserts, removes = [], []
+            start_cursor = None
+            done = False
+            while not done:
+                kwargs = {
+                    "filter": {"property": "object", "value": "page"},
+                    "sort": {"direction": "descending", "timestamp": "last_edited_time"},
+                    "page_size": 100,
+                }
+                if start_cursor:
+                    kwargs["start_cursor"] = start_cursor
+                resp = self.notion.search(**kwargs)
+                for page in resp.get("results", []):
+                    edited = page.get("last_edited_time") or ""
+                    # last_edited_time은 분 단위로 잘리므로 같은 시각은 다시 반영
+                    if watermark and edited < watermark:
+                        done = True
+                        break
+                    if page.get("object") != "page":
+                        continue
+                    seen.add(page.get("id"))
+                    if page.get("archived") or page.get("in_trash"):
+                        removes.append(page.get("id"))
+                        continue
+                    title = extract_page_title(page) or "제목 없음"
+                    upserts.append((page.get("id"), title, normalize_text(title), page.get("url"), edited))
+                if not resp.get("has_more"):
+                    break
+                start_cursor = resp.get("next_cursor")
+
+            with self._connect() as conn:
+                conn.executemany(
+                    "INSERT OR REPLACE INTO page_catalog (id, title, norm_title, url, last_edited_time) VALUES (?, ?, ?, ?, ?)",
+                    upserts,
+                )
+                conn.executemany("DELETE FROM page_catalog WHERE id = ?", [(pid,) for pid in removes])
+                if full:
+                    stale = [r[0] for r in conn.execute("SELECT id FROM page_catalog") if r[0] not in seen]
+                    conn.executemany("DELETE FROM page_catalog WHERE id = ?", [(pid,) for pid in stale])
+            if full:
+                self.last_full_sync = time.time()
+            index = _TitleIndex(self._load_rows())
+            with self._lock:
+                self._index = index
+            return len(upserts)
+
+    def start_background(self, interval: float = NOTION_CATALOG_SYNC_INTERVAL) -> None:
+        """동기화 스레드를 한 번만 시작합니다(이미 실행 중이면 무시)."""
+        with self._lock:
+            if self._thread is not None and self._thread.is_alive():
+                return
+
+            def _run():
+                while True:
+                    full = time.time() - self.last_full_sync >= NOTION_CATALOG_FULL_SYNC_INTERVAL
+                    try:
+                        self.sync(full=full)
+                    except Exception:
+                        # 다음 주기에 다시 시도(조회는 기존 색인으로 계속 동작)
+                        pass
+                    time.sleep(interval)
+
+            self._thread = threading.Thread(target=_run, name="notion-catalog-sync", daemon=True)
+            self._thread.start()
+
+
+_default_catalog: NotionPageCatalog | None = None
+_default_lock = threading.Lock()
+
+
+def notion_page_catalog(notion) -> NotionPageCatalog:
+    """프로세스 공용 카탈로그(첫 호출 시 백그라운드 동기화 시작)."""
+    global _default_catalog
+    with _default_lock:
+        if _default_catalog is None:
+            _default_catalog = NotionPageCatalog(notion)
+            _default_catalog.start_background()
+        return _default_catalog
@@ -0,0 +1,118 @@
+import os
+import random
+import threading
+import time
+
+import httpx
+from notion_client import Client
+from notion_client.errors import APIResponseError, HTTPResponseError, RequestTimeoutError
+
+
+# Notion 요청 한도(통합 토큰당 평균 초당 3회) 및 재시도 설정(환경변수로 조정 가능)
+NOTION_RATE_PER_SEC = float(os.environ.get("NOTION_RATE_PER_SEC", "3"))
+NOTION_BURST = int(os.environ.get("NOTION_BURST", "3"))
+NOTION_MAX_RETRIES = int(os.environ.get("NOTION_MAX_RETRIES", "5"))
+_RETRY_STATUS = {409, 429, 500, 502, 503, 504}
+
+
+class TokenBucket:
+    """프로세스 공용 토큰 버킷.
+
+    - 429를 받으면 Retry-After 동안 모든 요청을 멈추고 속도를 절반으로 낮춤(하한 min_rate)
+    - 이후 성공이 이어지면 설정 속도까지 조금씩 되돌림(AIMD)
+    """
+
+    def __init__(self, rate: float, capacity: int, min_rate: float = 0.5):
+        self.max_rate = rate
+        self.rate = rate
+        self.min_rate = min(min_rate, rate)
+        self.capacity = max(1, capacity)
+        self.tokens = float(self.capacity)
+        self.updated = time.monotonic()
+        self.paused_until = 0.0
+        self._lock = threading.Lock()
+
+    def acquire(self) -> float:
+        """토큰 1개를 얻을 때까지 대기하고, 대기한 시간(초)을 반환합니다."""
+        waited = 0.0
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+                self.updated = now
+                if now >= self.paused_until and self.tokens >= 1:
+                    self.tokens -= 1
+                    return waited
+                delay = max(self.paused_until - now, (1 - self.tokens) / self.rate)
+            time.sleep(delay)
+            waited += delay
+
+    def on_success(self) -> None:
+        with self._lock:
+            if self.rate < self.max_rate:
+                self.rate = min(self.max_rate, self.rate + 0.1 * self.max_rate)
+
+    def on_throttle(self, retry_after: float) -> None:
+        with self._lock:
+            self.rate = max(self.min_rate, self.rate / 2)
+            self.tokens = 0.0
+            self.paused_until = max(self.paused_until, time.monotonic() + retry_after)
+
+
+notion_limiter = TokenBucket(NOTION_RATE_PER_SEC, NOTION_BURST)
+
+_stats_lock = threading.Lock()
+_stats = {"requests": 0, "throttled": 0, "retried": 0, "failed": 0, "wait_seconds": 0.0}
+
+
+def _bump(key: str, value: float = 1) -> None:
+    with _stats_lock:
+        _stats[key] += value
+
+
+def notion_stats() -> dict:
+    """프로세스 전체 Notion 호출 카운터(요청/429/재시도/실패/대기 시간) 스냅샷."""
+    with _stats_lock:
+        snapshot = dict(_stats)
+    snapshot["current_rate"] = round(notion_limiter.rate, 2)
+    return snapshot
+
+
+def _retry_after_seconds(error: HTTPResponseError, attempt: int) -> float:
+    value = (getattr(error, "headers", None) or {}).get("Retry-After")
+    try:
+        return max(0.0, float(value))
+    except (TypeError, ValueError):
+        return random.uniform(0, min(30.0, 0.5 * (2 ** attempt)))
+
+
+class RateLimitedClient(Client):
+    """모든 Notion API 호출을 공용 토큰 버킷에 통과시키고 429/5xx/타임아웃을 재시도하는 Client."""
+
+    def request(self, path, method, query=None, body=None, auth=None):
+        attempt = 0
+        while True:
+            _bump("wait_seconds", notion_limiter.acquire())
+            _bump("requests")
+            try:
+                result = super().request(path, method, query=query, body=body, auth=auth)
+                notion_limiter.on_success()
+                return result
+            except HTTPResponseError as e:
+                if e.status not in _RETRY_STATUS or attempt >= NOTION_MAX_RETRIES:
+                    _bump("failed")
+                    raise
+                delay = _retry_after_seconds(e, attempt)
+                if e.status == 429 or (isinstance(e, APIResponseError) and e.code == "rate_limited"):
+                    _bump("throttled")
+                    notion_limiter.on_throttle(delay)
+                    delay = 0.0  # 대기는 버킷이 처리
+            except (RequestTimeoutError, httpx.TransportError):
+                if attempt >= NOTION_MAX_RETRIES:
+                    _bump("failed")
+                    raise
+                delay = random.uniform(0, min(30.0, 0.5 * (2 ** attempt)))
+            attempt += 1
+            _bump("retried")
+            if delay:
+                time.sleep(delay)
@@ -0,0 +1,169 @@
+import os
+import threading
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+
+import requests
+from requests.adapters import HTTPAdapter
+
+
+# 노션 첨부 xlsx 다운로드/파싱 결과 메모리 캐시 설정(환경변수로 조정 가능)
+NOTION_DOWNLOAD_TIMEOUT = float(os.environ.get("NOTION_DOWNLOAD_TIMEOUT", "30"))
+NOTION_XLSX_CACHE_ENTRIES = int(os.environ.get("NOTION_XLSX_CACHE_ENTRIES", "16"))
+NOTION_XLSX_CACHE_MAX_BYTES = int(float(os.environ.get("NOTION_XLSX_CACHE_MAX_MB", "256")) * 1024 * 1024)
+# 후보 파일 미리 받기 동시 작업 수
+NOTION_PREFETCH_WORKERS = int(os.environ.get("NOTION_PREFETCH_WORKERS", "4"))
+
+_session: requests.Session | None = None
+_session_lock = threading.Lock()
+
+
+def notion_http_session() -> requests.Session:
+    """노션 첨부 다운로드용 프로세스 공용 keep-alive 세션(연결 풀 재사용)."""
+    global _session
+    with _session_lock:
+        if _session is None:
+            session = requests.Session()
+            adapter = HTTPAdapter(pool_connections=4, pool_maxsize=8)
+            session.mount("https://", adapter)
+            session.mount("http://", adapter)
+            _session = session
+        return _session
+
+
+def file_identity(f: dict) -> tuple[str, str, str, str]:
+    """서명 URL(쿼리가 주기적으로 바뀜) 대신 블록 id + 파일명 + 버전으로 파일을 식별합니다.
+
+    파일을 교체해도 block_id와 파일명은 그대로일 수 있으므로 블록(속성 첨부는 페이지) last_edited_time과
+    쿼리를 뺀 URL 경로(다시 올리면 바뀜)를 함께 넣습니다. block_id가 없는 이전 캐시 항목은 URL 경로로 대신합니다.
+    """
+    path = (f.get("url") or "").split("?")[0]
+    return (f.get("block_id") or path, f.get("name") or "", f.get("last_edited_time") or "", path)
+
+
+def download_notion_file(url: str, timeout: float | None = None) -> bytes:
+    resp = notion_http_session().get(url, timeout=NOTION_DOWNLOAD_TIMEOUT if timeout is None else timeout)
+    resp.raise_for_status()
+    return resp.content
+
+
+class NotionXlsxCache:
+    """노션 xlsx의 원본 bytes와 파싱 결과를 파일 식별자별로 보관합니다(LRU, 개수/용량 한도).
+
+    - 같은 파일은 rerun마다 다시 받거나 파싱하지 않음
+    - 같은 파일을 동시에 요청하면 한 번만 다운로드(키별 잠금)
+    - prefetch()로 후보 파일을 백그라운드에서 미리 받아 두고 status()로 진행 상태 확인
+    - 반환되는 DataFrame은 공유되므로 호출 측에서 수정하려면 복사해서 사용
+    """
+
+    def __init__(self, max_entries: int = NOTION_XLSX_CACHE_ENTRIES, max_bytes: int = NOTION_XLSX_CACHE_MAX_BYTES):
+        self.max_entries = max(1, max_entries)
+        self.max_bytes = max_bytes
+        self._entries: OrderedDict[tuple, dict] = OrderedDict()
+        self._lock = threading.Lock()
+        # 키별 [잠금, 기다리는 호출 수]
+        self._key_locks: dict[tuple, list] = {}
+        self._prefetching: set[tuple] = set()
+        self._errors: dict[tuple, str] = {}
+        self._pool: ThreadPoolExecutor | None = None
+
+    def peek(self, f: dict) -> dict | None:
+        key = file_identity(f)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                self._entries.move_to_end(key)
+            return entry
+
+    def load(self, f: dict, parse) -> dict:
+        """{"content": bytes, **parse(content)}를 반환합니다. parse는 bytes → dict."""
+        entry = self.peek(f)
+        if entry is not None:
+            return entry
+        key = file_identity(f)
+        with self._lock:
+            slot = self._key_locks.setdefault(key, [threading.Lock(), 0])
+            slot[1] += 1
+        try:
+            with slot[0]:
+                entry = self.peek(f)
+                if entry is None:
+                    content = download_notion_file(f["url"])
+                    entry = {"content": content, **parse(content)}
+                    self._store(key, entry)
+                    with self._lock:
+                        self._errors.pop(key, None)
+        finally:
+            # 기다리는 호출이 남아 있으면 잠금을 유지(새 잠금으로 같은 파일을 다시 받지 않도록)
+            with self._lock:
+                slot[1] -= 1
+                if slot[1] == 0 and self._key_locks.get(key) is slot:
+                    del self._key_locks[key]
+        return entry
+
+    def status(self, f: dict) -> str:
+        """"ready" / "loading" / "error" / "pending"(아직 요청 안 됨)"""
+        key = file_identity(f)
+        with self._lock:
+            if key in self._entries:
+                return "ready"
+            if key in self._prefetching:
+                return "loading"
+            if key in self._errors:
+                return "error"
+            return "pending"
+
+    def prefetch(self, files: list[dict], parse, max_workers: int | None = None) -> None:
+        """캐시에 없는 파일을 백그라운드 스레드에서 병렬로 받아 파싱합니다(즉시 반환)."""
+        with self._lock:
+            if self._pool is None:
+                workers = NOTION_PREFETCH_WORKERS if max_workers is None else max(1, int(max_workers))
+                self._pool = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="notion-prefetch")
+            todo = []
+            for f in files:
+                key = file_identity(f)
+                if key in self._entries or key in self._prefetching:
+                    continue
+                self._prefetching.add(key)
+                self._errors.pop(key, None)
+                todo.append((key, f))
+        for key, f in todo:
+            self._pool.submit(self._prefetch_one, key, f, parse)
+
+    def _prefetch_one(self, key: tuple, f: dict, parse) -> None:
+        try:
+            self.load(f, parse)
+        except Exception as e:
+            # 선택 시 다시 시도하며 그때 오류를 화면에 표시
+            with self._lock:
+                self._errors[key] = str(e)
+        finally:
+            with self._lock:
+                self._prefetching.discard(key)
+
+    def _store(self, key: tuple, entry: dict) -> None:
+        with self._lock:
+            self._entries[key] = entry
+            self._entries.move_to_end(key)
+            total = sum(len(e["content"]) for e in self._entries.values())
+            while len(self._entries) > 1 and (len(self._entries) > self.max_entries or total > self.max_bytes):
+                _, old = self._entries.popitem(last=False)
+                total -= len(old["content"])
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+            self._errors.clear()
+
+
+_default_cache: NotionXlsxCache | None = None
+_default_lock = threading.Lock()
+
+
+def notion_xlsx_cache() -> NotionXlsxCache:
+    """프로세스 공용 인스턴스(세션/rerun 간 공유)."""
+    global _default_cache
+    with _default_lock:
+        if _default_cache is None:
+            _default_cache = NotionXlsxCache()
+        return _default_cache
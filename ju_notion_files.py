@@ -0,0 +1,178 @@
+import os
+import urllib.parse
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+
+
+# 블록 트리 동시 조회 수(Notion 요청 한도가 낮으므로 작게 유지)
+NOTION_CRAWL_WORKERS = int(os.environ.get("NOTION_CRAWL_WORKERS", "3"))
+
+
+def decode_filename(text: str) -> str:
+    try:
+        return urllib.parse.unquote(text or "", encoding="utf-8", errors="replace")
+    except Exception:
+        try:
+            return urllib.parse.unquote(text or "")
+        except Exception:
+            return text or ""
+
+
+def is_excel_by_name_or_url(name: str, url: str) -> bool:
+    lname = (name or "").lower()
+    lurl = (url or "").lower()
+    return lname.endswith((".xlsx", ".xls")) or lurl.split("?")[0].endswith((".xlsx", ".xls"))
+
+
+def list_all_blocks(notion, block_id: str) -> list[dict]:
+    blocks = []
+    start_cursor = None
+    while True:
+        resp = notion.blocks.children.list(block_id=block_id, start_cursor=start_cursor)
+        blocks.extend(resp.get("results", []))
+        if not resp.get("has_more"):
+            break
+        start_cursor = resp.get("next_cursor")
+    return blocks
+
+
+def crawl_block_tree(notion, root_id: str, max_workers: int | None = None) -> dict[str, list[dict]]:
+    """root 아래 블록 트리를 너비 우선으로 조회해 {블록 id: 자식 블록 목록}을 반환합니다.
+
+    - 블록 id 기준 방문 집합으로 같은 블록(has_children + child_page 등)을 한 번만 조회
+    - 형제 하위 트리는 max_workers 한도 안에서 동시에 조회
+    - 조회 중 오류는 그대로 전파(호출 측에서 처리)
+    """
+    workers = NOTION_CRAWL_WORKERS if max_workers is None else max(1, int(max_workers))
+    children: dict[str, list[dict]] = {}
+    visited = {root_id}
+
+    def _expand(blocks: list[dict]) -> list[str]:
+        found = []
+        for block in blocks:
+            bid = block.get("id")
+            if bid and (block.get("has_children") or block.get("type") == "child_page") and bid not in visited:
+                visited.add(bid)
+                found.append(bid)
+        return found
+
+    with ThreadPoolExecutor(max_workers=workers, thread_name_prefix="notion-crawl") as pool:
+        running = {pool.submit(list_all_blocks, notion, root_id): root_id}
+        while running:
+            done, _ = wait(running, return_when=FIRST_COMPLETED)
+            for fut in done:
+                bid = running.pop(fut)
+                blocks = fut.result()
+                children[bid] = blocks
+                for child_id in _expand(blocks):
+                    running[pool.submit(list_all_blocks, notion, child_id)] = child_id
+    return children
+
+
+def _file_from_block(block: dict) -> dict | None:
+    file_info = block.get("file", {})
+    ftype = file_info.get("type")  # file | external
+    url = (file_info.get(ftype) or {}).get("url")
+    # 블록에는 name이 없을 수 있어 URL에서 유추 (Windows/URL 모두 안전하게 처리)
+    try:
+        name_guess = os.path.basename(urllib.parse.urlparse(url or "").path) or (url or "").rsplit("/", 1)[-1]
+    except Exception:
+        name_guess = (url or "").rsplit("/", 1)[-1]
+    decoded_name = decode_filename(name_guess)
+    if url and is_excel_by_name_or_url(decoded_name, url):
+        # 파일을 교체하면 block_id는 그대로이므로 블록 수정 시각을 버전으로 함께 보관
+        return {"name": decoded_name or "download.xlsx", "url": url, "block_id": block.get("id"), "last_edited_time": block.get("last_edited_time")}
+    return None
+
+
+def files_from_page_properties(page_obj: dict) -> list[dict]:
+    """페이지 속성(files 타입)에 첨부된 엑셀 파일 목록."""
+    found = []
+    for prop_name, prop in (page_obj.get("properties") or {}).items():
+        if isinstance(prop, dict) and prop.get("type") == "files":
+            for pos, item in enumerate(prop.get("files", [])):
+                itype = item.get("type")  # file | external
+                url = (item.get(itype) or {}).get("url")
+                raw_name = item.get("name") or (url or "").rsplit("/", 1)[-1]
+                name = decode_filename(raw_name)
+                if url and is_excel_by_name_or_url(name, url):
+                    # 속성 첨부는 블록 id가 없으므로 페이지 id/속성/순번으로 식별
+                    found.append({
+                        "name": name,
+                        "url": url,
+                        "block_id": f"{page_obj.get('id')}:{prop.get('id') or prop_name}:{pos}",
+                        "last_edited_time": page_obj.get("last_edited_time"),
+                    })
+    return found
+
+
+def files_from_block_tree(children: dict[str, list[dict]], root_id: str) -> list[dict]:
+    """crawl_block_tree 결과를 기존 재귀 순회와 같은 순서(깊이 우선, 문서 순)로 훑어 파일을 모읍니다."""
+    found = []
+    walked = {root_id}
+
+    def _walk(block_id: str) -> None:
+        for block in children.get(block_id, []):
+            if block.get("type") == "file":
+                f = _file_from_block(block)
+                if f is not None:
+                    found.append(f)
+            child_id = block.get("id")
+            if child_id in children and child_id not in walked:
+                walked.add(child_id)
+                _walk(child_id)
+
+    _walk(root_id)
+    return found
+
+
+def _expiry_time(file_obj: dict) -> str | None:
+    # Notion 호스팅 파일(type=file)의 서명 URL 만료 시각
+    if file_obj.get("type") == "file":
+        return (file_obj.get("file") or {}).get("expiry_time")
+    return None
+
+
+def collect_xlsx_files(notion, page_id: str, max_workers: int | None = None, meta: dict | None = None) -> list[dict]:
+    """페이지(및 모든 하위 블록/하위 페이지/속성)에서 .xlsx/.xls 파일을 수집합니다(url 기준 중복 제거).
+
+    meta가 주어지면 캐시 검증용 정보를 채웁니다.
+    - last_edited: {페이지 id: last_edited_time} (루트 페이지는 pages.retrieve 기준)
+    - subpages: {하위 페이지 id: 블록 last_edited_time}
+    - expiry_times: Notion 호스팅 파일 URL의 만료 시각 목록
+    """
+    xlsx_files = []
+    expiry_times = []
+
+    # 1) 페이지 속성에 첨부된 파일(데이터베이스 행 등) 수집
+    try:
+        page_obj = notion.pages.retrieve(page_id=page_id)
+        xlsx_files.extend(files_from_page_properties(page_obj))
+        if meta is not None:
+            meta["last_edited"] = {page_id: page_obj.get("last_edited_time")}
+            for prop in (page_obj.get("properties") or {}).values():
+                if isinstance(prop, dict) and prop.get("type") == "files":
+                    expiry_times.extend(_expiry_time(item) for item in prop.get("files", []))
+    except Exception:
+        # 페이지가 권한 또는 형식 문제로 조회되지 않는 경우 무시하고 블록 탐색으로 계속
+        pass
+
+    # 2) 블록 트리를 동시 조회한 뒤 문서 순서대로 file 블록 수집
+    children = crawl_block_tree(notion, page_id, max_workers=max_workers)
+    xlsx_files.extend(files_from_block_tree(children, page_id))
+
+    if meta is not None:
+        subpages = {}
+        for blocks in children.values():
+            for block in blocks:
+                if block.get("type") == "child_page":
+                    subpages[block.get("id")] = block.get("last_edited_time")
+                elif block.get("type") == "file":
+                    expiry_times.append(_expiry_time(block.get("file") or {}))
+        meta["subpages"] = subpages
+        meta["expiry_times"] = [t for t in expiry_times if t]
+
+    # 중복 제거(같은 url 기준)
+    uniq = {}
+    for f in xlsx_files:
+        uniq[f["url"]] = f
+    return list(uniq.values())
@@ -0,0 +1,126 @@
+from dataclasses import dataclass
+
+import numpy as np
+import pandas as pd
+
+from ju_excel_reader import read_excel
+
+
+# 헤더 행 판별 기준(기존 _extract_notion_table과 동일)
+_HEADER_KEYS = ("NO", "카테고리", "상품명")
+_CATEGORY_KEYS = ("카테고리", "분류")
+# 헤더 다음 칸이 비어 자동으로 붙는 불필요 컬럼
+_DROP_COLUMNS = ["상품명_", "구성_"]
+
+
+@dataclass(frozen=True)
+class TableRegion:
+    """시트 안 표 하나의 위치(0부터 시작하는 행/열 번호, 끝 포함)."""
+
+    sheet: str | int
+    header_row: int
+    first_row: int
+    last_row: int
+    first_col: int
+    last_col: int
+
+    @property
+    def label(self) -> str:
+        return f"{self.sheet}!R{self.header_row + 1}C{self.first_col + 1} ({self.last_row - self.first_row + 1}행)"
+
+
+def _dedupe_headers(cols_in) -> list[str]:
+    """빈 헤더는 앞 헤더명 + '_'로, 중복 헤더는 '_'를 덧붙여 유일하게 만듭니다."""
+    result = []
+    used = set()
+    last_non_empty = None
+    for raw in list(cols_in):
+        s = str(raw).strip()
+        if s == "" or s.lower() == "nan":
+            s = "_" if last_non_empty is None else last_non_empty + "_"
+        else:
+            last_non_empty = s
+        base = s
+        while s in used:
+            s = base + "_"
+            base = s
+        used.add(s)
+        result.append(s)
+    return result
+
+
+def _text_grid(raw: pd.DataFrame) -> np.ndarray:
+    values = raw.to_numpy(dtype=object)
+    text = np.where(pd.isna(values), "", values).astype(str)
+    return np.char.strip(text)
+
+
+def detect_table_regions(raw: pd.DataFrame, sheet: str | int = 0) -> list[TableRegion]:
+    """헤더 없이 읽은 시트(raw)에서 'NO' 헤더로 시작하는 표 구간을 모두 찾습니다.
+
+    - 헤더 행: 'NO'와 ('카테고리' 또는 '분류')를 함께 갖거나, NO/카테고리/상품명 중 2개 이상을 가진 행
+    - 한 헤더 행에 'NO'가 여러 개면 NO 위치를 경계로 좌우 표를 나눔(첫 표는 왼쪽 끝부터)
+    - 데이터 행: 헤더 아래 NO가 숫자인 첫 행부터 숫자가 끊기기 직전(또는 다음 헤더 직전)까지
+    """
+    if raw.empty:
+        return []
+    text = _text_grid(raw)
+    n_rows, n_cols = text.shape
+    is_no = text == "NO"
+    key_count = np.isin(text, _HEADER_KEYS).sum(axis=1)
+    has_category = np.isin(text, _CATEGORY_KEYS).any(axis=1)
+    header_mask = (is_no.any(axis=1) & has_category) | (key_count >= 2)
+    header_rows = np.flatnonzero(header_mask & is_no.any(axis=1))
+    if header_rows.size == 0:
+        return []
+    numeric = raw.apply(pd.to_numeric, errors="coerce").notna().to_numpy()
+
+    regions = []
+    for h in header_rows:
+        no_cols = np.flatnonzero(is_no[h])
+        # 이 표의 끝: 같은 열에서 다음 헤더 행 직전
+        later = header_rows[header_rows > h]
+        limit = int(later[0]) if later.size else n_rows
+        for k, c in enumerate(no_cols):
+            col_valid = numeric[h + 1 : limit, c]
+            if not col_valid.any():
+                continue
+            start = int(np.argmax(col_valid))
+            gaps = np.flatnonzero(~col_valid[start:])
+            stop = start + (int(gaps[0]) if gaps.size else col_valid.size - start)
+            first_col = 0 if k == 0 else int(c)
+            last_col = int(no_cols[k + 1]) - 1 if k + 1 < len(no_cols) else n_cols - 1
+            if k + 1 < len(no_cols):
+                # 표 사이 구분용 빈 열은 제외
+                block = text[h : h + 1 + stop, first_col : last_col + 1]
+                filled = np.flatnonzero((block != "").any(axis=0))
+                last_col = first_col + int(filled[-1]) if filled.size else last_col
+            regions.append(TableRegion(sheet, int(h), int(h) + 1 + start, int(h) + stop, first_col, last_col))
+    return regions
+
+
+def table_from_region(raw: pd.DataFrame, region: TableRegion) -> pd.DataFrame:
+    """헤더 없는 프레임에서 region 구간을 잘라 헤더를 붙인 표로 만듭니다."""
+    cols = slice(region.first_col, region.last_col + 1)
+    header = raw.iloc[region.header_row, cols].tolist()
+    body = raw.iloc[region.first_row : region.last_row + 1, cols].copy()
+    body.columns = _dedupe_headers(header)
+    body = body.loc[:, ~body.columns.astype(str).str.contains("^Unnamed")]
+    body = body.drop(columns=_DROP_COLUMNS, errors="ignore")
+    # 값은 읽은 그대로(object) 둡니다. 숫자로 추론하면 매칭 키가 "1"에서 "1.0"으로 바뀜
+    return body.reset_index(drop=True)
+
+
+def read_raw_sheets(content) -> dict:
+    """워크북의 모든 시트를 헤더 없이 읽습니다({시트명: DataFrame})."""
+    return read_excel(content, sheet_name=None, header=None)
+
+
+def find_notion_tables(content, sheets: dict | None = None) -> list[tuple[TableRegion, pd.DataFrame]]:
+    """워크북 모든 시트의 표를 [(위치, 표)]로 반환합니다(시트 순 → 위에서 아래 → 왼쪽에서 오른쪽)."""
+    sheets = read_raw_sheets(content) if sheets is None else sheets
+    found = []
+    for name, raw in sheets.items():
+        for region in detect_table_regions(raw, name):
+            found.append((region, table_from_region(raw, region)))
+    return found
@@ -0,0 +1,256 @@
+from copy import copy
+from dataclasses import dataclass, field
+
+import pandas as pd
+from openpyxl.styles import Alignment, Border, Font, NamedStyle, PatternFill, Protection, Side
+from openpyxl.styles.borders import DEFAULT_BORDER
+from openpyxl.styles.fills import DEFAULT_EMPTY_FILL
+from openpyxl.styles.fonts import DEFAULT_FONT
+from openpyxl.utils import get_column_letter
+
+
+_thin = Side(border_style="thin", color="000000")
+_thick = Side(border_style="medium", color="000000")
+_border_all = Border(left=_thin, right=_thin, top=_thin, bottom=_thin)
+_border_thick = Border(left=_thick, right=_thick, top=_thick, bottom=_thick)
+_center = Alignment(horizontal="center", vertical="center")
+_right = Alignment(horizontal="right", vertical="center")
+_bold = Font(bold=True)
+
+
+def _fill(color: str) -> PatternFill:
+    return PatternFill("solid", fgColor=color)
+
+
+# 정산 리포트 역할별 스타일(기존 셀 단위 서식과 같은 값). 지정하지 않은 속성은 워크북 기본값
+SETTLEMENT_STYLES = {
+    "title": {"font": Font(size=25, bold=True), "alignment": _center},
+    "brand": {"font": Font(size=10)},
+    "divider": {"border": Border(bottom=_thick)},
+    "section": {"font": Font(size=10, color="FFFFFF", bold=True), "fill": _fill("808080"), "alignment": _center},
+    "header": {"fill": _fill("EDEDED"), "font": _bold, "alignment": _center, "border": _border_all},
+    "body_text": {"alignment": Alignment(vertical="center"), "border": _border_all},
+    "body_number": {"number_format": "#,##0", "alignment": _right, "border": _border_all},
+    "body_merged": {"alignment": _center, "border": _border_all},
+    "subtotal_label": {"fill": _fill("EDEDED"), "font": _bold, "alignment": _center, "border": _border_all},
+    "subtotal": {"fill": _fill("EDEDED"), "border": _border_all},
+    "subtotal_number": {"fill": _fill("EDEDED"), "number_format": "#,##0", "alignment": _right, "border": _border_all},
+    "total_label": {"fill": _fill("FFD966"), "font": _bold, "alignment": _center, "border": _border_all},
+    "total": {"fill": _fill("FFD966"), "border": _border_all},
+    "total_number": {"fill": _fill("FFD966"), "number_format": "#,##0", "border": _border_all},
+    "final_label": {"fill": _fill("FFC000"), "font": Font(size=12, bold=True), "alignment": _center, "border": _border_thick},
+    "final_box": {"border": _border_thick},
+    "final_value": {"number_format": "₩#,##0", "font": _bold, "alignment": _right, "border": _border_thick},
+    # 정산내역~계 구간 외곽선(스타일로 등록하지 않고 기존 셀 서식 위에 덧씌움)
+    "frame": {"border": _border_thick},
+}
+
+
+@dataclass(frozen=True)
+class ReportTemplate:
+    """정산표 형태 리포트의 배치 정의. 행/열 번호는 1부터, 스타일은 styles의 역할 이름으로 지정합니다.
+
+    배치: title_row 타이틀 → 다음 행 브랜드 라벨 → 그 다음 행 구분선, header_row - 1 구간 제목,
+    header_row 헤더 → 본문 → 소계 → 계 → final_gap행 아래 실 정산액 박스 → 구분선 → 안내 문구 → 구분선
+    """
+
+    name: str
+    columns: tuple[str, ...]
+    number_columns: frozenset[str]
+    # 소계 행에 SUM을 넣을 컬럼, 계/실 정산액 기준 컬럼
+    sum_columns: tuple[str, ...]
+    total_column: str
+    widths: tuple[int, ...]
+    brand: str = ""
+    section: str = ""
+    final_label: str = "실 정산액"
+    notes: tuple[str, ...] = ()
+    start_col: int = 2
+    title_row: int = 2
+    header_row: int = 7
+    final_gap: int = 3
+    # 첫 컬럼(상품명)을 본문 전체로 병합
+    merge_first_column: bool = True
+    styles: dict = field(default_factory=lambda: SETTLEMENT_STYLES)
+
+    def style_name(self, role: str) -> str:
+        return f"{self.name}.{role}"
+
+
+SETTLEMENT_TEMPLATE = ReportTemplate(
+    name="settlement",
+    columns=("상품명", "옵션", "수량", "공구판매가", "공구판매가합계(vat포함)", "공급가(vat포함)", "정산금액(vat포함)"),
+    number_columns=frozenset({"수량", "공구판매가", "공구판매가합계(vat포함)", "공급가(vat포함)", "정산금액(vat포함)"}),
+    sum_columns=("수량", "공구판매가합계(vat포함)", "정산금액(vat포함)"),
+    total_column="정산금액(vat포함)",
+    widths=(22, 38, 10, 14, 20, 16, 18),
+    brand="소셜라운지",
+    section="정산내역",
+    notes=(
+        "*위 금액을 확인하여 주시길 바랍니다.",
+        "*이상이 없을 경우 계산서 발행 요청드립니다",
+        "사업자 번호 : 790-88-03127",
+        "계산서 발행 이메일 : master@sociallounge.company",
+    ),
+)
+
+
+class NamedStyleRegistry:
+    """워크북별 이름 있는 스타일 등록부.
+
+    스타일은 처음 쓸 때 한 번만 NamedStyle로 등록하고, 이후 셀에는 등록된 스타일 배열(인덱스 묶음)만 복사합니다.
+    외곽선처럼 기존 서식 위에 덧씌우는 변경도 (원래 서식, 변경) 조합별로 한 번만 계산합니다.
+    """
+
+    def __init__(self, wb):
+        self.wb = wb
+        self._arrays: dict[str, object] = {}
+        self._overlays: dict[tuple, object] = {}
+
+    def register(self, name: str, spec: dict) -> str:
+        if name not in self._arrays:
+            if name in self.wb.named_styles:
+                style = self.wb._named_styles[name]
+            else:
+                style = NamedStyle(
+                    name=name,
+                    font=spec.get("font", DEFAULT_FONT),
+                    fill=spec.get("fill", DEFAULT_EMPTY_FILL),
+                    border=spec.get("border", DEFAULT_BORDER),
+                    alignment=spec.get("alignment", Alignment()),
+                    number_format=spec.get("number_format"),
+                    protection=spec.get("protection", Protection()),
+                )
+                self.wb.add_named_style(style)
+            self._arrays[name] = style.as_tuple()
+        return name
+
+    def apply(self, cell, name: str) -> None:
+        """등록된 스타일을 이름으로 지정합니다(셀마다 스타일 객체를 만들지 않음)."""
+        cell._style = copy(self._arrays[name])
+
+    def overlay_border(self, cell, **sides: Side) -> None:
+        """셀의 현재 테두리에서 주어진 변만 바꿉니다. 같은 (서식, 변경) 조합은 한 번만 계산."""
+        key = (tuple(cell._style), tuple(sorted(sides.items(), key=lambda kv: kv[0])))
+        cached = self._overlays.get(key)
+        if cached is None:
+            border = cell.border
+            cell.border = Border(
+                left=sides.get("left", border.left),
+                right=sides.get("right", border.right),
+                top=sides.get("top", border.top),
+                bottom=sides.get("bottom", border.bottom),
+            )
+            self._overlays[key] = copy(cell._style)
+        else:
+            cell._style = copy(cached)
+
+    def outline(self, ws, top: int, bottom: int, left: int, right: int, side: Side) -> None:
+        """범위 외곽에만 side 테두리를 덧씌웁니다(안쪽 셀은 그대로)."""
+        for r in range(top, bottom + 1):
+            for c in range(left, right + 1):
+                sides = {}
+                if c == left:
+                    sides["left"] = side
+                if c == right:
+                    sides["right"] = side
+                if r == top:
+                    sides["top"] = side
+                if r == bottom:
+                    sides["bottom"] = side
+                if sides:
+                    self.overlay_border(ws.cell(row=r, column=c), **sides)
+
+
+def render_report(ws, df: pd.DataFrame | None, title: str, template: ReportTemplate = SETTLEMENT_TEMPLATE, registry: NamedStyleRegistry | None = None) -> None:
+    """template 배치대로 df를 그립니다. 서식은 역할별 이름 있는 스타일로만 지정합니다."""
+    registry = registry or NamedStyleRegistry(ws.parent)
+    style = {role: registry.register(template.style_name(role), spec) for role, spec in template.styles.items() if role != "frame"}
+    frame_side = template.styles["frame"]["border"].left
+    columns = list(template.columns)
+    start_col = template.start_col
+    end_col = start_col + len(columns) - 1
+
+    def put(row: int, col: int, role: str, value=None):
+        cell = ws.cell(row=row, column=col, value=value)
+        registry.apply(cell, style[role])
+        return cell
+
+    # 타이틀 / 브랜드 라벨 / 구분선
+    title_row = template.title_row
+    ws.merge_cells(start_row=title_row, start_column=start_col, end_row=title_row, end_column=end_col)
+    put(title_row, start_col, "title", title)
+    put(title_row + 1, start_col, "brand", template.brand)
+    for c in range(start_col, end_col + 1):
+        put(title_row + 2, c, "divider")
+
+    # 구간 제목 / 헤더
+    header_row = template.header_row
+    ws.merge_cells(start_row=header_row - 1, start_column=start_col, end_row=header_row - 1, end_column=end_col)
+    put(header_row - 1, start_col, "section", template.section)
+    for j, col_name in enumerate(columns):
+        put(header_row, start_col + j, "header", col_name)
+
+    # 본문: 행 Series를 만들지 않고 값 배열에서 바로 기록
+    data_row_start = header_row + 1
+    df = df if df is not None else pd.DataFrame(columns=columns)
+    positions = {col: i for i, col in enumerate(df.columns)}
+    roles = ["body_number" if col in template.number_columns else "body_text" for col in columns]
+    current_row = data_row_start
+    for values in df.values:
+        for j, col_name in enumerate(columns):
+            pos = positions.get(col_name)
+            put(current_row, start_col + j, roles[j], None if pos is None else values[pos])
+        current_row += 1
+    data_row_end = current_row - 1
+    has_data = data_row_end >= data_row_start
+
+    if has_data and template.merge_first_column:
+        ws.merge_cells(start_row=data_row_start, start_column=start_col, end_row=data_row_end, end_column=start_col)
+        registry.apply(ws.cell(row=data_row_start, column=start_col), style["body_merged"])
+
+    def column_sum(col_name: str):
+        letter = get_column_letter(start_col + columns.index(col_name))
+        return f"=SUM({letter}{data_row_start}:{letter}{data_row_end})" if has_data else 0
+
+    # 소계(항상 표시)
+    subtotal_row = max(data_row_start, data_row_end + 1)
+    ws.merge_cells(start_row=subtotal_row, start_column=start_col, end_row=subtotal_row, end_column=start_col + 1)
+    for c in range(start_col, end_col + 1):
+        put(subtotal_row, c, "subtotal")
+    put(subtotal_row, start_col, "subtotal_label", "소계")
+    for col_name in template.sum_columns:
+        put(subtotal_row, start_col + columns.index(col_name), "subtotal_number", column_sum(col_name))
+
+    # 계(항상 표시)
+    total_row = subtotal_row + 1
+    ws.merge_cells(start_row=total_row, start_column=start_col, end_row=total_row, end_column=end_col - 1)
+    for c in range(start_col + 1, end_col):
+        put(total_row, c, "total")
+    put(total_row, start_col, "total_label", "계")
+    put(total_row, end_col, "total_number", column_sum(template.total_column))
+
+    # 실 정산액 박스
+    final_row = total_row + template.final_gap
+    ws.merge_cells(start_row=final_row, start_column=start_col, end_row=final_row, end_column=start_col + 1)
+    put(final_row, start_col, "final_label", template.final_label)
+    put(final_row, start_col + 1, "final_box")
+    ws.merge_cells(start_row=final_row, start_column=start_col + 2, end_row=final_row, end_column=end_col)
+    put(final_row, start_col + 2, "final_value", column_sum(template.total_column))
+    for c in range(start_col + 3, end_col + 1):
+        put(final_row, c, "final_box")
+
+    # 구분선 → 안내 문구 → 구분선
+    for c in range(start_col, end_col + 1):
+        put(final_row + 1, c, "divider")
+    notes_row_start = final_row + 2
+    for i, txt in enumerate(template.notes):
+        ws.cell(row=notes_row_start + i, column=start_col, value=txt)
+    for c in range(start_col, end_col + 1):
+        put(notes_row_start + len(template.notes), c, "divider")
+
+    # 구간 제목 ~ 계 외곽 굵은 테두리
+    registry.outline(ws, header_row - 1, total_row, start_col, end_col, frame_side)
+
+    for i, w in enumerate(template.widths, start=start_col):
+        ws.column_dimensions[get_column_letter(i)].width = w
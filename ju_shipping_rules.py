@@ -0,0 +1,170 @@
+import json
+from dataclasses import dataclass, field, fields
+
+import numpy as np
+import pandas as pd
+
+
+@dataclass(frozen=True)
+class ShippingRule:
+    """주문 단위 배송비 규칙. 조건을 모두 만족하는 첫 번째 규칙이 적용됩니다(목록 순서 = 우선순위).
+
+    - fee: 판매가 기준 배송비(셀러 부담 비율 적용 전)
+    - min_amount/max_amount: 주문 금액 하한(이상)/상한(미만)
+    - min_qty/max_qty: 주문 수량 합계 하한(이상)/상한(미만)
+    - seller: 판매자 컬럼 값이 같은 주문에만 적용
+    - products: 주문에 이 노션상품 중 하나라도 있으면 적용(묶음 배송 규칙)
+    - ratio: 이 규칙에만 쓸 셀러 부담 비율(없으면 공통 비율)
+    """
+
+    name: str
+    fee: int
+    min_amount: float | None = None
+    max_amount: float | None = None
+    min_qty: float | None = None
+    max_qty: float | None = None
+    seller: str | None = None
+    products: tuple[str, ...] = field(default_factory=tuple)
+    ratio: int | None = None
+
+
+def legacy_rules(shipping_fee: int | None, shipping_condition_amount: int | None) -> list[ShippingRule]:
+    """기존 단일 설정(주문 금액이 조건 미만이면 배송비 부과)을 규칙 목록으로 바꿉니다."""
+    if shipping_fee is None or shipping_condition_amount is None:
+        return []
+    return [ShippingRule(name="기본", fee=int(shipping_fee), max_amount=int(shipping_condition_amount))]
+
+
+def check_rule_names(rules: list[ShippingRule]) -> None:
+    """규칙 이름은 배송비규칙 컬럼/정산 행의 키이므로 비어 있거나 겹치면 ValueError."""
+    seen = set()
+    for i, rule in enumerate(rules, start=1):
+        name = str(rule.name or "").strip()
+        if not name:
+            raise ValueError(f"{i}번째 규칙의 name이 비어 있습니다.")
+        if name in seen:
+            raise ValueError(f"배송비 규칙 이름이 중복됩니다: {name}")
+        seen.add(name)
+
+
+def rules_from_json(text: str) -> list[ShippingRule]:
+    """JSON 배열([{"name": ..., "fee": ..., ...}])을 규칙 목록으로 읽습니다. 형식이 틀리거나 이름이 비어 있거나 겹치면 ValueError."""
+    if not (text or "").strip():
+        return []
+    try:
+        items = json.loads(text)
+    except json.JSONDecodeError as e:
+        raise ValueError(f"배송비 규칙 JSON 형식 오류: {e}") from e
+    if isinstance(items, dict):
+        items = [items]
+    if not isinstance(items, list):
+        raise ValueError("배송비 규칙은 객체 배열이어야 합니다.")
+    allowed = {f.name for f in fields(ShippingRule)}
+    rules = []
+    for i, item in enumerate(items, start=1):
+        if not isinstance(item, dict):
+            raise ValueError(f"{i}번째 규칙이 객체가 아닙니다.")
+        unknown = set(item) - allowed
+        if unknown:
+            raise ValueError(f"{i}번째 규칙에 알 수 없는 항목: {', '.join(sorted(unknown))}")
+        if "fee" not in item:
+            raise ValueError(f"{i}번째 규칙에 fee가 없습니다.")
+        item = dict(item)
+        item.setdefault("name", f"규칙{i}")
+        products = item.get("products") or ()
+        item["products"] = tuple([products] if isinstance(products, str) else products)
+        try:
+            item["fee"] = int(item["fee"])
+        except (TypeError, ValueError) as e:
+            raise ValueError(f"{i}번째 규칙의 fee가 숫자가 아닙니다.") from e
+        rules.append(ShippingRule(**item))
+    check_rule_names(rules)
+    return rules
+
+
+def _ratio(value: int | None) -> int:
+    return 100 if value is None else max(0, min(100, int(value)))
+
+
+def _cost_fee(rule: ShippingRule, seller_ratio: int | None) -> int:
+    ratio = _ratio(seller_ratio if rule.ratio is None else rule.ratio)
+    return int(round(int(rule.fee) * ratio / 100))
+
+
+def apply_shipping_rules(
+    df: pd.DataFrame,
+    order_column: str,
+    rules: list[ShippingRule],
+    seller_ratio: int | None = 100,
+    amount_column: str = "공구판매가",
+    quantity_column: str | None = None,
+    seller_column: str | None = None,
+    product_column: str | None = "노션상품",
+) -> pd.DataFrame:
+    """주문번호별로 금액/수량을 한 번에 모은 뒤 규칙을 주문 단위로 평가합니다.
+
+    반환: df와 같은 index의 ["배송비", "배송비규칙"]. 배송비는 주문의 첫 행에만 부과하고,
+    주문번호가 비어 있는 행과 규칙이 없는 주문은 0 / "".
+    """
+    check_rule_names(rules)
+    n = len(df)
+    # 주문번호를 등장 순서대로 정수 코드화 → 코드별 합계는 bincount 한 번(정렬/반복 없음)
+    codes, uniques = pd.factorize(df[order_column])
+    n_orders = len(uniques)
+    valid = codes >= 0
+    vcodes = codes[valid]
+
+    amount = pd.to_numeric(df[amount_column], errors="coerce").fillna(0).to_numpy(dtype=float)
+    order_amount = np.bincount(vcodes, weights=amount[valid], minlength=n_orders)
+    if quantity_column and quantity_column in df.columns:
+        qty = pd.to_numeric(df[quantity_column], errors="coerce").fillna(0).to_numpy(dtype=float)
+    else:
+        qty = np.zeros(n)
+    order_qty = np.bincount(vcodes, weights=qty[valid], minlength=n_orders)
+
+    # 주문별 첫 행: 코드가 등장 순서이므로 누적 최대값이 갱신되는 위치
+    running = np.maximum.accumulate(np.where(valid, codes, -1)) if n else codes
+    prev = np.r_[-1, running[:-1]] if n else running
+    first_rows = np.flatnonzero(valid & (codes > prev))
+
+    fired = np.full(n_orders, -1, dtype=np.int64)
+    for i, rule in enumerate(rules):
+        mask = fired < 0
+        if rule.min_amount is not None:
+            mask &= order_amount >= float(rule.min_amount)
+        if rule.max_amount is not None:
+            mask &= order_amount < float(rule.max_amount)
+        if rule.min_qty is not None:
+            mask &= order_qty >= float(rule.min_qty)
+        if rule.max_qty is not None:
+            mask &= order_qty < float(rule.max_qty)
+        if rule.seller is not None:
+            if not seller_column or seller_column not in df.columns:
+                raise ValueError(f"배송비 규칙 '{rule.name}'에는 판매자 컬럼이 필요합니다.")
+            order_seller = df[seller_column].astype(str).str.strip().to_numpy(dtype=object)[first_rows]
+            mask &= order_seller == str(rule.seller).strip()
+        if rule.products:
+            if not product_column or product_column not in df.columns:
+                raise ValueError(f"배송비 규칙 '{rule.name}'에는 '{product_column}' 컬럼이 필요합니다.")
+            hit = df[product_column].isin(rule.products).to_numpy()
+            mask &= np.bincount(vcodes, weights=hit[valid], minlength=n_orders) > 0
+        fired[mask] = i
+
+    cost = np.array([_cost_fee(rule, seller_ratio) for rule in rules] + [0], dtype=np.int64)
+    names = np.array([rule.name for rule in rules] + [""], dtype=object)
+    row_fee = np.zeros(n, dtype=np.int64)
+    row_rule = np.full(n, "", dtype=object)
+    row_fee[first_rows] = cost[fired]
+    row_rule[first_rows] = names[fired]
+    return pd.DataFrame({"배송비": row_fee, "배송비규칙": row_rule}, index=df.index)
+
+
+def shipping_summary(fired: pd.Series, rules: list[ShippingRule], seller_ratio: int | None = 100) -> list[dict]:
+    """배송비규칙 컬럼 → 규칙별 [{name, count, sale_fee, cost_fee}] (규칙 순서, 부과 0원 규칙 제외)."""
+    counts = fired[fired.astype(str) != ""].value_counts()
+    summary = []
+    for rule in rules:
+        count = int(counts.get(rule.name, 0))
+        if count and int(rule.fee) > 0:
+            summary.append({"name": rule.name, "count": count, "sale_fee": int(rule.fee), "cost_fee": _cost_fee(rule, seller_ratio)})
+    return summary
@@ -0,0 +1,165 @@
+import hashlib
+import os
+import threading
+from collections import OrderedDict
+from datetime import datetime
+
+import numpy as np
+import pandas as pd
+
+from ju_make_excel import build_finance_excel
+from ju_make_final_df import make_final_df
+from ju_make_finance_df import make_finance_df
+
+
+# 산출 단계(RAW/정산 DF/xlsx) 결과 메모리 캐시 한도(환경변수로 조정 가능)
+STAGE_CACHE_ENTRIES = int(os.environ.get("STAGE_CACHE_ENTRIES", "8"))
+STAGE_CACHE_MAX_BYTES = int(float(os.environ.get("STAGE_CACHE_MAX_MB", "512")) * 1024 * 1024)
+
+
+def frame_fingerprint(df: pd.DataFrame) -> str:
+    """DataFrame 내용(값/인덱스/컬럼명/dtype) 해시.
+
+    hash_pandas_object는 object 값을 문자열로 해시하므로(1과 "1"이 같음) object 컬럼의 추론 타입도 함께 넣습니다.
+    리스트처럼 해시할 수 없는 값이 있으면 문자열로 바꿔 해시합니다.
+    """
+    h = hashlib.blake2b(digest_size=16)
+    h.update(repr((df.shape, [str(c) for c in df.columns], [str(t) for t in df.dtypes])).encode("utf-8"))
+    for i, dtype in enumerate(df.dtypes):
+        if dtype == object:
+            h.update(pd.api.types.infer_dtype(df.iloc[:, i], skipna=True).encode("utf-8"))
+    try:
+        hashed = pd.util.hash_pandas_object(df, index=True)
+    except TypeError:
+        hashed = pd.util.hash_pandas_object(df.astype(str), index=True)
+    h.update(np.ascontiguousarray(hashed.to_numpy()).tobytes())
+    return h.hexdigest()
+
+
+def value_fingerprint(value) -> str:
+    """단계 입력값 하나의 지문. DataFrame/Series는 내용 해시, 나머지는 repr(목록/딕셔너리는 재귀)."""
+    if isinstance(value, pd.DataFrame):
+        return "df:" + frame_fingerprint(value)
+    if isinstance(value, pd.Series):
+        return "s:" + frame_fingerprint(value.to_frame())
+    if isinstance(value, (bytes, bytearray, memoryview)):
+        return "b:" + hashlib.blake2b(value, digest_size=16).hexdigest()
+    if isinstance(value, dict):
+        return "{" + ",".join(f"{k!r}:{value_fingerprint(v)}" for k, v in value.items()) + "}"
+    if isinstance(value, (list, tuple)):
+        return "[" + ",".join(value_fingerprint(v) for v in value) + "]"
+    return repr(value)
+
+
+def _approx_size(value) -> int:
+    # 저장 시 한 번만 잽니다. object(문자열) 컬럼은 deep=True여야 실제 문자열 크기가 반영됨
+    if isinstance(value, pd.DataFrame):
+        return int(value.memory_usage(index=True, deep=True).sum())
+    if isinstance(value, (bytes, bytearray)):
+        return len(value)
+    if isinstance(value, dict):
+        return sum(_approx_size(v) for v in value.values())
+    if isinstance(value, (list, tuple)):
+        return sum(_approx_size(v) for v in value)
+    return 0
+
+
+class StageCache:
+    """산출 단계 결과를 (단계명, 입력 지문) 키로 보관합니다(LRU, 개수/용량 한도).
+
+    - Streamlit rerun(펼치기 클릭, 업로드 버튼 등)에서 입력이 같으면 다시 계산하지 않고 이전 결과를 반환
+    - 반환되는 DataFrame/bytes는 공유되므로 호출 측에서 수정하려면 복사해서 사용
+    - out_params(raw_output 같은 결과 dict 인자)는 키에서 빼고, 적중 시 저장해 둔 내용으로 다시 채움
+    - 예외는 저장하지 않음(다음 호출에서 다시 계산)
+    """
+
+    def __init__(self, max_entries: int = STAGE_CACHE_ENTRIES, max_bytes: int = STAGE_CACHE_MAX_BYTES):
+        self.max_entries = max(1, max_entries)
+        self.max_bytes = max_bytes
+        self._entries: OrderedDict[tuple, dict] = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def key(self, stage: str, args: tuple, kwargs: dict, out_params: tuple = (), key_extra: tuple = ()) -> tuple:
+        items = tuple((k, value_fingerprint(v)) for k, v in sorted(kwargs.items()) if k not in out_params)
+        return (stage, tuple(value_fingerprint(a) for a in args), items, key_extra)
+
+    def call(self, stage: str, fn, args: tuple = (), kwargs: dict | None = None, out_params: tuple = (), key_extra: tuple = ()):
+        kwargs = kwargs or {}
+        key = self.key(stage, args, kwargs, out_params, key_extra)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                self._entries.move_to_end(key)
+                self.hits += 1
+        if entry is None:
+            result = fn(*args, **kwargs)
+            outs = {name: dict(kwargs[name]) for name in out_params if isinstance(kwargs.get(name), dict)}
+            entry = {"result": result, "outs": outs, "size": _approx_size(result) + _approx_size(outs)}
+            self._store(key, entry)
+            with self._lock:
+                self.misses += 1
+            return result
+        for name, saved in entry["outs"].items():
+            out = kwargs.get(name)
+            if isinstance(out, dict):
+                out.clear()
+                out.update(saved)
+        return entry["result"]
+
+    def _store(self, key: tuple, entry: dict) -> None:
+        if entry["size"] > self.max_bytes:
+            return
+        with self._lock:
+            self._entries[key] = entry
+            self._entries.move_to_end(key)
+            total = sum(e["size"] for e in self._entries.values())
+            while len(self._entries) > 1 and (len(self._entries) > self.max_entries or total > self.max_bytes):
+                _, old = self._entries.popitem(last=False)
+                total -= old["size"]
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "entries": len(self._entries),
+                "bytes": sum(e["size"] for e in self._entries.values()),
+                "hits": self.hits,
+                "misses": self.misses,
+            }
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+
+
+_default_cache: StageCache | None = None
+_default_lock = threading.Lock()
+
+
+def stage_cache() -> StageCache:
+    """프로세스 공용 인스턴스(세션/rerun 간 공유)."""
+    global _default_cache
+    with _default_lock:
+        if _default_cache is None:
+            _default_cache = StageCache()
+        return _default_cache
+
+
+def cached_make_final_df(*args, compute=None, **kwargs) -> pd.DataFrame:
+    """compute: 캐시에 없을 때 대신 호출할 함수(make_final_df와 같은 인자, 예: 증분 재계산)"""
+    return stage_cache().call("make_final_df", compute or make_final_df, args, kwargs)
+
+
+def cached_make_finance_df(*args, compute=None, **kwargs) -> pd.DataFrame:
+    return stage_cache().call("make_finance_df", compute or make_finance_df, args, kwargs)
+
+
+def cached_build_finance_excel(*args, **kwargs) -> tuple[bytes, str]:
+    # 파일명에 오늘 날짜가 들어가므로 날짜도 키에 포함.
+    # raw_output을 넘기지 않으면 csv/parquet/none 정책이어도 RAW를 시트로 기록하므로 그 여부도 키에 포함
+    return stage_cache().call(
+        "build_finance_excel", build_finance_excel, args, kwargs,
+        out_params=("raw_output",),
+        key_extra=(datetime.now().strftime("%y%m%d"), kwargs.get("raw_output") is None),
+    )